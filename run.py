@@ -6,31 +6,63 @@ import base64
 import mimetypes
 import requests
 import json
+import time
+import hashlib
+import random
+import copy
+import atexit
+import asyncio
+import gzip
+import uuid
+import hmac
+import secrets
+import socket
+import sqlite3
 from datetime import datetime
-from urllib.parse import urljoin
-from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urldefrag, urlparse
+from email.utils import parsedate_to_datetime
+from urllib3.exceptions import NewConnectionError
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 import threading
+from contextlib import contextmanager, nullcontext, closing
 import subprocess
+import signal
+import argparse
+import queue
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import xml.etree.ElementTree as ET
 
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout,
-    QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
-    QProgressBar, QMessageBox, QLabel, QFileDialog, QHeaderView,
+    QLineEdit, QPushButton, QTableView, QStyleOptionProgressBar,
+    QMessageBox, QLabel, QFileDialog, QHeaderView,
     QDialog, QFormLayout, QDialogButtonBox, QSpacerItem,
     QSizePolicy, QComboBox, QShortcut, QTreeWidget, QTreeWidgetItem,
     QMenu, QInputDialog, QFrame, QAbstractItemView, QSplitter, QTextEdit,
     QStyle, QAction, QSystemTrayIcon, QTreeView, QStyledItemDelegate, QItemDelegate
 )
-from PyQt5.QtGui import QStandardItemModel, QStandardItem, QKeySequence, QIcon
-from PyQt5.QtCore import Qt, QObject, pyqtSignal, QThread, QEvent, QTimer
+from PyQt5.QtGui import QStandardItemModel, QStandardItem, QKeySequence, QIcon, QColor, QPalette, QDesktopServices
+from PyQt5.QtCore import Qt, QObject, pyqtSignal, QThread, QEvent, QTimer, QAbstractTableModel, QModelIndex, QMimeData, QUrl
 
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright
+from bs4 import BeautifulSoup, Comment, NavigableString
 from tqdm import tqdm
 from pyzotero import zotero
 
 from pynput import keyboard
 
+try:
+    import aiohttp  # 仅异步保存引擎需要
+except ImportError:
+    aiohttp = None
+
+try:
+    import resource  # 仅用于 benchmark 统计内存峰值，Windows 上不可用
+except ImportError:
+    resource = None
+
 if sys.platform == 'darwin':
     from AppKit import NSApp, NSApplication, NSApplicationActivationPolicyAccessory
 
@@ -42,298 +74,5182 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 CONFIG_FILE = resource_path('config/config.json')
+SOURCE_CACHE_FILE = resource_path('config/source_cache.json')
+METADATA_CACHE_FILE = resource_path('config/arxiv_metadata.json')
+WATCH_STATE_FILE = resource_path('config/watch_state.json')
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+
+# 所有任务共用的 HTTP 连接池，避免每个请求重新建立连接
+http_session = requests.Session()
+http_session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32))
+http_session.mount('https://', requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32))
+
+
+# --- Host Rate Limiter ---
+# 表示服务器要求降速的 HTTP 状态码
+THROTTLE_STATUS = (429, 503)
+
+# 统计错误与实际请求速率的时间窗口（秒），以及窗口内触发降速的错误次数
+HOST_STATS_WINDOW = 10
+HOST_ERROR_SPIKE = 3
+
+
+def parse_retry_after(value, max_delay=600):
+    """
+    解析 Retry-After（秒数或 HTTP 日期），返回需要等待的秒数，无法解析时返回 None。
+    """
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), max_delay)
+
+
+class HostRateLimiter:
+    """
+    进程内所有任务共享的按主机令牌桶，浏览器导航与资源下载在发出请求前都先预约令牌。
+    收到 429 / 503 时按 Retry-After 暂停该主机并将速率减半，短时间内错误集中出现时同样减半；
+    请求成功后速率逐步恢复到配置的上限，使总吞吐量保持在服务器允许的范围内尽可能高。
+    """
+    MIN_RATE = 0.1
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts = {}
+        self.configure({})
+
+    def configure(self, args):
+        with self.lock:
+            self.default_rate = float(args.get('host_rate_default', 4.0))
+            self.burst = max(1, int(args.get('host_burst', 8)))
+            self.rate_limits = args.get('host_rate_limits') or {}
+            for host, state in self.hosts.items():
+                state['max_rate'] = self.max_rate(host)
+                state['rate'] = min(state['rate'], state['max_rate'])
+
+    def max_rate(self, host):
+        # 子域名未单独配置时使用上级域名的配置
+        parts = host.split('.')
+        for index in range(len(parts)):
+            rate = self.rate_limits.get('.'.join(parts[index:]))
+            if rate:
+                return float(rate)
+        return self.default_rate
+
+    def state(self, host):
+        # 调用方需持有 self.lock
+        if host not in self.hosts:
+            rate = self.max_rate(host)
+            self.hosts[host] = {
+                'rate': rate, 'max_rate': rate,
+                'tokens': float(self.burst),
+                'updated': time.monotonic(),
+                'blocked_until': 0.0,
+                'throttled': 0,          # 连续被限流的次数，没有 Retry-After 时据此退避
+                'last_decrease': 0.0,
+                'waiting': 0,
+                'sent': deque(),
+                'errors': deque()
+            }
+        return self.hosts[host]
+
+    def try_acquire(self, host):
+        """
+        尝试取一个令牌，成功返回 0，否则返回预计还需等待的秒数。
+        """
+        with self.lock:
+            state = self.state(host)
+            now = time.monotonic()
+            if now < state['blocked_until']:
+                return state['blocked_until'] - now
+            state['tokens'] = min(self.burst, state['tokens'] + max(0.0, now - state['updated']) * state['rate'])
+            state['updated'] = now
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                state['sent'].append(now)
+                return 0
+            return (1 - state['tokens']) / state['rate']
+
+    def acquire(self, url, cancel_event=None):
+        """
+        等到该主机有可用令牌。等待中的请求每次醒来都按当前速率重新判断，速率恢复后立即生效。
+        """
+        host = urlparse(url).hostname or ''
+        delay = self.try_acquire(host)
+        if not delay:
+            return
+        self.add_waiting(host, 1)
+        try:
+            while delay:
+                # 少量随机抖动，避免所有等待的请求同时醒来争抢同一个令牌
+                delay *= random.uniform(1.0, 1.2)
+                if cancel_event is None:
+                    time.sleep(delay)
+                elif cancel_event.wait(delay):
+                    raise TaskCancelled()
+                delay = self.try_acquire(host)
+        finally:
+            self.add_waiting(host, -1)
+
+    async def acquire_async(self, url, sleep):
+        """
+        与 acquire 相同，等待由调用方提供的可取消的 sleep 完成。
+        """
+        host = urlparse(url).hostname or ''
+        delay = self.try_acquire(host)
+        if not delay:
+            return
+        self.add_waiting(host, 1)
+        try:
+            while delay:
+                await sleep(delay * random.uniform(1.0, 1.2))
+                delay = self.try_acquire(host)
+        finally:
+            self.add_waiting(host, -1)
+
+    def add_waiting(self, host, delta):
+        with self.lock:
+            self.state(host)['waiting'] += delta
+
+    def record(self, url, status=None, headers=None):
+        """
+        反馈请求结果，status 为 None 表示网络错误。
+        """
+        host = urlparse(url).hostname or ''
+        with self.lock:
+            state = self.state(host)
+            now = time.monotonic()
+            if status in THROTTLE_STATUS:
+                state['throttled'] += 1
+                delay = parse_retry_after((headers or {}).get('retry-after'))
+                if delay is None:
+                    delay = min(60.0, 2.0 ** state['throttled'])
+                self.decrease(state, now)
+                # 暂停期间不积累令牌，恢复后按新速率逐个发出
+                state['blocked_until'] = max(state['blocked_until'], now + delay)
+                state['tokens'] = 0.0
+                state['updated'] = state['blocked_until']
+                print(f"{host} 要求降速（HTTP {status}），暂停 {delay:.1f}s，速率降至 {state['rate']:.2f}/s")
+            elif status is None or status >= 500:
+                state['errors'].append(now)
+                while state['errors'] and state['errors'][0] < now - HOST_STATS_WINDOW:
+                    state['errors'].popleft()
+                if len(state['errors']) >= HOST_ERROR_SPIKE:
+                    if self.decrease(state, now):
+                        print(f"{host} 短时间内出错 {len(state['errors'])} 次，速率降至 {state['rate']:.2f}/s")
+            else:
+                state['throttled'] = 0
+                # 加性增加：每次成功恢复上限的 5%
+                state['rate'] = min(state['max_rate'], state['rate'] + state['max_rate'] * 0.05)
+
+    def decrease(self, state, now):
+        # 并发请求往往同时失败，每秒最多减速一次
+        if now - state['last_decrease'] < 1.0:
+            return False
+        state['last_decrease'] = now
+        state['rate'] = max(self.MIN_RATE, state['rate'] / 2)
+        return True
+
+    def stats(self):
+        """
+        返回 {主机: {'rate': 最近的实际请求速率, 'limit': 当前允许的速率, 'waiting': 排队等待的请求数, 'blocked': 剩余暂停秒数}}。
+        """
+        now = time.monotonic()
+        with self.lock:
+            stats = {}
+            for host, state in self.hosts.items():
+                while state['sent'] and state['sent'][0] < now - HOST_STATS_WINDOW:
+                    state['sent'].popleft()
+                stats[host] = {
+                    'rate': round(len(state['sent']) / HOST_STATS_WINDOW, 2),
+                    'limit': round(state['rate'], 2),
+                    'waiting': state['waiting'],
+                    'blocked': round(max(0.0, state['blocked_until'] - now), 1)
+                }
+            return stats
+
+
+def format_host_stats(stats):
+    active = [(host, item) for host, item in sorted(stats.items()) if item['rate'] or item['waiting'] or item['blocked']]
+    parts = []
+    for host, item in active:
+        text = f"{host} {item['rate']:.1f}/{item['limit']:.1f} 次/秒"
+        if item['waiting']:
+            text += f"，排队 {item['waiting']}"
+        if item['blocked']:
+            text += f"，暂停 {item['blocked']:.0f}s"
+        parts.append(text)
+    return '  |  '.join(parts)
+
+
+host_limiter = HostRateLimiter()
+
+zotero_clients = {}
+zotero_clients_lock = threading.Lock()
+
+
+def get_zotero_client(args):
+    """
+    按账号缓存 Zotero 客户端，在多个任务间复用。
+    """
+    key = (args['library_id'], args['library_type'], args['api_key'], zotero_api_base(args))
+    with zotero_clients_lock:
+        if key not in zotero_clients:
+            zotero_clients[key] = zotero.Zotero(*key[:3])
+            zotero_clients[key].endpoint = key[3]
+        return zotero_clients[key]
+
+
+def zotero_api_base(args):
+    return (args.get('zotero_api_base') or 'https://api.zotero.org').rstrip('/')
+
+
+def load_config_file():
+    """
+    读取配置文件，不存在时创建默认配置。
+    """
+    if not os.path.exists(CONFIG_FILE):
+        # 创建默认配置
+        default_config = {
+            "zotero_storage": "在 Zotero 设置 -> 高级 -> 数据存储位置 获得地址，在后方加上 /storage",
+            "library_id": "访问这里以获得ID https://www.zotero.org/settings/security#applications",
+            "api_key": "访问这里以创建API https://www.zotero.org/settings/security#applications",
+            "library_type": "user",
+            "user_data_dir": resource_path('config/user_data'),
+            "extension_path": resource_path('config/extension'),
+            "output_dir": "download",
+            "last_used_collection_key": "",
+            "last_used_collection_name": "",
+            "source_cache_ttl_hours": 168,
+            "attachment_placement": "link",
+            "staging_max_size_mb": 1024,
+            "staging_max_age_days": 30,
+            "snapshot_cleanup": True,
+            "snapshot_extra_variants": [],
+            "service_port": 23120,
+            "service_token": "",
+            "keep_browser_warm": True,
+            "max_parallel_jobs": 1,
+            "profile_pool_dir": "",
+            "dom_archive_dir": "archive",
+            "trace_enabled": False,
+            "trace_dir": "traces",
+            "resource_retries": 3,
+            "resource_retry_backoff": 1.0,
+            "resource_failure_policy": "keep_url",
+            "reuse_dom_archive": True,
+            "save_engine": "threaded",
+            "search_index_enabled": True,
+            "search_index_path": "config/search_index.db",
+            "zotero_backend": "web",
+            "zotero_connector_url": "http://127.0.0.1:23119",
+            "zotero_attachment_mode": "linked",
+            "zotero_api_base": "https://api.zotero.org",
+            "host_rate_default": 4.0,
+            "host_burst": 8,
+            "host_rate_limits": {},
+            "prefetch_jobs": 2,
+            "prefetch_cache_dir": "prefetch",
+            "prefetch_cache_budget_mb": 200,
+            "progressive_save": False,
+            "translation_engine": "extension",
+            "translation_api_url": "https://open.bigmodel.cn/api/paas/v4/chat/completions",
+            "translation_api_style": "openai",
+            "translation_api_key": "",
+            "translation_model": "glm-4-flash",
+            "translation_target_lang": "zh-CN",
+            "translation_batch_tokens": 2000,
+            "translation_concurrency": 4,
+            "translation_timeout": 120,
+            "translation_retries": 3,
+            "translation_retry_backoff": 2.0,
+            "stall_timeout": 300,
+            "isolation_max_restarts": 2,
+            "fleet_queue": "config/fleet.db",
+            "fleet_port": 23121,
+            "fleet_lease_seconds": 120,
+            "fleet_max_attempts": 3,
+            "fleet_token": "",
+            "watch_collection_key": "",
+            "watch_feeds": [],
+            "watch_interval_minutes": 15,
+            "watch_target_collection_key": "",
+            "watch_target_collection_name": "",
+            "watch_feed_backfill": False
+        }
+
+        # 保存默认配置
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+            json.dump(default_config, f, indent=4)
+        return default_config
+
+    with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def update_config_file(values):
+    """
+    只更新配置文件中的指定字段：重新读取后合并并原子替换，不覆盖其他字段（包括界面中同时进行的修改）。
+    """
+    try:
+        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = {}
+    config.update(values)
+    tmp_file = f"{CONFIG_FILE}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=4)
+    os.replace(tmp_file, CONFIG_FILE)
+
+
+def ensure_token(args, key):
+    """
+    返回配置中的共享令牌，未配置时生成一个并写入配置文件。
+    """
+    if not args.get(key):
+        args[key] = secrets.token_urlsafe(24)
+        update_config_file({key: args[key]})
+        print(f"已生成 {key} 并写入配置文件 {CONFIG_FILE}")
+    return args[key]
+
+
+# 2007 年之前的旧式编号所使用的分类名，如 hep-th/9901001、math.AG/0101001
+ARXIV_OLD_ARCHIVES = (
+    'acc-phys', 'adap-org', 'alg-geom', 'ao-sci', 'astro-ph', 'atom-ph', 'bayes-an',
+    'chao-dyn', 'chem-ph', 'cmp-lg', 'comp-gas', 'cond-mat', 'cs', 'dg-ga', 'funct-an',
+    'gr-qc', 'hep-ex', 'hep-lat', 'hep-ph', 'hep-th', 'math', 'math-ph', 'mtrl-th', 'nlin',
+    'nucl-ex', 'nucl-th', 'patt-sol', 'physics', 'plasm-ph', 'q-alg', 'q-bio', 'quant-ph',
+    'solv-int', 'supr-con'
+)
+
+# 新式编号为 YYMM.NNNN（2015 年前）或 YYMM.NNNNN，旧式编号为 archive(.SUBJ)/YYMMNNN
+ARXIV_ID_REGEX = re.compile(
+    r'(?<![\w.\-])(?:(?P<new>\d{2}(?:0[1-9]|1[0-2])\.\d{4,5})'
+    r'|(?P<old>(?:' + '|'.join(re.escape(a) for a in ARXIV_OLD_ARCHIVES) + r')(?:\.[a-z]{2})?/\d{2}(?:0[1-9]|1[0-2])\d{3}))'
+    r'(?P<version>v\d+)?(?!\d)',
+    re.IGNORECASE
+)
+
+# 需要抓取后再从中提取编号的 Arxiv 列表页
+ARXIV_LISTING_REGEX = re.compile(r'https?://(?:export\.)?arxiv\.org/(?:list|catchup|a)/\S+|https?://arxiv\.org/search/\S+', re.IGNORECASE)
+
+
+def normalize_arxiv_id(match):
+    """
+    将正则匹配结果统一为 (arxiv_id, version)，旧式编号的分类名小写、子类大写。
+    """
+    version = (match.group('version') or '').lower()
+    if match.group('new'):
+        return match.group('new'), version
+    archive, number = match.group('old').split('/')
+    if '.' in archive:
+        archive, subject = archive.split('.')
+        archive = f"{archive.lower()}.{subject.upper()}"
+    else:
+        archive = archive.lower()
+    return f"{archive}/{number}", version
+
+
+# parse_arxiv_id 只接受这些站点（及其子域名，如 ar5iv.labs.arxiv.org、export.arxiv.org）的链接
+ARXIV_HOSTS = ('arxiv.org', 'ar5iv.org')
+URL_HOST_REGEX = re.compile(r'[\w-]+(?:\.[\w-]+)*\.[a-z]{2,}(?::\d+)?', re.IGNORECASE)
+
+
+def is_arxiv_host(hostname):
+    return any(hostname == host or hostname.endswith('.' + host) for host in ARXIV_HOSTS)
+
+
+def parse_arxiv_id(arxiv_url):
+    """
+    从 Arxiv 链接或编号（如 2401.12345v2、arXiv:2401.12345、hep-th/9901001）中解析出 (arxiv_id, version)，
+    version 可能为空字符串。其他站点的链接即使包含形如编号的内容也不解析，返回 (None, None)。
+    """
+    text = arxiv_url.strip()
+    if not ARXIV_ID_REGEX.match(text):
+        # 带协议头或以域名开头（如 arxiv.org/abs/...）的输入按链接处理，只接受 Arxiv 的站点
+        has_host = '://' in text or URL_HOST_REGEX.fullmatch(text.split('/', 1)[0])
+        if has_host and not is_arxiv_host(urlparse(text if '://' in text else '//' + text).hostname or ''):
+            return None, None
+    match = ARXIV_ID_REGEX.search(text)
+    if not match:
+        return None, None
+    return normalize_arxiv_id(match)
+
+
+def extract_arxiv_ids(text):
+    """
+    一次扫描文本（纯文本、BibTeX、网页 HTML 等）中的所有 Arxiv 编号，按首次出现的顺序去重。
+    """
+    ids = {}
+    # DOI 形式 10.48550/arXiv.YYMM.NNNNN 中的编号紧跟在 "." 之后，先统一为 arxiv: 前缀
+    text = re.sub(r'(?i)arxiv\.(?=\d{4}\.)', 'arxiv:', text)
+    for match in ARXIV_ID_REGEX.finditer(text):
+        arxiv_id, version = normalize_arxiv_id(match)
+        # 同一篇文献只保留一次，优先保留显式指定的版本
+        if arxiv_id not in ids or (version and not ids[arxiv_id]):
+            ids[arxiv_id] = version
+    return list(ids.items())
+
+
+def expand_arxiv_listings(text, timeout=20):
+    """
+    抓取文本中出现的 Arxiv 列表页 / 搜索页，并将其内容追加到文本中以便统一提取编号。
+    """
+    pages = [text]
+    for listing_url in dict.fromkeys(ARXIV_LISTING_REGEX.findall(text)):
+        try:
+            host_limiter.acquire(listing_url)
+            response = http_session.get(listing_url, timeout=timeout)
+            host_limiter.record(listing_url, response.status_code, response.headers)
+            response.raise_for_status()
+            # 只保留链接部分，避免正文中的数字被误识别
+            pages.extend(re.findall(r'/abs/[^"\'\s<>]+', response.text))
+        except Exception as e:
+            print(f"抓取 Arxiv 列表页失败 {listing_url}: {e}")
+    return '\n'.join(pages)
+
+
+def arxiv_abs_url(arxiv_id, version=''):
+    return f"https://arxiv.org/abs/{arxiv_id}{version}"
+
+
+# --- Arxiv Source Resolver ---
+class ArxivSourceResolver:
+    """
+    并行探测 arxiv.org/html 与 ar5iv 的渲染是否可用，并按 Arxiv ID 和版本缓存结果。
+    """
+    def __init__(self, cache_file, ttl=7 * 24 * 3600, timeout=8):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.cache = self.load_cache()
+
+    def load_cache(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def save_cache(self):
+        # 先写临时文件再替换，避免并发任务读到半写入的缓存
+        tmp_file = self.cache_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, indent=4)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"保存来源缓存失败: {e}")
+
+    def candidates(self, arxiv_id, version, prefer_html):
+        html_url = f"https://arxiv.org/html/{arxiv_id}{version}"
+        if version:
+            # ar5iv 只渲染最新版本，指定了版本时只能使用 arxiv.org/html，以免得到其他版本的内容
+            return [html_url]
+        ar5iv_url = f"https://ar5iv.labs.arxiv.org/html/{arxiv_id}"
+        return [html_url, ar5iv_url] if prefer_html else [ar5iv_url, html_url]
+
+    def probe(self, url):
+        try:
+            host_limiter.acquire(url)
+            response = http_session.head(url, allow_redirects=True, timeout=self.timeout)
+            if response.status_code in (403, 405, 501):
+                # 部分服务器不支持 HEAD，退回到只读取响应头的 GET
+                host_limiter.acquire(url)
+                response = http_session.get(url, allow_redirects=True, timeout=self.timeout, stream=True)
+                response.close()
+            host_limiter.record(url, response.status_code, response.headers)
+        except Exception:
+            host_limiter.record(url)
+            return False
+
+        if response.status_code in THROTTLE_STATUS:
+            return None  # 被要求降速，无法判断是否可用
+        if response.status_code != 200:
+            return False
+        # ar5iv 没有渲染结果时会重定向回 arxiv.org/abs
+        return '/abs/' not in response.url
+
+    def resolve(self, arxiv_id, version, prefer_html, ttl=None):
+        key = f"{arxiv_id}{version}"
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+
+        candidates = self.candidates(arxiv_id, version, prefer_html)
+        with self.lock:
+            entry = self.cache.get(key)
+        # 不在候选中的缓存结果（如旧版本缓存的、指定版本时的 ar5iv 链接）重新探测
+        if entry and now - entry['checked_at'] < ttl and entry['url'] in candidates:
+            return entry['url']
+
+        with ThreadPoolExecutor(max_workers=len(candidates)) as executor:
+            available = list(executor.map(self.probe, candidates))
+
+        resolved_url = next((url for url, ok in zip(candidates, available) if ok), None)
+        if resolved_url is None:
+            # 全部探测失败（可能是网络问题），不缓存，由调用方退回到按日期猜测的结果
+            return None
+        if None in available[:candidates.index(resolved_url)]:
+            # 更优先的来源因限流未能确认，本次使用但不缓存
+            return resolved_url
+
+        with self.lock:
+            self.cache[key] = {'url': resolved_url, 'checked_at': now}
+            self.save_cache()
+        return resolved_url
+
+
+source_resolver = ArxivSourceResolver(SOURCE_CACHE_FILE)
+
+
+# --- Arxiv Metadata ---
+def parse_arxiv_feed(feed_text):
+    """
+    解析 Arxiv API 返回的 Atom 结果，返回 {arxiv_id: metadata}。
+    """
+    ns = {'atom': 'http://www.w3.org/2005/Atom', 'arxiv': 'http://arxiv.org/schemas/atom'}
+    root = ET.fromstring(feed_text)
+    entries = {}
+    for entry in root.findall('atom:entry', ns):
+        arxiv_id, version = parse_arxiv_id(entry.findtext('atom:id', '', ns))
+        if not arxiv_id:
+            continue  # 编号无效时 API 返回的是错误条目
+
+        primary_category = entry.find('arxiv:primary_category', ns)
+        entries[arxiv_id] = {
+            'arxiv_id': arxiv_id,
+            'version': version,
+            'title': ' '.join(entry.findtext('atom:title', '', ns).split()),
+            'abstract': ' '.join(entry.findtext('atom:summary', '', ns).split()),
+            'authors': [' '.join(author.findtext('atom:name', '', ns).split()) for author in entry.findall('atom:author', ns)],
+            'published': entry.findtext('atom:published', '', ns)[:10],
+            'updated': entry.findtext('atom:updated', '', ns)[:10],
+            'doi': entry.findtext('arxiv:doi', '', ns).strip(),
+            'journal_ref': ' '.join(entry.findtext('arxiv:journal_ref', '', ns).split()),
+            'primary_category': primary_category.get('term', '') if primary_category is not None else '',
+            'categories': [category.get('term') for category in entry.findall('atom:category', ns) if category.get('term')]
+        }
+    return entries
+
+
+class ArxivMetadataFetcher:
+    """
+    在后台按批调用 Arxiv API 获取队列中文献的元数据，与浏览器翻译阶段同时进行，结果缓存在本地。
+    """
+    def __init__(self, cache_file, batch_size=100, request_interval=3, timeout=30):
+        self.cache_file = cache_file
+        self.batch_size = batch_size
+        self.request_interval = request_interval  # Arxiv API 要求两次请求间隔至少 3 秒
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.cache = self.load_cache()
+        self.pending = {}  # arxiv_id -> threading.Event，请求完成后置位
+        self.last_request = 0
+        # 只用一个线程串行请求，遵守 Arxiv API 的访问频率限制
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def load_cache(self):
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def save_cache(self):
+        tmp_file = self.cache_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.cache, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            print(f"保存元数据缓存失败: {e}")
+
+    def prefetch(self, arxiv_ids):
+        """
+        为尚未缓存的编号提交批量请求，立即返回。
+        """
+        with self.lock:
+            missing = [arxiv_id for arxiv_id in dict.fromkeys(arxiv_ids)
+                       if arxiv_id and arxiv_id not in self.cache and arxiv_id not in self.pending]
+            for arxiv_id in missing:
+                self.pending[arxiv_id] = threading.Event()
+
+        for start in range(0, len(missing), self.batch_size):
+            self.executor.submit(self.fetch_batch, missing[start:start + self.batch_size])
+
+    def fetch_batch(self, arxiv_ids):
+        try:
+            delay = self.request_interval - (time.time() - self.last_request)
+            if delay > 0:
+                time.sleep(delay)
+            self.last_request = time.time()
+
+            host_limiter.acquire(ARXIV_API_URL)
+            response = http_session.get(
+                ARXIV_API_URL,
+                params={'id_list': ','.join(arxiv_ids), 'max_results': len(arxiv_ids)},
+                timeout=self.timeout
+            )
+            host_limiter.record(ARXIV_API_URL, response.status_code, response.headers)
+            response.raise_for_status()
+            entries = parse_arxiv_feed(response.text)
+            with self.lock:
+                self.cache.update(entries)
+                self.save_cache()
+            print(f"已获取 {len(entries)}/{len(arxiv_ids)} 篇文献的 Arxiv 元数据")
+        except Exception as e:
+            print(f"获取 Arxiv 元数据失败: {e}")
+        finally:
+            with self.lock:
+                for arxiv_id in arxiv_ids:
+                    event = self.pending.pop(arxiv_id, None)
+                    if event:
+                        event.set()
+
+    def get(self, arxiv_id, timeout=60):
+        """
+        返回缓存中的元数据，请求仍在进行时最多等待 timeout 秒，获取失败返回 None。
+        """
+        self.prefetch([arxiv_id])
+        with self.lock:
+            event = self.pending.get(arxiv_id)
+        if event:
+            event.wait(timeout)
+        with self.lock:
+            return self.cache.get(arxiv_id)
+
+
+metadata_fetchers = {}
+metadata_fetchers_lock = threading.Lock()
+
+
+def metadata_fetcher():
+    """
+    返回进程内共享的元数据获取器。首次使用时才读取缓存文件并创建线程池，
+    job-worker 子进程、rerender / index 的进程池与测试导入本模块时不会创建。
+    """
+    with metadata_fetchers_lock:
+        fetcher = metadata_fetchers.get(METADATA_CACHE_FILE)
+        if fetcher is None:
+            fetcher = metadata_fetchers[METADATA_CACHE_FILE] = ArxivMetadataFetcher(METADATA_CACHE_FILE)
+        return fetcher
+
+
+def fill_preprint_item(item, metadata):
+    """
+    使用 Arxiv 元数据填充 Zotero preprint 条目模板。
+    """
+    arxiv_id = metadata['arxiv_id']
+    item['title'] = metadata['title']
+    item['creators'] = []
+    for name in metadata['authors']:
+        first_name, _, last_name = name.rpartition(' ')
+        item['creators'].append({'creatorType': 'author', 'firstName': first_name, 'lastName': last_name})
+    item['abstractNote'] = metadata['abstract']
+    item['date'] = metadata['published']
+    item['repository'] = 'arXiv'
+    item['archiveID'] = f"arXiv:{arxiv_id}"
+    # Arxiv 为所有文献注册了 10.48550 前缀的 DOI，期刊 DOI 记录在 extra 中
+    item['DOI'] = f"10.48550/arXiv.{arxiv_id}"
+    extra = []
+    if metadata['doi']:
+        extra.append(f"Published DOI: {metadata['doi']}")
+    if metadata['journal_ref']:
+        extra.append(f"Journal Reference: {metadata['journal_ref']}")
+    item['extra'] = '\n'.join(extra)
+    item['tags'] = [{'tag': category} for category in metadata['categories']]
+    return item
+
+
+# --- Zotero Connector ---
+class ConnectorUnavailable(Exception):
+    """
+    Zotero 桌面端未运行或请求未能发出，条目一定没有创建，此时可以安全地回退到 Web API。
+    """
+
+
+class ConnectorPartialSave(Exception):
+    """
+    条目已由 Zotero 桌面端创建，但部分快照未能保存。不能回退或重试，否则会出现重复的条目。
+    missing 为未保存的快照。
+    """
+    def __init__(self, message, missing):
+        super().__init__(message)
+        self.missing = missing
+
+
+def request_not_sent(error):
+    """
+    请求是否在发出之前就失败（连接被拒绝、连接超时）。读取超时或连接被重置时服务端可能已经处理了请求。
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(error, requests.ConnectionError) and isinstance(reason, NewConnectionError)
+
+
+class ZoteroConnector:
+    """
+    通过正在运行的 Zotero 桌面端的本地 connector 接口（默认 http://127.0.0.1:23119）创建条目，
+    快照以 HTML 内容直接交给 Zotero 保存，无需经过 Web API 再等待同步回本地。
+    """
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def ping(self, timeout=2):
+        try:
+            return http_session.get(f"{self.base_url}/connector/ping", timeout=timeout).ok
+        except requests.RequestException:
+            return False
+
+    def post(self, endpoint, payload, timeout=30):
+        response = http_session.post(f"{self.base_url}/connector/{endpoint}", json=payload, timeout=timeout)
+        response.raise_for_status()
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def find_target(self, collection_name):
+        """
+        connector 以 C<编号> 标识文献库而不是 key，按名称在桌面端的文献库列表中查找。
+        """
+        if not collection_name:
+            return None
+        selected = self.post('getSelectedCollection', {}) or {}
+        for target in selected.get('targets', []):
+            if target.get('name') == collection_name and str(target.get('id', '')).startswith('C'):
+                return target['id']
+        return None
+
+    def save_item(self, item, snapshots, collection_name=''):
+        session_id = uuid.uuid4().hex
+        item = {key: value for key, value in item.items() if key != 'collections'}
+        try:
+            self.post('saveItems', {'sessionID': session_id, 'uri': item['url'], 'items': [{**item, 'id': session_id}]})
+        except requests.RequestException as e:
+            if request_not_sent(e):
+                raise ConnectorUnavailable(str(e))
+            raise
+
+        for index, snapshot in enumerate(snapshots):
+            label = SNAPSHOT_VARIANT_LABELS.get(snapshot['variant'])
+            try:
+                with open(snapshot['path'], 'r', encoding='utf-8') as f:
+                    self.post('saveSingleFile', {
+                        'sessionID': session_id,
+                        'url': item['url'],
+                        'title': f"Snapshot ({label})" if label else 'Snapshot',
+                        'snapshotContent': f.read()
+                    }, timeout=120)
+            except (OSError, requests.RequestException) as e:
+                raise ConnectorPartialSave(f"条目已创建，但快照未能保存: {e}", snapshots[index:])
+
+        try:
+            target = self.find_target(collection_name)
+            if target:
+                self.post('updateSession', {'sessionID': session_id, 'target': target})
+            elif collection_name:
+                print(f"Zotero 桌面端中没有名为 {collection_name} 的文献库，条目保存在当前选中的文献库中")
+        except requests.RequestException as e:
+            print(f"条目已保存，但未能移动到文献库 {collection_name}: {e}")
+
+
+def file_md5(path, chunk_size=1024 * 1024):
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+class UploadBody:
+    """
+    prefix + 文件内容 + suffix 组成的请求体，按块从磁盘读取而不整体载入内存。
+    提供长度，使 requests 发送 Content-Length 而不是分块传输（存储服务不接受分块上传）。
+    """
+    def __init__(self, prefix, path, suffix):
+        self.parts = [prefix, path, suffix]
+        self.length = len(prefix) + os.path.getsize(path) + len(suffix)
+        self.file = None
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        size = 1024 * 1024 if size is None or size < 0 else size
+        while self.parts:
+            part = self.parts[0]
+            if isinstance(part, bytes):
+                self.parts.pop(0)
+                if part:
+                    return part
+                continue
+            if self.file is None:
+                self.file = open(part, 'rb')
+            chunk = self.file.read(size)
+            if chunk:
+                return chunk
+            self.file.close()
+            self.file = None
+            self.parts.pop(0)
+        return b''
+
+
+class UploadConflict(Exception):
+    """
+    上传授权的前提条件（If-Match / If-None-Match）不成立，服务器上的文件与本地记录不一致。
+    """
+
+
+class ZoteroFileUploader:
+    """
+    按 Zotero Web API 的文件上传流程上传 imported_file 附件：先以 MD5 / 修改时间申请上传授权，
+    服务器已有相同内容（exists）时跳过传输，否则流式上传到授权给出的地址后再确认。
+    授权返回 412 时读取服务器上文件当前的 MD5，以它为前提重试一次。
+    """
+    def __init__(self, api_base, library_type, library_id, api_key):
+        library_path = 'groups' if library_type == 'group' else 'users'
+        self.base_url = f"{api_base.rstrip('/')}/{library_path}/{library_id}"
+        self.headers = {'Zotero-API-Key': api_key, 'Zotero-API-Version': '3'}
+
+    def authorize(self, attachment_key, data, previous_md5=None):
+        # 新附件用 If-None-Match，替换已有文件时用 If-Match 防止覆盖他处的修改
+        precondition = {'If-Match': previous_md5} if previous_md5 else {'If-None-Match': '*'}
+        response = http_session.post(
+            f"{self.base_url}/items/{attachment_key}/file", data=data,
+            headers={**self.headers, **precondition, 'Content-Type': 'application/x-www-form-urlencoded'},
+            timeout=30
+        )
+        if response.status_code == 412:
+            raise UploadConflict(f"附件 {attachment_key} 的文件已在其他地方被修改")
+        if response.status_code == 413:
+            raise Exception("Zotero 存储空间不足")
+        response.raise_for_status()
+        return response, precondition
+
+    def current_md5(self, attachment_key):
+        response = http_session.get(f"{self.base_url}/items/{attachment_key}", headers=self.headers, timeout=30)
+        response.raise_for_status()
+        return response.json()['data'].get('md5') or None
+
+    def upload(self, attachment_key, path, filename, previous_md5=None):
+        """
+        上传 path 作为附件 attachment_key 的文件，返回 (md5, 是否实际传输了文件)。
+        """
+        md5 = file_md5(path)
+        if md5 == previous_md5:
+            return md5, False
+        data = {
+            'md5': md5,
+            'filename': filename,
+            'filesize': os.path.getsize(path),
+            'mtime': int(os.path.getmtime(path) * 1000)
+        }
+        try:
+            response, precondition = self.authorize(attachment_key, data, previous_md5)
+        except UploadConflict:
+            # 记录的 MD5 已过期（如上一次上传成功但结果未保存），以服务器当前的文件为前提重试
+            server_md5 = self.current_md5(attachment_key)
+            if server_md5 == md5:
+                return md5, False
+            print(f"附件 {attachment_key} 在服务器上的文件与记录不一致，按服务器当前版本重新申请上传")
+            previous_md5 = server_md5
+            response, precondition = self.authorize(attachment_key, data, previous_md5)
+        authorization = response.json()
+        if authorization.get('exists'):
+            return md5, False
+
+        body = UploadBody(authorization['prefix'].encode('utf-8'), path, authorization['suffix'].encode('utf-8'))
+        try:
+            upload_response = http_session.post(
+                authorization['url'], data=body, headers={'Content-Type': authorization['contentType']}, timeout=300
+            )
+        finally:
+            if body.file:
+                body.file.close()
+        if upload_response.status_code != 201:
+            raise Exception(f"上传附件文件失败: HTTP {upload_response.status_code}")
+
+        response, _ = self.authorize(attachment_key, {'upload': authorization['uploadKey']}, previous_md5)
+        if response.status_code != 204:
+            raise Exception(f"确认附件上传失败: HTTP {response.status_code}")
+        return md5, True
+
+
+# --- Snapshot Cleanup ---
+# 离线阅读时无用的导航栏、页脚、反馈按钮等页面框架
+SNAPSHOT_CHROME_SELECTORS = [
+    'header.mob_header', 'header.desktop_header', 'nav.ltx_page_navbar', 'div.ar5iv-footer',
+    'footer.ltx_page_footer', 'div.ltx_page_footer', 'div.ltx_page_logo',
+    '#openForm', '#myModal', '#myForm', 'button.sr-only',
+]
+
+# 沉浸式翻译注入的浮动按钮、弹窗与加载动画（译文本身及其样式保留）
+TRANSLATOR_CHROME_SELECTORS = [
+    '[id^="immersive-translate-popup"]', '[class*="immersive-translate-popup"]',
+    '#immersive-translate-toastify-shadow-root', '#immersive-translate-message',
+    '.immersive-translate-loading-spinner', '.immersive-translate-attach-loading',
+    '.immersive-translate-error-wrapper', 'meta[name^="immersive-translate"]',
+]
+
+# 离线时无用的预加载类链接
+OFFLINE_USELESS_LINK_RELS = {'preload', 'prefetch', 'modulepreload', 'dns-prefetch', 'preconnect', 'manifest'}
+
+SNAPSHOT_VARIANT_LABELS = {
+    'translation': '译文',
+    'source': '原文',
+}
+
+# 渐进保存时未翻译快照的附件标题，翻译完成替换后改回 'Snapshot'
+DRAFT_SNAPSHOT_TITLE = 'Snapshot (未翻译)'
+
+
+def format_size(num_bytes):
+    for unit in ('B', 'KB', 'MB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.1f}{unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f}GB"
+
+
+def minify_css(css):
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    # 冒号前的空格在选择器中有意义（如 "a :hover"），因此只去掉冒号后的空格
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    return css.replace(';}', '}').strip()
+
+
+def clean_snapshot(soup):
+    """
+    删除快照中离线无用的页面框架、脚本和翻译插件界面元素，并压缩内联样式。
+    返回删除的元素数量。
+    """
+    removed = 0
+    for selector in SNAPSHOT_CHROME_SELECTORS + TRANSLATOR_CHROME_SELECTORS:
+        for tag in soup.select(selector):
+            tag.decompose()
+            removed += 1
+
+    for tag in soup.find_all(['script', 'link']):
+        if tag.name == 'script' or OFFLINE_USELESS_LINK_RELS.intersection(tag.get('rel') or []):
+            tag.decompose()
+            removed += 1
+
+    # 翻译插件给每个遍历过的元素都加上了标记属性
+    for tag in soup.find_all(attrs={'data-immersive-translate-walked': True}):
+        del tag['data-immersive-translate-walked']
+
+    for style in soup.find_all('style'):
+        if style.string:
+            style.string = minify_css(style.string)
+
+    return removed
+
+
+def apply_snapshot_variant(soup, variant):
+    """
+    将双语快照转换为仅译文（translation）或仅原文（source）版本。
+    """
+    wrappers = soup.select('.immersive-translate-target-wrapper')
+    if variant == 'source':
+        for wrapper in wrappers:
+            wrapper.decompose()
+    elif variant == 'translation':
+        for parent in {id(wrapper.parent): wrapper.parent for wrapper in wrappers}.values():
+            for child in list(parent.contents):
+                if getattr(child, 'get', None) and 'immersive-translate-target-wrapper' in (child.get('class') or []):
+                    continue
+                child.extract()
+    return soup
+
+
+# --- Snapshot Resources ---
+# 样式表中的 url(...) 与 @import "..." 引用
+CSS_REFERENCE_PATTERN = re.compile(
+    r"""url\(\s*(?:"([^"]*)"|'([^']*)'|([^)'"\s]*))\s*\)|@import\s+(?:"([^"]*)"|'([^']*)')""", re.I
+)
+
+# 样式表 @import 的最大嵌套层数，超出部分保留为远程地址
+CSS_IMPORT_MAX_DEPTH = 5
+
+
+def is_remote_url(url):
+    return url.strip().lower().startswith(('http://', 'https://', '//'))
+
+
+def rewrite_css(css, base_url, replace):
+    """
+    将样式表中的每个 url() 与 @import 引用替换为 replace(不含 #fragment 的绝对地址, 是否为 @import) 的返回值，
+    返回 None 时保留原引用。data:、#fragment 等非远程引用不做处理。
+    """
+    def substitute(match):
+        reference = next(group for group in match.groups() if group is not None).strip()
+        if not reference or reference.startswith(('data:', '#')):
+            return match.group(0)
+        is_import = match.group(0).startswith('@')
+        url, fragment = urldefrag(urljoin(base_url, reference))
+        new_reference = replace(url, is_import)
+        if new_reference is None:
+            return match.group(0)
+        if fragment:
+            new_reference = f"{new_reference}#{fragment}"
+        return f'@import "{new_reference}"' if is_import else f'url("{new_reference}")'
+
+    return CSS_REFERENCE_PATTERN.sub(substitute, css)
+
+
+def css_references(css, base_url):
+    """
+    返回样式表中引用的 [(绝对地址, 预期类型)]，@import 的预期类型为 text/css。
+    """
+    references = []
+    rewrite_css(css, base_url, lambda url, is_import: references.append((url, 'text/css' if is_import else None)))
+    return [(url, media_type) for url, media_type in references if is_remote_url(url)]
+
+
+def parse_srcset(srcset):
+    """
+    按 HTML 规范解析 srcset，返回 [(url, 描述符)]。地址只以空白结束，因此可以包含逗号（如 data URL）。
+    """
+    candidates = []
+    position, length = 0, len(srcset)
+    while position < length:
+        while position < length and (srcset[position].isspace() or srcset[position] == ','):
+            position += 1
+        start = position
+        while position < length and not srcset[position].isspace():
+            position += 1
+        url, descriptor = srcset[start:position], ''
+        if url.endswith(','):
+            url = url.rstrip(',')
+        else:
+            end = srcset.find(',', position)
+            end = length if end == -1 else end
+            descriptor = srcset[position:end].strip()
+            position = end + 1
+        if url:
+            candidates.append((url, descriptor))
+    return candidates
+
+
+def best_srcset_candidate(candidates):
+    """
+    选出宽度或像素密度最大的候选图片，离线快照只内联这一张。
+    """
+    def size(candidate):
+        match = re.fullmatch(r'(\d+(?:\.\d+)?)([wx])', candidate[1])
+        return float(match.group(1)) if match else 1.0
+    return max(candidates, key=size)[0] if candidates else None
+
+
+def resource_content_type(url, header_type, expected_type):
+    content_type = (header_type or '').split(';')[0].strip()
+    if not content_type:
+        content_type, _ = mimetypes.guess_type(url.split('?')[0])
+    return content_type or expected_type or 'application/octet-stream'
+
+
+# --- API Translation ---
+# 可翻译的段落元素；包含其他段落元素的外层元素不单独翻译
+TRANSLATABLE_BLOCK_TAGS = ('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'dt', 'dd', 'figcaption', 'caption', 'blockquote')
+# 整体跳过的区域：代码块、公式、导航与参考文献
+UNTRANSLATED_REGION_SELECTOR = ', '.join([
+    'pre', 'code', 'math', 'svg', 'script', 'style', 'nav', 'header', 'footer', '.notranslate',
+    '.ltx_equation', '.ltx_equationgroup', '.ltx_bibliography', '.ltx_page_header', '.ltx_page_footer'
+])
+# 段落内原样保留的元素，发送给翻译接口时替换为 {{n}} 占位符
+PROTECTED_INLINE_TAGS = ('math', 'code', 'kbd', 'samp', 'var', 'svg', 'img', 'cite', 'sup', 'sub')
+PROTECTED_INLINE_CLASSES = ('ltx_Math', 'ltx_ref', 'ltx_note_mark', 'ltx_cite', 'katex', 'MathJax', 'notranslate')
+TRANSLATION_PLACEHOLDER_PATTERN = re.compile(r'\{\{(\d+)\}\}')
+CJK_PATTERN = re.compile(r'[　-ヿ㐀-鿿가-힯＀-￯]')
+
+
+class TranslationFormatError(Exception):
+    """翻译接口返回的内容无法与发送的段落一一对应"""
+
+
+def is_protected_inline(tag):
+    return tag.name in PROTECTED_INLINE_TAGS or any(cls in PROTECTED_INLINE_CLASSES for cls in tag.get('class') or [])
+
+
+def translatable_text(block):
+    """
+    返回 (发送给翻译接口的文本, 占位符对应的元素列表)。
+    """
+    parts, protected = [], []
+
+    def walk(node):
+        for child in node.children:
+            if isinstance(child, Comment):
+                continue
+            if isinstance(child, NavigableString):
+                parts.append(str(child))
+            elif is_protected_inline(child):
+                parts.append(f"{{{{{len(protected)}}}}}")
+                protected.append(child)
+            elif child.name == 'br':
+                parts.append(' ')
+            else:
+                walk(child)
+
+    walk(block)
+    return re.sub(r'\s+', ' ', ''.join(parts)).strip(), protected
+
+
+def extract_translatable_blocks(soup):
+    """
+    提取页面中需要翻译的段落，返回 [{'tag', 'text', 'protected'}]，按文档顺序排列。
+    公式、代码等元素不翻译，只含占位符、数字或符号的段落跳过。
+    """
+    skipped = {id(tag) for region in soup.select(UNTRANSLATED_REGION_SELECTOR) for tag in [region] + region.find_all(True)}
+    blocks = []
+    for tag in soup.find_all(TRANSLATABLE_BLOCK_TAGS):
+        if id(tag) in skipped or tag.find(TRANSLATABLE_BLOCK_TAGS):
+            continue
+        text, protected = translatable_text(tag)
+        if not re.search(r'[^\W\d_]{2,}', TRANSLATION_PLACEHOLDER_PATTERN.sub(' ', text)):
+            continue
+        blocks.append({'tag': tag, 'text': text, 'protected': protected})
+    return blocks
+
+
+def estimate_tokens(text):
+    # 中日韩字符约一个 token 一个字，其他文本约四个字符一个 token
+    cjk = len(CJK_PATTERN.findall(text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def token_batches(texts, budget):
+    """
+    按文档顺序将段落分批，每批估算的 token 数不超过 budget（单个超出预算的段落单独成批），返回下标列表的列表。
+    """
+    batches, batch, used = [], [], 0
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text) + 4  # JSON 引号与分隔符
+        if batch and used + tokens > budget:
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(index)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def placeholders_match(source, translation):
+    return sorted(TRANSLATION_PLACEHOLDER_PATTERN.findall(source)) == sorted(TRANSLATION_PLACEHOLDER_PATTERN.findall(translation))
+
+
+def insert_translation(soup, block, translation, target_lang):
+    """
+    在段落末尾写入与沉浸式翻译扩展相同结构的译文块，占位符还原为原段落中对应元素的副本。
+    """
+    wrapper = soup.new_tag('font', attrs={'class': 'notranslate immersive-translate-target-wrapper', 'lang': target_lang})
+    wrapper.append(soup.new_tag('br'))
+    outer = soup.new_tag('font', attrs={'class': 'notranslate immersive-translate-target-translation-theme-none '
+                                                 'immersive-translate-target-translation-block-wrapper-theme-none '
+                                                 'immersive-translate-target-translation-block-wrapper'})
+    inner = soup.new_tag('font', attrs={'class': 'notranslate immersive-translate-target-inner '
+                                                 'immersive-translate-target-translation-theme-none-inner'})
+    for position, piece in enumerate(TRANSLATION_PLACEHOLDER_PATTERN.split(translation)):
+        if position % 2 == 0:
+            if piece:
+                inner.append(NavigableString(piece))
+            continue
+        element = copy.copy(block['protected'][int(piece)])
+        # 副本与原元素的 id 相同，去掉以免页面内锚点重复
+        for tag in [element] + element.find_all(id=True):
+            tag.attrs.pop('id', None)
+        inner.append(element)
+    outer.append(inner)
+    wrapper.append(outer)
+    block['tag'].append(wrapper)
+
+
+class TranslationClient:
+    """
+    调用翻译接口批量翻译段落。style 为 openai 时使用 OpenAI 兼容的 chat completions 接口（包括智谱 GLM-4 开放平台），
+    为 glm 时使用 ChatGLM api.py 风格的 {'prompt', 'history'} -> {'response'} 接口。
+    """
+    def __init__(self, api_url, api_key, model, style, target_lang, timeout=120, retries=3, backoff=1.0):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+        self.style = style
+        self.target_lang = target_lang
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def prompt(self):
+        return (
+            f"你是专业的学术论文翻译。用户会发送一个 JSON 字符串数组，请将其中每个字符串翻译成 {self.target_lang}。"
+            "形如 {{0}} 的占位符代表公式或代码，必须原样保留在译文中的对应位置。"
+            "只回复一个长度与顺序都相同的 JSON 字符串数组，不要添加任何解释。"
+        )
+
+    def payload(self, texts):
+        content = json.dumps(texts, ensure_ascii=False)
+        if self.style == 'glm':
+            return {'prompt': f"{self.prompt()}\n\n{content}", 'history': []}
+        return {
+            'model': self.model,
+            'messages': [{'role': 'system', 'content': self.prompt()}, {'role': 'user', 'content': content}],
+            'temperature': 0
+        }
+
+    def reply_text(self, data):
+        if self.style == 'glm':
+            return data['response']
+        return data['choices'][0]['message']['content']
+
+    def request(self, texts, cancel_event):
+        """
+        发送一批段落，返回接口回复的文本。经过按主机的限速器，网络错误、5xx、408 与 429 时退避重试，
+        429 / 503 带有 Retry-After 时按其等待。
+        """
+        headers = {'Authorization': f"Bearer {self.api_key}"} if self.api_key else {}
+        for attempt in range(self.retries + 1):
+            host_limiter.acquire(self.api_url, cancel_event)
+            delay = None
+            try:
+                response = http_session.post(self.api_url, json=self.payload(texts), headers=headers, timeout=self.timeout)
+                host_limiter.record(self.api_url, response.status_code, response.headers)
+                response.raise_for_status()
+            except requests.HTTPError as e:
+                status = e.response.status_code
+                if attempt == self.retries or status not in RETRYABLE_STATUS and status < 500:
+                    raise Exception(f"翻译接口返回 HTTP {status}")
+                if status in THROTTLE_STATUS:
+                    delay = parse_retry_after(e.response.headers.get('Retry-After'))
+            except requests.RequestException as e:
+                host_limiter.record(self.api_url)
+                if attempt == self.retries:
+                    raise Exception(f"无法连接翻译接口: {type(e).__name__}")
+            else:
+                try:
+                    return self.reply_text(response.json())
+                except (ValueError, KeyError, IndexError, TypeError):
+                    raise TranslationFormatError("翻译接口的响应格式不正确")
+            if delay is None:
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            if cancel_event.wait(delay):
+                raise TaskCancelled()
+
+    def translate(self, texts, cancel_event):
+        """
+        翻译一批段落，返回与 texts 一一对应的译文列表；回复无法解析或数量不符时抛出 TranslationFormatError。
+        """
+        reply = self.request(texts, cancel_event)
+        start, end = reply.find('['), reply.rfind(']')
+        try:
+            translations = json.loads(reply[start:end + 1]) if start != -1 and end > start else None
+        except ValueError:
+            translations = None
+        if not isinstance(translations, list) or len(translations) != len(texts) \
+                or not all(isinstance(translation, str) for translation in translations):
+            raise TranslationFormatError(f"翻译接口返回的译文与 {len(texts)} 个段落不对应")
+        return [translation.strip() for translation in translations]
+
+
+def translation_client(args):
+    return TranslationClient(
+        args.get('translation_api_url') or 'https://open.bigmodel.cn/api/paas/v4/chat/completions',
+        args.get('translation_api_key', ''),
+        args.get('translation_model') or 'glm-4-flash',
+        args.get('translation_api_style', 'openai'),
+        args.get('translation_target_lang') or 'zh-CN',
+        float(args.get('translation_timeout', 120)),
+        int(args.get('translation_retries', 3)),
+        float(args.get('translation_retry_backoff', 2.0))
+    )
+
+
+# --- DOM Archive ---
+class DomArchive:
+    """
+    按 Arxiv 编号与版本压缩保存翻译完成后的原始 DOM 与基准 URL，
+    修改输出选项或修复内联问题后可据此重新生成快照，而无需重新翻译。
+    """
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+
+    def entry_path(self, arxiv_id, version):
+        return os.path.join(self.root_dir, arxiv_id.replace('/', '_'), f"{version or 'latest'}.json.gz")
+
+    def store(self, entry):
+        path = self.entry_path(entry['arxiv_id'], entry['version'])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return path
+
+    def load(self, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def find(self, arxiv_ids=None):
+        """
+        返回存档路径列表；指定编号时只返回这些编号的存档（带版本号时只返回该版本）。
+        """
+        if not os.path.isdir(self.root_dir):
+            return []
+        if not arxiv_ids:
+            return sorted(os.path.join(root, name)
+                          for root, _, names in os.walk(self.root_dir)
+                          for name in names if name.endswith('.json.gz'))
+        paths = []
+        for arxiv_id, version in arxiv_ids:
+            entry_dir = os.path.dirname(self.entry_path(arxiv_id, version))
+            if version:
+                candidates = [self.entry_path(arxiv_id, version)]
+            elif os.path.isdir(entry_dir):
+                candidates = sorted(os.path.join(entry_dir, name) for name in os.listdir(entry_dir) if name.endswith('.json.gz'))
+            else:
+                candidates = []
+            paths.extend(path for path in candidates if os.path.exists(path))
+        return paths
+
+    def latest(self, arxiv_id, version):
+        """
+        返回该文献（指定版本时为该版本）最近一次存档的路径，没有时返回 None。
+        """
+        paths = self.find([(arxiv_id, version)])
+        return max(paths, key=os.path.getmtime) if paths else None
+
+
+def dom_archive(args):
+    return DomArchive(args.get('dom_archive_dir') or 'archive')
+
+
+# --- Prefetch Cache ---
+class PrefetchCache:
+    """
+    排队任务预取的页面与静态资源的磁盘缓存。每个 URL 一个文件：首行为 JSON 头，其后为响应内容。
+    总大小超过预算时按最近使用时间淘汰。只在创建时扫描一次目录，之后在内存中维护各文件大小与使用顺序。
+    """
+    def __init__(self, root_dir, budget_bytes):
+        self.root_dir = root_dir
+        self.budget_bytes = budget_bytes
+        self.lock = threading.Lock()
+        self.sizes = OrderedDict()  # 文件路径 -> 大小，按最近使用时间从旧到新排列
+        self.size = 0
+        for _, size, path in sorted(self.entries()):
+            self.sizes[path] = size
+            self.size += size
+
+    def entry_path(self, url):
+        digest = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.root_dir, digest[:2], digest)
+
+    def contains(self, url):
+        return os.path.exists(self.entry_path(url))
+
+    def get(self, url):
+        """
+        返回 (content_type, content)，未缓存时返回 None。
+        """
+        path = self.entry_path(url)
+        try:
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                content = f.read()
+            os.utime(path)  # 记录最近使用时间
+        except (OSError, ValueError):
+            return None
+        if header.get('url') != url:
+            return None
+        with self.lock:
+            if path in self.sizes:
+                self.sizes.move_to_end(path)
+        return header.get('content_type'), content
+
+    def put(self, url, content_type, content):
+        path = self.entry_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        header = json.dumps({'url': url, 'content_type': content_type, 'fetched_at': time.time()}).encode('utf-8') + b'\n'
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(content)
+        os.replace(tmp_path, path)
+        with self.lock:
+            self.size += len(header) + len(content) - self.sizes.pop(path, 0)
+            self.sizes[path] = len(header) + len(content)
+        self.evict()
+
+    def discard(self, urls):
+        for url in urls:
+            path = self.entry_path(url)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            with self.lock:
+                self.size -= self.sizes.pop(path, 0)
+
+    def entries(self):
+        entries = []
+        if not os.path.isdir(self.root_dir):
+            return entries
+        for bucket in os.scandir(self.root_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith('.tmp'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def total_size(self):
+        return self.size
+
+    def evict(self):
+        with self.lock:
+            while self.size > self.budget_bytes and self.sizes:
+                path, size = self.sizes.popitem(last=False)
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                self.size -= size
+
+
+prefetch_caches = {}
+prefetch_caches_lock = threading.Lock()
+
+
+def prefetch_cache(args):
+    """
+    返回按目录共享的预取缓存，同一进程内的任务共用一份大小统计。
+    """
+    budget_bytes = float(args.get('prefetch_cache_budget_mb', 200)) * 1024 * 1024
+    root_dir = args.get('prefetch_cache_dir') or 'prefetch'
+    with prefetch_caches_lock:
+        cache = prefetch_caches.get(root_dir)
+        if cache is None:
+            cache = prefetch_caches[root_dir] = PrefetchCache(root_dir, budget_bytes)
+        cache.budget_bytes = budget_bytes
+        return cache
+
+
+# --- Search Index ---
+def extract_bilingual_paragraphs(soup):
+    """
+    从双语快照中提取 (原文, 译文) 段落对：每个译文块的父元素中，译文块以外的内容即为原文。
+    """
+    paragraphs = []
+    wrappers = soup.select('.immersive-translate-target-wrapper')
+    for parent in {id(wrapper.parent): wrapper.parent for wrapper in wrappers}.values():
+        source, translation = [], []
+        for child in parent.contents:
+            is_translation = getattr(child, 'get', None) and 'immersive-translate-target-wrapper' in (child.get('class') or [])
+            text = child.get_text(' ', strip=True) if hasattr(child, 'get_text') else str(child).strip()
+            if text:
+                (translation if is_translation else source).append(text)
+        if source or translation:
+            paragraphs.append((' '.join(source), ' '.join(translation)))
+    return paragraphs
+
+
+class SnapshotIndex:
+    """
+    双语快照的 SQLite FTS5 全文索引，每段保存原文与译文。
+    使用 trigram 分词，中文与英文都可以按子串检索；同一快照重新写入时整体替换。
+    """
+    lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+
+    def connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        self.create_tables(conn)
+        return conn
+
+    def create_tables(self, conn):
+        conn.execute('''CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY, path TEXT UNIQUE, arxiv_id TEXT, version TEXT,
+            title TEXT, item_key TEXT, mtime REAL, size INTEGER, indexed_at REAL)''')
+        try:
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs USING fts5("
+                         "source, translation, snapshot_id UNINDEXED, position UNINDEXED, tokenize='trigram')")
+        except sqlite3.OperationalError:
+            # SQLite 3.34 以前没有 trigram 分词器
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS paragraphs USING fts5("
+                         "source, translation, snapshot_id UNINDEXED, position UNINDEXED)")
+
+    def add(self, path, paragraphs, title='', arxiv_id=None, version=None, item_key=None):
+        stat = os.stat(path)
+        with self.lock, closing(self.connect()) as conn, conn:
+            row = conn.execute('SELECT id FROM snapshots WHERE path = ?', (path,)).fetchone()
+            if row:
+                conn.execute('DELETE FROM paragraphs WHERE snapshot_id = ?', (row[0],))
+                conn.execute('DELETE FROM snapshots WHERE id = ?', (row[0],))
+            snapshot_id = conn.execute(
+                'INSERT INTO snapshots (path, arxiv_id, version, title, item_key, mtime, size, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, arxiv_id, version, title, item_key, stat.st_mtime, stat.st_size, time.time())
+            ).lastrowid
+            conn.executemany(
+                'INSERT INTO paragraphs (source, translation, snapshot_id, position) VALUES (?, ?, ?, ?)',
+                [(source, translation, snapshot_id, position) for position, (source, translation) in enumerate(paragraphs)]
+            )
+
+    def clear(self):
+        """
+        在一个事务中删除并重建全部表。其他进程可能正在使用索引（WAL 模式），因此不直接删除数据库文件。
+        """
+        with self.lock, closing(self.connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DROP TABLE paragraphs')
+            conn.execute('DROP TABLE snapshots')
+            self.create_tables(conn)
+            conn.commit()
+            conn.execute('VACUUM')
+
+    def remove_missing(self):
+        with self.lock, closing(self.connect()) as conn, conn:
+            missing = [(snapshot_id,) for snapshot_id, path in conn.execute('SELECT id, path FROM snapshots') if not os.path.exists(path)]
+            conn.executemany('DELETE FROM paragraphs WHERE snapshot_id = ?', missing)
+            conn.executemany('DELETE FROM snapshots WHERE id = ?', missing)
+        return len(missing)
+
+    def indexed_files(self):
+        with closing(self.connect()) as conn:
+            return {path: (mtime, size) for path, mtime, size in conn.execute('SELECT path, mtime, size FROM snapshots')}
+
+    def search(self, query, limit=50):
+        """
+        返回匹配的段落，按文献分组：[{'path', 'title', 'arxiv_id', 'item_key', 'paragraphs': [{'position', 'source', 'translation'}]}]。
+        少于 3 个字符的词无法使用 trigram 索引，退化为 LIKE 匹配。
+        """
+        terms = query.split()
+        if not terms:
+            return []
+        match_terms = ['"' + term.replace('"', '""') + '"' for term in terms if len(term) >= 3]
+        like_terms = [term for term in terms if len(term) < 3]
+        conditions, params = [], []
+        if match_terms:
+            conditions.append('paragraphs MATCH ?')
+            params.append(' AND '.join(match_terms))
+        for term in like_terms:
+            conditions.append('(paragraphs.source LIKE ? OR paragraphs.translation LIKE ?)')
+            params += [f'%{term}%'] * 2
+        sql = (
+            "SELECT s.path, s.title, s.arxiv_id, s.item_key, paragraphs.position, "
+            "highlight(paragraphs, 0, '[', ']'), highlight(paragraphs, 1, '[', ']') "
+            "FROM paragraphs JOIN snapshots s ON s.id = paragraphs.snapshot_id "
+            f"WHERE {' AND '.join(conditions)} ORDER BY s.id DESC, paragraphs.position LIMIT ?"
+        )
+        with closing(self.connect()) as conn:
+            rows = conn.execute(sql, params + [limit]).fetchall()
+        results = {}
+        for path, title, arxiv_id, item_key, position, source, translation in rows:
+            paper = results.setdefault(path, {'path': path, 'title': title, 'arxiv_id': arxiv_id, 'item_key': item_key, 'paragraphs': []})
+            paper['paragraphs'].append({'position': position, 'source': source, 'translation': translation})
+        return list(results.values())
+
+
+def snapshot_index(args):
+    return SnapshotIndex(args.get('search_index_path') or os.path.join('config', 'search_index.db'))
+
+
+# --- Snapshot Storage ---
+def reflink_file(src, dst):
+    """
+    写时复制（Linux FICLONE / macOS clonefile），文件系统不支持时抛出 OSError。
+    """
+    if sys.platform.startswith('linux'):
+        import fcntl
+        FICLONE = 0x40049409
+        try:
+            with open(src, 'rb') as src_file, open(dst, 'wb') as dst_file:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+            raise
+    elif sys.platform == 'darwin':
+        result = subprocess.run(['cp', '-c', src, dst], capture_output=True)
+        if result.returncode != 0:
+            raise OSError(result.stderr.decode('utf-8', errors='ignore').strip())
+    else:
+        raise OSError("当前平台不支持 reflink")
+
+
+def place_file(src, dst, move=False):
+    """
+    将 src 放到 dst 而不重复写入数据：依次尝试硬链接、reflink，move 为 True 时直接移动，
+    都不可用时才复制。先放到临时文件再原子替换，返回实际使用的方式。
+    """
+    tmp_path = f"{dst}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if move:
+        try:
+            os.replace(src, dst)
+            return 'move'
+        except OSError:
+            # 跨设备时只能复制后删除源文件
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, dst)
+            os.remove(src)
+            return 'copy'
+
+    for method, place in (('hardlink', os.link), ('reflink', reflink_file)):
+        try:
+            place(src, tmp_path)
+            os.replace(tmp_path, dst)
+            return method
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+    return 'copy'
+
+
+def store_snapshot(output_dir, content):
+    """
+    按内容哈希将快照写入 output_dir/.objects，内容相同的快照只写一次。
+    返回 (object_path, 是否新写入)。
+    """
+    data = content.encode('utf-8')
+    digest = hashlib.sha256(data).hexdigest()
+    object_dir = os.path.join(output_dir, '.objects', digest[:2])
+    object_path = os.path.join(object_dir, digest + '.html')
+
+    if os.path.exists(object_path):
+        # 刷新修改时间，避免刚被复用的快照被回收
+        os.utime(object_path)
+        return object_path, False
+
+    os.makedirs(object_dir, exist_ok=True)
+    tmp_path = f"{object_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, object_path)
+    return object_path, True
+
+
+staging_gc_lock = threading.Lock()
+staging_gc_last_run = 0
+
+
+def collect_staging_garbage(output_dir, max_bytes=0, max_age=0):
+    """
+    按时间和总大小清理暂存目录，先删除超过 max_age 秒的文件，再从最旧的开始删除直到总大小不超过 max_bytes。
+    硬链接的多个路径只按一份数据计算。值为 0 表示不限制。返回删除的文件数。
+    """
+    files = []
+    for root, _, names in os.walk(output_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, (stat.st_dev, stat.st_ino), path))
+    files.sort()
+
+    now = time.time()
+    removed = []
+    links = {}
+    sizes = {}
+    for mtime, size, inode, path in files:
+        links[inode] = links.get(inode, 0) + 1
+        sizes[inode] = size
+    total = sum(sizes.values())
+
+    for mtime, size, inode, path in files:
+        expired = max_age and now - mtime > max_age
+        oversized = max_bytes and total > max_bytes
+        if not (expired or oversized):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        removed.append(path)
+        links[inode] -= 1
+        if links[inode] == 0:
+            total -= size
+
+    # 清理空的对象子目录
+    objects_dir = os.path.join(output_dir, '.objects')
+    if os.path.isdir(objects_dir):
+        for name in os.listdir(objects_dir):
+            sub_dir = os.path.join(objects_dir, name)
+            if os.path.isdir(sub_dir) and not os.listdir(sub_dir):
+                os.rmdir(sub_dir)
+
+    return len(removed)
+
+
+def maybe_collect_staging_garbage(args, interval=600):
+    """
+    按配置的保留策略清理暂存目录，多个任务结束时最多每 interval 秒执行一次。
+    """
+    global staging_gc_last_run
+    max_bytes = float(args.get('staging_max_size_mb', 0)) * 1024 * 1024
+    max_age = float(args.get('staging_max_age_days', 0)) * 24 * 3600
+    if not (max_bytes or max_age) or not os.path.isdir(args['output_dir']):
+        return
+
+    with staging_gc_lock:
+        if time.time() - staging_gc_last_run < interval:
+            return
+        staging_gc_last_run = time.time()
+        removed = collect_staging_garbage(args['output_dir'], max_bytes, max_age)
+    if removed:
+        print(f"已清理暂存目录中的 {removed} 个文件")
+
+# 等待页面 / 下载时检查取消请求的间隔（秒）
+CANCEL_POLL_INTERVAL = 0.25
+
+TRANSLATION_SPINNER_SELECTOR = 'font.immersive-translate-loading-spinner.notranslate'
+
+
+class TaskCancelled(Exception):
+    def __init__(self):
+        super().__init__("Cancel Task")
+
+
+class CancelEvent(threading.Event):
+    """
+    记录取消请求发出时间的 Event，用于统计取消实际生效的耗时。
+    """
+    def __init__(self):
+        super().__init__()
+        self.requested_at = None
+
+    def set(self):
+        if self.requested_at is None:
+            self.requested_at = time.monotonic()
+        super().set()
+
+
+# 除 5xx 外值得重试的 HTTP 状态码
+RETRYABLE_STATUS = (408, 429)
+
+# 下载失败的图片在 placeholder 策略下替换为的占位图
+RESOURCE_PLACEHOLDER = 'data:image/svg+xml;base64,' + base64.b64encode(
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="240" height="60">'
+    b'<rect width="100%" height="100%" fill="#eee" stroke="#bbb"/>'
+    b'<text x="50%" y="50%" font-size="14" fill="#888" text-anchor="middle" dominant-baseline="middle">Image unavailable</text>'
+    b'</svg>'
+).decode('ascii')
+
+JOB_STAGES = [
+    "(1/7) 转换 Arxiv url",
+    "(2/7) 启动浏览器并加载扩展",
+    "(3/7) 访问目标网页",
+    "(4/7) 等待页面内容翻译完成",
+    "(5/7) 页面内容已加载并解析",
+    "(6/7) 下载并编码资源",
+    "(7/7) 保存到 Zotero"
+]
+
+# --- Job Trace ---
+class JobTrace:
+    """
+    记录单个任务各阶段耗时、浏览器网络请求瀑布、控制台错误以及资源下载耗时，
+    以 Chrome trace event 格式写出，可在 chrome://tracing 或 Perfetto 中查看。
+    """
+    STAGE_TID = 1
+    BROWSER_TID = 2
+
+    def __init__(self, job_id, url):
+        self.job_id = job_id
+        self.url = url
+        self.events = []
+        self.lock = threading.Lock()
+        self.current_stage = None
+        self.pending_requests = {}
+        self.request_ids = 0
+        self.add({'name': 'thread_name', 'ph': 'M', 'tid': self.STAGE_TID, 'args': {'name': '任务阶段'}})
+        self.add({'name': 'thread_name', 'ph': 'M', 'tid': self.BROWSER_TID, 'args': {'name': '浏览器'}})
+
+    @staticmethod
+    def now():
+        return time.time() * 1e6
+
+    def add(self, event):
+        event.setdefault('pid', 1)
+        with self.lock:
+            self.events.append(event)
+
+    def complete(self, name, cat, start, end, tid, args=None):
+        self.add({'name': name, 'cat': cat, 'ph': 'X', 'ts': start, 'dur': max(end - start, 0), 'tid': tid, 'args': args or {}})
+
+    def instant(self, name, cat, args=None, tid=None):
+        self.add({'name': name, 'cat': cat, 'ph': 'i', 's': 't', 'ts': self.now(), 'tid': tid or self.STAGE_TID, 'args': args or {}})
+
+    def begin_stage(self, name):
+        now = self.now()
+        if self.current_stage:
+            self.complete(self.current_stage[0], 'stage', self.current_stage[1], now, self.STAGE_TID)
+        self.current_stage = (name, now) if name else None
+
+    @contextmanager
+    def span(self, name, cat, **args):
+        """
+        记录当前线程中一段操作的耗时，args 可在操作过程中补充。
+        """
+        tid = threading.get_ident()
+        start = self.now()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = str(e) or type(e).__name__
+            raise
+        finally:
+            self.complete(name, cat, start, self.now(), tid, args)
+
+    def attach(self, page):
+        """
+        监听页面的网络请求与控制台错误，每个请求记录为一段异步事件。
+        """
+        # 状态码从 response 事件中取得，sync 与 async API 下都无需等待
+        statuses = {}
+
+        def on_request(request):
+            with self.lock:
+                self.request_ids += 1
+                self.pending_requests[request] = (self.request_ids, self.now())
+
+        def on_request_done(request, failure=None):
+            with self.lock:
+                pending = self.pending_requests.pop(request, None)
+            if not pending:
+                return
+            request_id, start = pending
+            args = {'url': request.url, 'method': request.method, 'resource_type': request.resource_type}
+            end = self.now()
+            try:
+                timing = request.timing
+                # Playwright 的时间以请求开始为基准（毫秒），-1 表示不适用
+                if timing.get('startTime', -1) > 0:
+                    start = timing['startTime'] * 1000
+                    if timing.get('responseEnd', -1) >= 0:
+                        end = start + timing['responseEnd'] * 1000
+                    args['timing'] = timing
+            except Exception:
+                pass
+            if failure:
+                args['failure'] = failure
+            elif request in statuses:
+                args['status'] = statuses.pop(request)
+            self.network_event(request_id, request.url, start, max(end, start), args)
+
+        def on_console(message):
+            if message.type == 'error':
+                self.instant('console.error', 'console', {'text': message.text}, tid=self.BROWSER_TID)
+
+        page.on('request', on_request)
+        page.on('response', lambda response: statuses.__setitem__(response.request, response.status))
+        page.on('requestfinished', on_request_done)
+        page.on('requestfailed', lambda request: on_request_done(request, request.failure or 'failed'))
+        page.on('console', on_console)
+        page.on('pageerror', lambda error: self.instant('pageerror', 'console', {'text': str(error)}, tid=self.BROWSER_TID))
+
+    def network_event(self, request_id, url, start, end, args):
+        name = url if len(url) <= 120 else url[:117] + '...'
+        self.add({'name': name, 'cat': 'network', 'ph': 'b', 'id': request_id, 'ts': start, 'tid': self.BROWSER_TID, 'args': args})
+        self.add({'name': name, 'cat': 'network', 'ph': 'e', 'id': request_id, 'ts': end, 'tid': self.BROWSER_TID})
+
+    def save(self, trace_dir, outcome, arxiv_id=None):
+        """
+        结束当前阶段并写出 trace 文件。仍未完成的请求记到结束时刻并标记为 pending，便于找出拖慢任务的请求。
+        """
+        self.begin_stage(None)
+        now = self.now()
+        with self.lock:
+            pending, self.pending_requests = self.pending_requests, {}
+        for request, (request_id, start) in pending.items():
+            self.network_event(request_id, request.url, start, now, {'url': request.url, 'pending': True})
+
+        os.makedirs(trace_dir, exist_ok=True)
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-job{self.job_id}-{(arxiv_id or 'unknown').replace('/', '_')}.json"
+        path = os.path.join(trace_dir, name)
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'traceEvents': events,
+                'displayTimeUnit': 'ms',
+                'otherData': {'job_id': self.job_id, 'url': self.url, 'outcome': outcome}
+            }, f, ensure_ascii=False)
+        return path
+
+
+# --- Browser Profile Pool ---
+class ProfilePool:
+    """
+    Chromium 会锁定用户数据目录，因此将配置的目录克隆为多个工作副本，供并行任务各自独占。
+    克隆优先使用写时复制（reflink）；Chromium 会原地追加写入部分文件，因此不使用硬链接。
+    遍历整个源目录计算标识的开销较大，借出时只按 WATCH_TTL 间隔检查插件设置相关文件的修改时间，
+    有变化时才重新计算标识；配置变化（refresh）时也会重新计算。
+    退出时只删除本进程创建的 worker-N 副本，profile_pool_dir 可能指向已有的目录。
+    """
+    WATCH_PATHS = (('Default', 'Preferences'), ('Default', 'Local Extension Settings'))
+    WATCH_TTL = 5
+
+    def __init__(self, source_dir, root_dir, size):
+        self.source_dir = source_dir
+        self.root_dir = root_dir
+        self.size = size
+        self.lock = threading.Lock()
+        self.available = queue.Queue()
+        self.prepared = False
+        self.stamp = None
+        self.watch_stamp = None
+        self.watched_at = 0
+        self.clone_stamps = {}  # 副本目录 -> 克隆时源目录的标识
+        atexit.register(self.cleanup)
+
+    def source_stamp(self):
+        # 用文件数、总大小与最后修改时间标识源目录的内容
+        count, total_size, latest_mtime = 0, 0, 0
+        for root, _, names in os.walk(self.source_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                if os.path.islink(path):
+                    continue
+                stat = os.stat(path)
+                count += 1
+                total_size += stat.st_size
+                latest_mtime = max(latest_mtime, stat.st_mtime)
+        return f"{count}:{total_size}:{latest_mtime}"
+
+    def watched_mtimes(self):
+        # 插件设置保存在 Preferences 与 Local Extension Settings（LevelDB，原地追加写入）中，逐个文件取修改时间
+        paths = []
+        for parts in self.WATCH_PATHS:
+            path = os.path.join(self.source_dir, *parts)
+            if os.path.isdir(path):
+                paths += [os.path.join(root, name) for root, _, names in os.walk(path) for name in names]
+            else:
+                paths.append(path)
+        mtimes = []
+        for path in sorted(paths):
+            try:
+                mtimes.append((path, os.stat(path).st_mtime))
+            except OSError:
+                pass
+        return mtimes
+
+    def check_source(self):
+        # 调用方需持有 self.lock
+        now = time.monotonic()
+        if now - self.watched_at < self.WATCH_TTL:
+            return
+        self.watched_at = now
+        watch_stamp = self.watched_mtimes()
+        if watch_stamp != self.watch_stamp:
+            if self.watch_stamp is not None:
+                self.stamp = self.source_stamp()
+            self.watch_stamp = watch_stamp
+
+    def clone(self, profile_dir, stamp):
+        if os.path.exists(profile_dir):
+            shutil.rmtree(profile_dir)
+        for root, _, names in os.walk(self.source_dir):
+            target_root = os.path.join(profile_dir, os.path.relpath(root, self.source_dir))
+            os.makedirs(target_root, exist_ok=True)
+            for name in names:
+                src = os.path.join(root, name)
+                # 跳过 SingletonLock 等指向运行中浏览器的符号链接
+                if os.path.islink(src):
+                    continue
+                dst = os.path.join(target_root, name)
+                try:
+                    reflink_file(src, dst)
+                except OSError:
+                    shutil.copy2(src, dst)
+        self.clone_stamps[profile_dir] = stamp
+
+    def add_profiles(self, start, stop):
+        # 调用方需持有 self.lock
+        for index in range(start, stop):
+            profile_dir = os.path.join(self.root_dir, f"worker-{index}")
+            self.clone(profile_dir, self.stamp)
+            self.available.put(profile_dir)
+
+    def prepare(self):
+        with self.lock:
+            if self.prepared:
+                return
+            self.stamp = self.source_stamp()
+            self.check_source()
+            self.add_profiles(0, self.size)
+            self.prepared = True
+            print(f"已准备 {self.size} 个浏览器用户数据副本: {self.root_dir}")
+
+    def resize(self, size):
+        """
+        增大并行数时只克隆新增的副本，已借出的副本仍由持有它的浏览器独占。
+        """
+        with self.lock:
+            if size <= self.size:
+                return
+            if self.prepared:
+                self.add_profiles(self.size, size)
+                print(f"已增加 {size - self.size} 个浏览器用户数据副本: {self.root_dir}")
+            self.size = size
+
+    def refresh(self):
+        # 配置变化后重新计算源目录标识，副本在下次借出时按需重新克隆
+        with self.lock:
+            if self.prepared:
+                self.stamp = self.source_stamp()
+                self.watched_at, self.watch_stamp = time.monotonic(), self.watched_mtimes()
+
+    def is_stale(self, profile_dir):
+        return self.stamp is not None and self.clone_stamps.get(profile_dir) != self.stamp
+
+    def acquire(self):
+        self.prepare()
+        profile_dir = self.available.get()
+        # 源目录变化（如在浏览器中更新了翻译插件的设置）后重新克隆
+        with self.lock:
+            self.check_source()
+            stamp = self.stamp
+        if self.clone_stamps.get(profile_dir) != stamp:
+            self.clone(profile_dir, stamp)
+        return profile_dir
+
+    def release(self, profile_dir):
+        self.available.put(profile_dir)
+
+    def cleanup(self):
+        for profile_dir in list(self.clone_stamps):
+            shutil.rmtree(profile_dir, ignore_errors=True)
+        try:
+            os.rmdir(self.root_dir)  # 只在目录已空时删除
+        except OSError:
+            pass
+
+
+profile_pools = {}
+profile_pools_lock = threading.Lock()
+
+
+def get_profile_pool(args):
+    """
+    并行任务数大于 1 时返回共享的用户数据目录池，否则返回 None（直接使用配置的目录）。
+    """
+    size = int(args.get('max_parallel_jobs', 1) or 1)
+    if size <= 1:
+        return None
+    source_dir = resource_path(args['user_data_dir'])
+    root_dir = args.get('profile_pool_dir') or source_dir.rstrip(os.sep) + '_pool'
+    with profile_pools_lock:
+        key = (source_dir, root_dir)
+        pool = profile_pools.get(key)
+        if pool is None:
+            pool = profile_pools[key] = ProfilePool(source_dir, root_dir, size)
+        else:
+            pool.resize(size)
+        return pool
+
+
+# --- Browser Session ---
+def browser_launch_args(extension_path):
+    return [
+        "--headless=new",
+        f'--disable-extensions-except={extension_path}',
+        f'--load-extension={extension_path}',
+    ]
+
+
+class BrowserSession:
+    """
+    每个执行线程持有一个常驻的 Playwright 与浏览器上下文，在多个任务间复用。
+    sync API 的对象只能在创建它的线程中使用，因此按线程保存。
+    使用用户数据目录池时，会话在存续期间独占一个副本。
+    """
+    local = threading.local()
+
+    def __init__(self, user_data_dir, extension_path, pool=None):
+        self.key = (user_data_dir, extension_path)
+        self.pool = pool
+        self.profile_dir = pool.acquire() if pool else user_data_dir
+        self.closed = False
+        try:
+            self.playwright = sync_playwright().start()
+        except Exception:
+            self.release_profile()
+            raise
+        try:
+            self.context = self.playwright.chromium.launch_persistent_context(
+                user_data_dir=self.profile_dir,
+                headless=False,
+                args=browser_launch_args(extension_path),
+            )
+        except Exception:
+            self.playwright.stop()
+            self.release_profile()
+            raise
+        self.context.on('close', lambda _: setattr(self, 'closed', True))
+
+    def release_profile(self):
+        if self.pool:
+            self.pool.release(self.profile_dir)
+            self.pool = None
+
+    def close(self):
+        try:
+            if not self.closed:
+                self.context.close()
+        except Exception:
+            pass
+        finally:
+            self.closed = True
+            self.playwright.stop()
+            self.release_profile()
+
+    def is_stale(self):
+        return self.closed or (self.pool is not None and self.pool.is_stale(self.profile_dir))
+
+    @classmethod
+    def acquire(cls, user_data_dir, extension_path, pool=None):
+        session = getattr(cls.local, 'session', None)
+        if session and (session.is_stale() or session.key != (user_data_dir, extension_path)):
+            cls.discard()
+            session = None
+        if session is None:
+            session = cls(user_data_dir, extension_path, pool)
+            cls.local.session = session
+        return session
+
+    @classmethod
+    def discard(cls):
+        session = getattr(cls.local, 'session', None)
+        if session:
+            cls.local.session = None
+            session.close()
+
+
+# --- Worker Signals ---
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, int)     # (job_id, progress_value)
+    title = pyqtSignal(int, str)        # (job_id, title)
+    finished = pyqtSignal(int, str)     # (job_id, filepath)
+    error = pyqtSignal(int, str)        # (job_id, error_message)
+    cancelled = pyqtSignal(int, float)  # (job_id, 取消生效耗时/秒)
+    degraded = pyqtSignal(int, list)    # (job_id, 下载失败的资源 [{'url', 'error'}])
+
+
+# --- Worker Class ---
+# 渐进保存已创建、尚未替换为翻译版本的条目，按 (arxiv_id, version) 记录，重试时复用而不重复创建
+saved_drafts = {}
+saved_drafts_lock = threading.Lock()
+
+
+class SavePageWorker:
+    def __init__(self, job_id, url, args, signals, cancel_event):
+        self.job_id = job_id  # 任务 ID，用于更新表格中的对应项
+        self.url = url
+        self.args = args
+        self.signals = signals
+        self.cancel_event = cancel_event
+        self.stages = JOB_STAGES
+        self.trace = JobTrace(job_id, url) if args.get('trace_enabled', False) else None
+        # 排队时预取的页面与资源
+        self.cache = prefetch_cache(args) if int(args.get('prefetch_jobs', 2) or 0) > 0 else None
+        # 渐进保存时未翻译快照的附件，以及为它下载的资源（生成翻译后的快照时直接复用）
+        self.draft = None
+        self.draft_resources = {}
+        # 已为草稿创建但附件未保存成功的条目，最终保存时复用，避免同一论文出现两个条目
+        self.draft_item_key = None
+        host_limiter.configure(args)
+
+    def set_stage(self, stage):
+        if self.trace:
+            self.trace.begin_stage(self.stages[stage - 1])
+        self.signals.progress.emit(self.job_id, stage)
+
+    def trace_span(self, name, cat, **args):
+        return self.trace.span(name, cat, **args) if self.trace else nullcontext(args)
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise TaskCancelled()
+
+    def wait_cancellable(self, wait_fn, timeout_ms):
+        """
+        将 Playwright 的长时间等待拆成短轮询，每轮之间检查取消请求。
+        wait_fn 接收本轮的超时时间（毫秒），超时抛出 PlaywrightTimeoutError。
+        """
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                raise PlaywrightTimeoutError(f"Timeout {timeout_ms}ms exceeded")
+            try:
+                return wait_fn(min(CANCEL_POLL_INTERVAL * 1000, remaining_ms))
+            except PlaywrightTimeoutError:
+                self.check_cancelled()
+    
+    def check_arxiv_date_and_modify_url(self, arxiv_url):
+        # 支持的链接格式提示
+        supported_formats = """
+        支持的 Arxiv 链接格式：
+        1. https://arxiv.org/abs/{YYMM}.{NNNNN}
+        2. https://arxiv.org/html/{YYMM}.{NNNNN}
+        3. https://arxiv.org/pdf/{YYMM}.{NNNNN}
+        4. https://ar5iv.org/abs/{YYMM}.{NNNNN}
+        5. https://ar5iv.labs.arxiv.org/html/{YYMM}.{NNNNN}
+        6. arxiv.org/abs/{YYMM}.{NNNNN} (无 https 前缀)
+        7. ar5iv.labs.arxiv.org/html/{YYMM}.{NNNNN} (无 https 前缀)
+        8. arxiv:YYMM.NNNNN (Zotero 中的 Arxiv 链接格式)
+        9. 2015 年以前的 4 位编号 {YYMM}.{NNNN}
+        10. 旧式编号 {archive}/{YYMMNNN}，如 hep-th/9901001、arxiv:math.AG/0101001
+        """
+
+        arxiv_url = arxiv_url.replace(' ', '')
+        arxiv_id, version = parse_arxiv_id(arxiv_url)
+        if not arxiv_id:
+            print("无效的 Arxiv 链接格式")
+            print(supported_formats)
+            return None
+
+        # 旧式编号的年月位于 / 之后，91 年以后为 19xx
+        yymm = arxiv_id.split('/')[-1][:4]
+        paper_year = int(yymm[:2]) + (1900 if int(yymm[:2]) >= 91 else 2000)
+        paper_month = int(yymm[2:4])
+
+        now = datetime.now()
+        months_since = (now.year - paper_year) * 12 + (now.month - paper_month)
+
+        # 判断当前日期是否在本月或下月前5天，此时 ar5iv 通常尚未渲染；ar5iv 只有最新版本，指定版本时同样使用 arxiv.org/html
+        if version or months_since == 0 or (months_since == 1 and now.day <= 5):
+            return f"https://arxiv.org/html/{arxiv_id}{version}"
+        else:
+            return f"https://ar5iv.labs.arxiv.org/html/{arxiv_id}"
+
+    def resolve_source(self, arxiv_url):
+        """
+        在启动浏览器前探测实际可用的渲染来源，探测失败时沿用按日期猜测的链接。
+        """
+        arxiv_id, version = parse_arxiv_id(arxiv_url)
+        if not arxiv_id:
+            return arxiv_url
+
+        prefer_html = 'ar5iv' not in arxiv_url
+        ttl = float(self.args.get('source_cache_ttl_hours', 168)) * 3600
+        resolved_url = source_resolver.resolve(arxiv_id, version, prefer_html, ttl=ttl)
+        if resolved_url and resolved_url != arxiv_url:
+            print(f"探测到可用来源: {resolved_url}")
+        return resolved_url or arxiv_url
+
+    def run(self):
+        try:
+            arxiv_url = self.resolve_job_url()
+
+            # 已有该文献的翻译存档时直接重新生成快照，不再启动浏览器翻译
+            archive_path = self.find_archived_dom()
+            if archive_path:
+                output_filepath = self.rerender_archived(archive_path)
+                self.report_finished(output_filepath)
+                return
+
+            if self.args.get('translation_engine', 'extension') == 'api':
+                self.check_paths(browser=False)
+                output_filepath = self.translate_page(arxiv_url)
+                self.report_finished(output_filepath)
+                return
+
+            self.check_cancelled()
+            self.set_stage(2)  # Stage 2
+            self.check_paths()
+
+            # 浏览器在同一线程的多个任务间保持常驻，每个任务只打开自己的页面
+            session = BrowserSession.acquire(
+                resource_path(self.args['user_data_dir']),
+                resource_path(self.args['extension_path']),
+                get_profile_pool(self.args)
+            )
+            page = session.context.new_page()
+            if self.trace:
+                self.trace.attach(page)
+            # 无论正常结束、出错还是被取消，都在本线程内立即关闭页面释放资源
+            try:
+                output_filepath = self.save_page(page, arxiv_url)
+            finally:
+                try:
+                    page.close()
+                except Exception:
+                    pass
+                if session.closed or not self.args.get('keep_browser_warm', True):
+                    BrowserSession.discard()
+
+            self.report_finished(output_filepath)
+
+        except TaskCancelled:
+            self.report_cancelled()
+        except Exception as e:
+            self.report_error(e)
+
+    def resolve_job_url(self):
+        self.check_cancelled()
+        self.set_stage(1)  # Stage 1
+        arxiv_url = self.check_arxiv_date_and_modify_url(self.url)
+        if not arxiv_url:
+            raise Exception("不合法的 Arxiv 路径")
+        arxiv_url = self.resolve_source(arxiv_url)
+        self.arxiv_id, self.arxiv_version = parse_arxiv_id(arxiv_url)
+        # 元数据请求在后台进行，与浏览器及翻译阶段并行
+        metadata_fetcher().prefetch([self.arxiv_id])
+        return arxiv_url
+
+    def check_paths(self, browser=True):
+        # Launch browser and load extension if needed
+        if browser and not os.path.exists(resource_path(self.args['user_data_dir'])):
+            raise Exception(f"无法找到用户数据目录: {resource_path(self.args['user_data_dir'])}")
+
+        if browser and not os.path.exists(resource_path(self.args['extension_path'])):
+            raise Exception(f"无法找到扩展目录: {resource_path(self.args['extension_path'])}")
+        
+        if not os.path.exists(self.args['zotero_storage']):
+            raise Exception(f"无法找到 Zotero 存储目录: {self.args['zotero_storage']}")
+
+    def find_archived_dom(self):
+        if not self.args.get('reuse_dom_archive', True):
+            return None
+        return dom_archive(self.args).latest(self.arxiv_id, self.arxiv_version)
+
+    def rerender_archived(self, archive_path):
+        print(f"使用已存档的翻译结果: {archive_path}")
+        output_filepath = self.rerender(dom_archive(self.args).load(archive_path), update_existing=False)
+        maybe_collect_staging_garbage(self.args)
+        return output_filepath
+
+    def report_finished(self, output_filepath):
+        self.check_cancelled()
+        self.save_trace('finished')
+        self.signals.finished.emit(self.job_id, output_filepath)
+
+    def report_cancelled(self):
+        self.save_trace('cancelled')
+        requested_at = getattr(self.cancel_event, 'requested_at', None)
+        if requested_at is not None:
+            elapsed = time.monotonic() - requested_at
+            print(f"Job {self.job_id} 已取消，耗时 {elapsed:.2f}s 生效")
+            self.signals.cancelled.emit(self.job_id, elapsed)
+
+    def report_error(self, error):
+        self.save_trace('error')
+        self.signals.error.emit(self.job_id, str(error))
+
+    def save_trace(self, outcome):
+        if not self.trace:
+            return
+        try:
+            path = self.trace.save(self.args.get('trace_dir') or 'traces', outcome, getattr(self, 'arxiv_id', None))
+            print(f"Job {self.job_id} 的 trace 已保存: {path}")
+        except Exception as e:
+            print(f"保存 trace 失败: {e}")
+
+    def save_page(self, page, arxiv_url):
+        self.check_cancelled()
+        self.set_stage(3)  # Stage 3
+
+        # Navigate to URL
+        self.route_prefetched(page)
+        self.navigate(page, arxiv_url)
+        self.wait_cancellable(lambda timeout: page.wait_for_load_state('networkidle', timeout=timeout), 30000)
+
+        page_title = page.title()
+        page_title = re.sub(r'\[.*\]', '', page_title).strip()
+        
+        self.check_cancelled()
+        self.signals.title.emit(self.job_id, page_title)
+
+        if self.args.get('progressive_save', False):
+            draft_filename = re.sub(r'\[.*?\]', '', page.title()).strip() + ".html"
+            self.save_draft(page_title, draft_filename, page.content(), page.url)
+
+        self.check_cancelled()
+        self.set_stage(4)  # Stage 4
+        # Wait for translation (adjust selector as needed)
+        try:
+            self.wait_cancellable(
+                lambda timeout: page.wait_for_selector(TRANSLATION_SPINNER_SELECTOR, state='detached', timeout=timeout),
+                1200000
+            )
+        except PlaywrightTimeoutError:
+            raise Exception("等待翻译完成超时，可能翻译尚未完成")
+
+        self.check_cancelled()
+        self.set_stage(5)  # Stage 5
+        output_filename = re.sub(r'\[.*?\]', '', page.title()).strip() + ".html"
+        return self.save_translated(page_title, output_filename, page.content(), page.url)
+
+    def save_translated(self, page_title, output_filename, html_content, base_url):
+        self.archive_dom(page_title, output_filename, html_content, base_url)
+
+        soup = self.render_snapshot(html_content, base_url)
+        snapshots, output_filepath = self.write_snapshots(soup, output_filename)
+        output_filepath = self.save_to_zotero(page_title, snapshots, output_filepath)
+
+        maybe_collect_staging_garbage(self.args)
+        return output_filepath
+
+    def translate_page(self, arxiv_url):
+        """
+        不启动浏览器的翻译流程：直接下载页面，经翻译接口翻译后写入与扩展相同结构的双语标记，之后与浏览器流程相同。
+        """
+        self.check_cancelled()
+        self.set_stage(3)  # Stage 3
+        cached = self.cached_resource(arxiv_url, 'text/html')
+        if cached:
+            content, base_url = cached[1], arxiv_url
+        else:
+            response, content = self.download_resource(arxiv_url)
+            base_url = response.url
+        html_content = content.decode('utf-8', 'replace')
+        soup = BeautifulSoup(html_content, 'html.parser')
+        title = soup.title.get_text(strip=True) if soup.title else self.arxiv_id
+        page_title = re.sub(r'\[.*\]', '', title).strip()
+        output_filename = re.sub(r'\[.*?\]', '', title).strip() + ".html"
+
+        self.check_cancelled()
+        self.signals.title.emit(self.job_id, page_title)
+
+        if self.args.get('progressive_save', False):
+            self.save_draft(page_title, output_filename, html_content, base_url)
+
+        self.check_cancelled()
+        self.set_stage(4)  # Stage 4
+        self.translate_document(soup)
+
+        self.check_cancelled()
+        self.set_stage(5)  # Stage 5
+        return self.save_translated(page_title, output_filename, str(soup), base_url)
+
+    def translate_document(self, soup):
+        """
+        提取页面中的段落，按 token 预算分批并发调用翻译接口，在每段之后写入译文。
+        """
+        client = translation_client(self.args)
+        blocks = extract_translatable_blocks(soup)
+        texts = [block['text'] for block in blocks]
+        batches = token_batches(texts, int(self.args.get('translation_batch_tokens', 2000)))
+        translations = [None] * len(texts)
+
+        def translate(batch):
+            with self.trace_span(f"{len(batch)} 段", 'translate', segments=len(batch)):
+                self.check_cancelled()
+                for index, translation in zip(batch, self.translate_batch(client, [texts[index] for index in batch])):
+                    translations[index] = translation
+
+        executor = ThreadPoolExecutor(max_workers=max(1, int(self.args.get('translation_concurrency', 4))))
+        try:
+            pending = {executor.submit(translate, batch) for batch in batches}
+            with tqdm(total=len(pending), desc="Translating") as progress:
+                while pending:
+                    done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    progress.update(len(done))
+                    self.check_cancelled()
+                    for future in done:
+                        future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        translated = 0
+        for block, translation in zip(blocks, translations):
+            if translation is not None:
+                insert_translation(soup, block, translation, client.target_lang)
+                translated += 1
+        if blocks and not translated:
+            raise Exception("翻译接口没有返回可用的译文")
+        print(f"已翻译 {translated}/{len(blocks)} 段（{len(batches)} 批）")
+
+    def translate_batch(self, client, texts):
+        """
+        翻译一批段落，返回与 texts 一一对应的译文，无法翻译的段落为 None。回复与段落数量不符时对半拆分重试，
+        占位符与原文不一致的段落单独重试一次。
+        """
+        try:
+            translations = client.translate(texts, self.cancel_event)
+        except TranslationFormatError as e:
+            if len(texts) == 1:
+                print(f"段落翻译失败，保留原文: {e}")
+                return [None]
+            middle = len(texts) // 2
+            return self.translate_batch(client, texts[:middle]) + self.translate_batch(client, texts[middle:])
+
+        for index, (text, translation) in enumerate(zip(texts, translations)):
+            if placeholders_match(text, translation):
+                continue
+            if len(texts) > 1:
+                translations[index] = self.translate_batch(client, [text])[0]
+            else:
+                print(f"译文中的公式或代码占位符与原文不一致，保留原文: {text[:60]}")
+                translations[index] = None
+        return translations
+
+    def navigate(self, page, url):
+        """
+        经按主机限速后打开页面，被要求降速（429 / 503）时等限速器放行后重试。
+        """
+        retries = int(self.args.get('resource_retries', 3))
+        for attempt in range(retries + 1):
+            if not (self.cache and self.cache.contains(url)):
+                host_limiter.acquire(url, self.cancel_event)
+            self.check_cancelled()
+            response = page.goto(url, wait_until='commit')
+            status = response.status if response else None
+            host_limiter.record(url, status, response.headers if response else None)
+            if status not in THROTTLE_STATUS:
+                return
+            print(f"访问 {url} 被要求降速（HTTP {status}），第 {attempt + 1} 次")
+        raise Exception(f"访问 {url} 多次被要求降速（HTTP {status}）")
+
+    def route_prefetched(self, page):
+        """
+        浏览器请求已预取的页面或资源时直接从缓存返回。
+        """
+        if not self.cache:
+            return
+
+        def fulfill(route):
+            entry = self.cache.get(route.request.url) if route.request.method == 'GET' else None
+            if entry is None:
+                route.continue_()
+            else:
+                route.fulfill(status=200, content_type=entry[0], body=entry[1])
+
+        page.route(self.cache.contains, fulfill)
+
+    def prefetch(self, source_url):
+        """
+        在任务排队时下载页面及其引用的静态资源（含样式表中的嵌套引用）到预取缓存，返回写入缓存的 URL 列表。
+        """
+        stored = []
+        entry = self.cache.get(source_url)
+        if entry:
+            html, base_url = entry[1].decode('utf-8', 'replace'), source_url
+        else:
+            host_limiter.acquire(source_url, self.cancel_event)
+            response = http_session.get(source_url, timeout=20)
+            host_limiter.record(source_url, response.status_code, response.headers)
+            response.raise_for_status()
+            html, base_url = response.text, response.url
+            # 发生重定向时相对地址的基准不同，页面本身仍由浏览器加载
+            if response.url == source_url:
+                self.cache.put(source_url, response.headers.get('Content-Type') or 'text/html', response.content)
+                stored.append(source_url)
+
+        # 浏览器会加载页面中的全部资源（包括快照清理时才删除的脚本），调用方应关闭 snapshot_cleanup
+        soup, resources = self.prepare_snapshot(html, base_url)
+        fetched, degraded = {}, []
+        for urls in self.resource_rounds(resources, fetched):
+            self.download_round(urls, fetched, degraded)
+        for url, (content_type, content) in fetched.items():
+            if not self.cache.contains(url):
+                self.cache.put(url, content_type, content)
+            stored.append(url)
+        return stored
+
+    def cached_resource(self, url, expected_type):
+        if url in self.draft_resources:
+            return self.draft_resources[url]
+        entry = self.cache.get(url) if self.cache else None
+        if entry is None:
+            return None
+        return resource_content_type(url, entry[0], expected_type), entry[1]
+
+    def save_draft(self, page_title, output_filename, html_content, base_url):
+        """
+        渐进保存：页面加载后先把未翻译的快照作为附件保存到新条目，几秒内即可在 Zotero 中打开。
+        翻译完成后 save_to_zotero 原地替换该附件的文件并将其标记为最终版本。失败时只提示，翻译完成后照常保存。
+        """
+        if self.args.get('zotero_backend', 'web') == 'connector':
+            print("通过 Zotero 桌面端保存时无法原地替换附件，不保存未翻译快照")
+            return
+        key = (self.arxiv_id, self.arxiv_version)
+        with saved_drafts_lock:
+            self.draft = saved_drafts.get(key)
+        if self.draft:
+            print(f"复用之前保存的未翻译快照: {self.draft['path']}")
+            return
+
+        try:
+            soup, resources = self.prepare_snapshot(html_content, base_url)
+            fetched = {}
+            for urls in self.resource_rounds(resources, fetched):
+                self.download_round(urls, fetched, [])
+            self.inline_resources(resources, fetched, [], report=False)
+            # 页面加载后扩展可能已插入部分译文，草稿只保留原文
+            apply_snapshot_variant(soup, 'source')
+            self.draft_resources = fetched
+
+            if not os.path.exists(self.args['output_dir']):
+                os.makedirs(self.args['output_dir'])
+            snapshot_path, _ = store_snapshot(self.args['output_dir'], str(soup))
+            snapshots = [{'variant': None, 'path': snapshot_path, 'filename': output_filename}]
+            item_key = self.draft_item_key = self.create_item(page_title)
+            self.add_attachments(item_key, snapshots, None, title=DRAFT_SNAPSHOT_TITLE)
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            print(f"保存未翻译快照失败，翻译完成后照常保存: {e}")
+            return
+
+        self.draft = {
+            'item_key': item_key,
+            'key': snapshots[0].get('attachment_key'),
+            'path': snapshots[0]['attachment_path'],
+            'md5': snapshots[0].get('md5')
+        }
+        with saved_drafts_lock:
+            saved_drafts[key] = self.draft
+        print(f"已保存未翻译快照，翻译完成后原地替换: {self.draft['path']}")
+
+    def archive_dom(self, page_title, output_filename, html_content, base_url):
+        # 保存翻译后的原始 DOM，之后可在不重新翻译的情况下重新生成快照
+        self.archive_entry = {
+            'arxiv_id': self.arxiv_id,
+            'version': self.arxiv_version,
+            'url': self.url,
+            'base_url': base_url,
+            'title': page_title,
+            'output_filename': output_filename,
+            'html': html_content,
+            'archived_at': time.time(),
+            'zotero': None
+        }
+        try:
+            dom_archive(self.args).store(self.archive_entry)
+        except Exception as e:
+            print(f"保存原始 DOM 失败: {e}")
+
+    def render_snapshot(self, html_content, base_url):
+        """
+        清理页面并将图片、样式表（含其中的字体、背景图与 @import）、脚本下载后以 data URL 内联，返回处理后的 soup。
+        """
+        soup, resources = self.prepare_snapshot(html_content, base_url)
+        fetched = {}
+        degraded = []
+
+        self.check_cancelled()
+        self.set_stage(6)  # Stage 6
+        for urls in self.resource_rounds(resources, fetched):
+            self.download_round(urls, fetched, degraded)
+
+        self.inline_resources(resources, fetched, degraded)
+        return soup
+
+    def download_round(self, urls, fetched, degraded):
+        """
+        并行下载一轮资源，结果以 绝对地址 -> (content_type, content) 写入 fetched。
+        """
+        def download(url, expected_type):
+            with self.trace_span(url.rsplit('/', 1)[-1], 'download', url=url) as span:
+                # 任务已取消时，尚未开始或正在进行的下载都尽快退出
+                self.check_cancelled()
+                cached = self.cached_resource(url, expected_type)
+                if cached:
+                    span['cached'] = True
+                    fetched[url] = cached
+                    return
+                try:
+                    response, content = self.download_resource(url)
+                except TaskCancelled:
+                    raise
+                except Exception as e:
+                    # 单个资源失败不影响已完成的翻译，按策略降级处理
+                    span['error'] = str(e)
+                    degraded.append({'url': url, 'error': str(e)})
+                    return
+
+                span['status'] = response.status_code
+                span['size'] = len(content)
+                fetched[url] = (resource_content_type(url, response.headers.get('Content-Type'), expected_type), content)
+
+        executor = ThreadPoolExecutor(max_workers=32)
+        try:
+            pending = {executor.submit(download, url, expected_type) for url, expected_type in urls}
+            with tqdm(total=len(pending), desc="Downloading resources") as progress:
+                while pending:
+                    done, pending = wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                    progress.update(len(done))
+                    self.check_cancelled()
+                    for future in done:
+                        future.result()
+        finally:
+            # 取消或出错时不等待剩余下载，未开始的下载直接丢弃
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def resource_rounds(self, resources, fetched):
+        """
+        逐轮给出需要下载的 [(绝对地址, 预期类型)]：首轮为页面直接引用的资源，之后每轮为上一轮下载到的样式表中
+        新出现的引用。同一地址在整个页面中只下载一次；调用方需在取下一轮之前把本轮结果写入 fetched。
+        """
+        references = []
+        for resource in resources:
+            if resource['kind'] == 'style':
+                references.extend(css_references(self.style_text(resource), resource['css_base_url']))
+            else:
+                references.append((resource['resource_url_absolute'], resource['media_type']))
+
+        seen = set()
+        for depth in range(CSS_IMPORT_MAX_DEPTH + 1):
+            urls = {}
+            for url, expected_type in references:
+                if url not in seen:
+                    urls.setdefault(url, expected_type)
+            if not urls:
+                return
+            seen.update(urls)
+            yield list(urls.items())
+
+            references = []
+            for url in urls:
+                css = self.fetched_css(fetched.get(url))
+                if css is not None:
+                    references.extend(css_references(css, url))
+
+    def fetched_css(self, entry):
+        if entry is None or not entry[0].startswith('text/css'):
+            return None
+        try:
+            return entry[1].decode('utf-8-sig')
+        except UnicodeDecodeError:
+            return None  # 非 UTF-8 的样式表保持原样，不处理其中的引用
+
+    def style_text(self, resource):
+        tag = resource['tag']
+        return tag[resource['url_attr']] if resource['url_attr'] else (tag.string or '')
+
+    def prepare_snapshot(self, html_content, base_url):
+        """
+        解析并清理页面，返回 (soup, 需要内联的资源列表)。
+        资源的 kind 为 url（属性值为单个地址）、srcset（只内联最大的候选图片）或 style（<style> 与 style 属性中的样式）。
+        """
+        soup = BeautifulSoup(html_content, 'html.parser')
+
+        if self.args.get('snapshot_cleanup', True):
+            dom_size = len(html_content.encode('utf-8'))
+            removed = clean_snapshot(soup)
+            print(f"快照清理: 删除 {removed} 个元素，DOM {format_size(dom_size)} -> {format_size(len(str(soup).encode('utf-8')))}")
+
+        resource_tags = []
+        resource_tags.extend((tag, 'src', 'image') for tag in soup.find_all('img', src=True))
+        resource_tags.extend((tag, 'srcset', 'image') for tag in soup.find_all(['img', 'source'], srcset=True))
+        resource_tags.extend((tag, 'poster', 'image') for tag in soup.find_all('video', poster=True))
+        resource_tags.extend((tag, 'href', 'text/css') for tag in soup.find_all('link', href=True, rel='stylesheet'))
+        resource_tags.extend((tag, 'href', 'image') for tag in soup.find_all('link', href=True, rel='icon'))
+        resource_tags.extend((tag, 'src', 'application/javascript') for tag in soup.find_all('script', src=True))
+
+        resources = []
+        for tag, url_attr, media_type in resource_tags:
+            kind = 'srcset' if url_attr == 'srcset' else 'url'
+            if kind == 'srcset':
+                candidates = parse_srcset(tag[url_attr])
+                resource_url = best_srcset_candidate(candidates)
+            else:
+                candidates = None
+                resource_url = tag.get(url_attr)
+            if resource_url and not resource_url.startswith('data:'):
+                resources.append({
+                    'kind': kind,
+                    'tag': tag,
+                    'url_attr': url_attr,
+                    'resource_url': resource_url,
+                    'resource_url_absolute': urljoin(base_url, resource_url),
+                    'candidates': candidates,
+                    'base_url': base_url,
+                    'media_type': media_type
+                })
+
+        # 内联样式中的字体、背景图与 @import
+        for tag in soup.find_all('style'):
+            if 'url(' in (tag.string or '') or '@import' in (tag.string or ''):
+                resources.append({'kind': 'style', 'tag': tag, 'url_attr': None, 'css_base_url': base_url})
+        for tag in soup.find_all(style=True):
+            if 'url(' in tag['style']:
+                resources.append({'kind': 'style', 'tag': tag, 'url_attr': 'style', 'css_base_url': base_url})
+        return soup, resources
+
+    def encode_resource(self, url, fetched, remote, stack=()):
+        """
+        将已下载的资源编码为 data URL；样式表先递归内联其中的引用。未下载到的资源返回 None。
+        """
+        entry = fetched.get(url)
+        if entry is None or url in stack:
+            # @import 循环引用时保留远程地址
+            return None
+        content_type, content = entry
+
+        css = self.fetched_css(entry)
+        if css is not None:
+            css = rewrite_css(css, url, lambda reference, is_import: self.inline_reference(reference, fetched, remote, stack + (url,)))
+            if self.args.get('snapshot_cleanup', True):
+                css = minify_css(css)
+            content = css.encode('utf-8')
+
+        data_base64 = base64.b64encode(content).decode('utf-8')
+        return f'data:{content_type};base64,{data_base64}'
+
+    def inline_reference(self, url, fetched, remote, stack=()):
+        """
+        样式表中的单个引用：能内联时返回 data URL，否则返回绝对地址并记为仍需联网的资源。
+        """
+        data_url = self.encode_resource(url, fetched, remote, stack)
+        if data_url:
+            return data_url
+        if is_remote_url(url):
+            remote.add(url)
+        return url
+
+    def inline_resources(self, resources, fetched, degraded, report=True):
+        failure_policy = self.args.get('resource_failure_policy', 'keep_url')
+        remote = set()
+        data_urls = {}  # 同一资源在页面中多次出现时只编码一次
+        for resource in resources:
+            tag = resource['tag']
+            url_attr = resource['url_attr']
+            if resource['kind'] == 'style':
+                css = rewrite_css(self.style_text(resource), resource['css_base_url'],
+                                  lambda reference, is_import: self.inline_reference(reference, fetched, remote))
+                if url_attr:
+                    tag[url_attr] = css
+                else:
+                    tag.string = css
+                continue
+
+            url = resource['resource_url_absolute']
+            if url not in data_urls:
+                data_urls[url] = self.encode_resource(url, fetched, remote)
+            data_url = data_urls[url]
+            if data_url:
+                tag[url_attr] = data_url
+            elif resource['kind'] == 'srcset':
+                if failure_policy == 'placeholder' and tag.name == 'img':
+                    # 由 src（已内联或占位图）负责显示
+                    del tag[url_attr]
+                    continue
+                # 保留全部候选地址（转为绝对地址），联网时仍可按屏幕选择
+                tag[url_attr] = ', '.join(
+                    f"{urljoin(resource['base_url'], candidate)} {descriptor}".strip()
+                    for candidate, descriptor in resource['candidates']
+                )
+                remote.add(url)
+            elif failure_policy == 'placeholder' and tag.name == 'img':
+                tag['data-original-src'] = url
+                tag[url_attr] = RESOURCE_PLACEHOLDER
+            else:
+                # 保留原始地址（转为绝对地址），联网时仍可加载
+                tag[url_attr] = url
+                remote.add(url)
+
+        if not report:
+            return
+        if degraded and failure_policy == 'fail':
+            raise Exception(f"下载资源失败 {degraded[0]['url']}: {degraded[0]['error']}")
+        # 除下载失败外，超出 @import 嵌套层数或循环引用的资源同样仍需联网
+        failed = {item['url'] for item in degraded}
+        degraded = degraded + [{'url': url, 'error': '未内联'} for url in sorted(remote - failed)]
+        if degraded:
+            print(f"Job {self.job_id}: {len(degraded)} 个资源未能内联，快照打开时仍会联网请求（{failure_policy} 策略）:")
+            for item in degraded:
+                print(f"  {item['url']}: {item['error']}")
+            self.signals.degraded.emit(self.job_id, degraded)
+
+    def retry_delay(self, attempt):
+        """
+        第 attempt 次失败后的等待时间：带抖动的指数退避。
+        """
+        return float(self.args.get('resource_retry_backoff', 1.0)) * (2 ** attempt) * random.uniform(0.5, 1.5)
+
+    def download_resource(self, url):
+        """
+        下载单个资源，遇到网络错误、5xx、408 与 429 时按带抖动的指数退避重试，返回 (response, content)。
+        每次请求前经过按主机的限速器；429 / 503 的等待时间由限速器按 Retry-After 决定。
+        """
+        retries = int(self.args.get('resource_retries', 3))
+        for attempt in range(retries + 1):
+            host_limiter.acquire(url, self.cancel_event)
+            try:
+                with http_session.get(url, timeout=10, stream=True) as response:
+                    host_limiter.record(url, response.status_code, response.headers)
+                    response.raise_for_status()
+                    chunks = []
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        self.check_cancelled()
+                        chunks.append(chunk)
+                    return response, b''.join(chunks)
+            except requests.HTTPError as e:
+                status = e.response.status_code
+                if attempt == retries or status not in RETRYABLE_STATUS and status < 500:
+                    raise Exception(f"HTTP {status}")
+                if status in THROTTLE_STATUS:
+                    continue
+            except requests.RequestException as e:
+                host_limiter.record(url)
+                if attempt == retries:
+                    raise Exception(type(e).__name__)
+            if self.cancel_event.wait(self.retry_delay(attempt)):
+                raise TaskCancelled()
+
+    def write_snapshots(self, soup, output_filename):
+        """
+        写入双语快照及配置的额外版本，返回 (snapshots, output_filepath)。
+        snapshots 中每项为 {'variant', 'path', 'filename'}，variant 为 None 表示双语快照。
+        """
+        if not os.path.exists(self.args['output_dir']):
+            os.makedirs(self.args['output_dir'])
+
+        # 快照只写入一次，暂存文件与 Zotero 附件都是它的链接
+        move_to_zotero = self.args.get('attachment_placement', 'link') == 'move'
+        output_filepath = os.path.join(self.args['output_dir'], output_filename)
+        snapshot_html = str(soup)
+        snapshot_path, written = store_snapshot(self.args['output_dir'], snapshot_html)
+        print(f"快照大小: {format_size(len(snapshot_html.encode('utf-8')))}")
+        if not written:
+            print(f"快照内容与已有快照相同，复用 {snapshot_path}")
+        if not move_to_zotero:
+            place_file(snapshot_path, output_filepath)
+        snapshots = [{'variant': None, 'path': snapshot_path, 'filename': output_filename}]
+        # 段落在这里提取，附件放入 Zotero 后再写入搜索索引
+        self.paragraphs = extract_bilingual_paragraphs(soup)
+
+        # 可选的仅译文 / 仅原文版本，作为额外附件保存
+        for variant in self.args.get('snapshot_extra_variants', []):
+            if variant not in SNAPSHOT_VARIANT_LABELS:
+                print(f"未知的快照版本: {variant}")
+                continue
+            variant_html = str(apply_snapshot_variant(copy.copy(soup), variant))
+            variant_path, _ = store_snapshot(self.args['output_dir'], variant_html)
+            variant_filename = f"{output_filename[:-len('.html')]} ({SNAPSHOT_VARIANT_LABELS[variant]}).html"
+            if not move_to_zotero:
+                place_file(variant_path, os.path.join(self.args['output_dir'], variant_filename))
+            snapshots.append({'variant': variant, 'path': variant_path, 'filename': variant_filename})
+            print(f"{SNAPSHOT_VARIANT_LABELS[variant]}快照大小: {format_size(len(variant_html.encode('utf-8')))}")
+
+        return snapshots, output_filepath
+
+    def save_to_zotero(self, page_title, snapshots, output_filepath):
+        self.check_cancelled()
+        self.set_stage(7)  # Stage 7
+        saved_locally = False
+        if self.args.get('zotero_backend', 'web') == 'connector' and not self.draft:
+            try:
+                self.save_via_connector(page_title, snapshots)
+                saved_locally = True
+            except ConnectorUnavailable as e:
+                print(f"无法通过 Zotero 桌面端保存（{e}），改用 Web API")
+            except ConnectorPartialSave as e:
+                # 条目已存在，回退或重试都会创建重复的条目：任务照常完成，缺失的快照保留在输出目录并标记为降级
+                print(f"通过 Zotero 桌面端保存时{e}，请手动添加: {', '.join(snapshot['path'] for snapshot in e.missing)}")
+                self.signals.degraded.emit(self.job_id, [{'url': snapshot['path'], 'error': str(e)} for snapshot in e.missing])
+                saved_locally = True
+            except Exception as e:
+                raise Exception(f"保存失败，错误信息: {e}")
+
+        if saved_locally:
+            # 附件由 Zotero 自行存放，无法原地替换，重新生成时会新建条目
+            item_key, attachments = None, []
+            index_path = output_filepath if os.path.exists(output_filepath) else snapshots[0]['path']
+        else:
+            if self.draft:
+                item_key, output_filepath = self.finalize_draft(snapshots, output_filepath)
+            else:
+                item_key, output_filepath = self.save_via_web_api(page_title, snapshots, output_filepath)
+            attachments = [{
+                'variant': snapshot['variant'],
+                'path': snapshot['attachment_path'],
+                'key': snapshot.get('attachment_key'),
+                'md5': snapshot.get('md5')
+            } for snapshot in snapshots]
+            index_path = snapshots[0]['attachment_path']
+
+        self.update_search_index(index_path, page_title, item_key)
+
+        # 记录条目与附件位置，重新生成快照时直接替换附件文件
+        if getattr(self, 'archive_entry', None):
+            self.archive_entry['zotero'] = {'item_key': item_key, 'attachments': attachments}
+            try:
+                dom_archive(self.args).store(self.archive_entry)
+            except Exception as e:
+                print(f"更新原始 DOM 存档失败: {e}")
+
+        return output_filepath
+
+    def build_preprint_item(self, item, page_title):
+        metadata = metadata_fetcher().get(self.arxiv_id, timeout=30)
+        if metadata:
+            fill_preprint_item(item, metadata)
+        else:
+            print(f"未能获取 {self.arxiv_id} 的 Arxiv 元数据，仅保存标题")
+            # 去除 [] 中的内容
+            item['title'] = page_title
+            item['archiveID'] = f"arXiv:{self.arxiv_id}"
+        item['url'] = arxiv_abs_url(self.arxiv_id, self.arxiv_version)
+        return item
+
+    def save_via_connector(self, page_title, snapshots):
+        connector = ZoteroConnector(self.args.get('zotero_connector_url') or 'http://127.0.0.1:23119')
+        if not connector.ping():
+            raise ConnectorUnavailable("Zotero 桌面端未运行")
+        item = self.build_preprint_item({'itemType': 'preprint', 'creators': [], 'tags': []}, page_title)
+        connector.save_item(item, snapshots, self.args.get('collection_name', ''))
+        print(f"已通过 Zotero 桌面端保存: {item['title']}")
+
+    def save_via_web_api(self, page_title, snapshots, output_filepath):
+        """
+        通过 Zotero Web API 创建条目，返回 (item_key, output_filepath)。快照默认以链接文件的形式放在
+        zotero_storage/<条目 key>/ 下；zotero_attachment_mode 为 imported 时作为同步文件上传到 Zotero 服务器。
+        """
+        try:
+            item_key = self.draft_item_key or self.create_item(page_title)
+            output_filepath = self.add_attachments(item_key, snapshots, output_filepath)
+        except Exception as e:
+            raise Exception(f"保存失败，错误信息: {e}")
+
+        return item_key, output_filepath
+
+    def create_item(self, page_title):
+        # Save to Zotero
+        zot = get_zotero_client(self.args)
+        item = self.build_preprint_item(zot.item_template('preprint'), page_title)
+
+        if self.args['collection_key']:
+            item['collections'] = [self.args['collection_key']]
+        item = zot.create_items([item])
+        return list(item['successful'].values())[0]['key']
+
+    def add_attachments(self, item_key, snapshots, output_filepath, title=None):
+        """
+        为条目创建快照附件，返回 output_filepath（move 模式下为双语快照附件的位置）。
+        title 为空时按快照版本命名。
+        """
+        move_to_zotero = self.args.get('attachment_placement', 'link') == 'move'
+        imported = self.args.get('zotero_attachment_mode', 'linked') == 'imported'
+        zot = get_zotero_client(self.args)
+
+        storage_path = os.path.join(self.args['zotero_storage'], item_key)
+        if not imported and not os.path.exists(storage_path):
+            os.makedirs(storage_path)
+
+        attachments = []
+        for snapshot in snapshots:
+            label = SNAPSHOT_VARIANT_LABELS.get(snapshot['variant'])
+            attachment_title = title or (f"Snapshot ({label})" if label else 'Snapshot')
+            if imported:
+                attachments.append({
+                    'itemType': 'attachment',
+                    'parentItem': item_key,
+                    'linkMode': 'imported_file',
+                    'accessDate': datetime.now().strftime('%Y-%m-%d'),
+                    'title': attachment_title,
+                    'filename': snapshot['filename'],
+                    'contentType': 'text/html',
+                    'charset': 'utf-8'
+                })
+                continue
+            attachment_path = os.path.join(storage_path, snapshot['filename'])
+            method = place_file(snapshot['path'], attachment_path, move=move_to_zotero)
+            snapshot['attachment_path'] = attachment_path
+            attachments.append({
+                'itemType': 'attachment',
+                'parentItem': item_key,
+                'linkMode': 'linked_file',
+                'accessDate': datetime.now().strftime('%Y-%m-%d'),
+                'title': attachment_title,
+                'path': attachment_path,
+                'contentType': 'text/html'
+            })
+            if snapshot['variant'] is None:
+                print(f"快照已放入 Zotero 存储目录 ({method}): {attachment_path}")
+                if move_to_zotero:
+                    output_filepath = attachment_path
+
+        response = zot.create_items(attachments)
+
+        if 'successful' in response and response['successful']:
+            pass
+        else:
+            raise Exception("创建附件失败")
+
+        if imported:
+            return self.upload_attachments(snapshots, response['successful'], output_filepath)
+        for index, snapshot in enumerate(snapshots):
+            snapshot['attachment_key'] = response['successful'][str(index)]['key']
+        return output_filepath
+
+    def finalize_draft(self, snapshots, output_filepath):
+        """
+        用翻译后的双语快照原地替换未翻译快照的附件文件并将附件标记为最终版本，
+        额外版本作为新附件加入同一条目。返回 (item_key, output_filepath)。
+        """
+        draft = self.draft
+        snapshot = snapshots[0]
+        move_to_zotero = self.args.get('attachment_placement', 'link') == 'move'
+        try:
+            if draft['md5']:
+                # 同步文件附件：以草稿的 MD5 为前提替换服务器上的文件
+                snapshot['md5'], _ = self.file_uploader().upload(
+                    draft['key'], snapshot['path'], os.path.basename(draft['path']), draft['md5']
+                )
+            os.makedirs(os.path.dirname(draft['path']), exist_ok=True)
+            place_file(snapshot['path'], draft['path'], move=move_to_zotero)
+            snapshot['attachment_path'], snapshot['attachment_key'] = draft['path'], draft['key']
+            if move_to_zotero:
+                output_filepath = draft['path']
+            self.mark_final(draft['key'])
+            if len(snapshots) > 1:
+                output_filepath = self.add_attachments(draft['item_key'], snapshots[1:], output_filepath)
+        except Exception as e:
+            raise Exception(f"替换未翻译快照失败，错误信息: {e}")
+
+        with saved_drafts_lock:
+            saved_drafts.pop((self.arxiv_id, self.arxiv_version), None)
+        self.draft = None
+        print(f"未翻译快照已替换为翻译后的版本: {draft['path']}")
+        return draft['item_key'], output_filepath
+
+    def mark_final(self, attachment_key):
+        zot = get_zotero_client(self.args)
+        attachment = zot.item(attachment_key)
+        attachment['data']['title'] = 'Snapshot'
+        zot.update_item(attachment['data'])
+
+    def file_uploader(self):
+        return ZoteroFileUploader(zotero_api_base(self.args), self.args['library_type'], self.args['library_id'], self.args['api_key'])
+
+    def upload_attachments(self, snapshots, created, output_filepath):
+        """
+        上传 imported_file 附件的文件，并在 zotero_storage/<附件 key>/ 下放一份相同的文件，
+        桌面端同步时发现本地内容一致便不会再下载。
+        """
+        move_to_zotero = self.args.get('attachment_placement', 'link') == 'move'
+        uploader = self.file_uploader()
+        for index, snapshot in enumerate(snapshots):
+            self.check_cancelled()
+            attachment_key = created[str(index)]['key']
+            md5, transferred = uploader.upload(attachment_key, snapshot['path'], snapshot['filename'])
+            snapshot['attachment_key'], snapshot['md5'] = attachment_key, md5
+            size = format_size(os.path.getsize(snapshot['path']))
+            print(f"附件 {snapshot['filename']} ({size}) {'已上传' if transferred else '服务器已有相同内容，跳过上传'}")
+
+            storage_path = os.path.join(self.args['zotero_storage'], attachment_key)
+            os.makedirs(storage_path, exist_ok=True)
+            attachment_path = os.path.join(storage_path, snapshot['filename'])
+            place_file(snapshot['path'], attachment_path, move=move_to_zotero)
+            snapshot['attachment_path'] = attachment_path
+            if snapshot['variant'] is None and move_to_zotero:
+                output_filepath = attachment_path
+        return output_filepath
+
+    def update_search_index(self, snapshot_path, title, item_key):
+        if not self.args.get('search_index_enabled', True):
+            return
+        try:
+            snapshot_index(self.args).add(snapshot_path, self.paragraphs, title, self.arxiv_id, self.arxiv_version, item_key)
+        except Exception as e:
+            print(f"更新搜索索引失败: {e}")
+
+    def rerender(self, entry, update_existing=True):
+        """
+        从存档的原始 DOM 重新生成快照，不启动浏览器。update_existing 为 True 时原地替换
+        已保存到 Zotero 的附件文件，否则（或没有记录 Zotero 条目时）新建条目。
+        """
+        self.arxiv_id, self.arxiv_version = entry['arxiv_id'], entry['version']
+        self.archive_entry = entry
+        self.signals.title.emit(self.job_id, entry['title'])
+
+        soup = self.render_snapshot(entry['html'], entry['base_url'])
+        snapshots, output_filepath = self.write_snapshots(soup, entry['output_filename'])
+        if not update_existing or not (entry.get('zotero') or {}).get('attachments'):
+            return self.save_to_zotero(entry['title'], snapshots, output_filepath)
+
+        self.set_stage(7)  # Stage 7
+        snapshot_paths = {snapshot['variant']: snapshot['path'] for snapshot in snapshots}
+        uploaded = False
+        for attachment in entry['zotero']['attachments']:
+            snapshot_path = snapshot_paths.get(attachment['variant'])
+            if snapshot_path and attachment.get('md5'):
+                # 同步文件附件：内容未变时不发请求，变化时以旧 MD5 为前提替换服务器上的文件
+                md5, transferred = self.file_uploader().upload(
+                    attachment['key'], snapshot_path, os.path.basename(attachment['path']), attachment['md5']
+                )
+                if transferred:
+                    status = '已重新上传'
+                elif md5 == attachment['md5']:
+                    status = '内容未变化，跳过上传'
+                else:
+                    status = '服务器已有相同内容，跳过上传'
+                print(f"附件 {os.path.basename(attachment['path'])} {status}")
+                uploaded = uploaded or md5 != attachment['md5']
+                attachment['md5'] = md5
+                os.makedirs(os.path.dirname(attachment['path']), exist_ok=True)
+            if snapshot_path and os.path.isdir(os.path.dirname(attachment['path'])):
+                place_file(snapshot_path, attachment['path'], move=self.args.get('attachment_placement', 'link') == 'move')
+                if attachment['variant'] is None:
+                    output_filepath = attachment['path']
+                    self.update_search_index(attachment['path'], entry['title'], entry['zotero']['item_key'])
+        if uploaded:
+            try:
+                dom_archive(self.args).store(entry)
+            except Exception as e:
+                print(f"更新原始 DOM 存档失败: {e}")
+        return output_filepath
+    
+
+
+# --- Async Save Engine ---
+class AsyncSavePageWorker(SavePageWorker):
+    """
+    与 SavePageWorker 相同的保存流程，页面加载与翻译等待在事件循环中进行；翻译完成后的存档、生成快照与保存
+    直接在线程中调用 save_translated，其中的资源下载（download_round）交回事件循环经 aiohttp 并发进行。
+    """
+    engine = None
+
+    async def run_async(self, engine):
+        self.engine = engine
+        try:
+            arxiv_url = await asyncio.to_thread(self.resolve_job_url)
+
+            archive_path = self.find_archived_dom()
+            if archive_path:
+                output_filepath = await asyncio.to_thread(self.rerender_archived, archive_path)
+                self.report_finished(output_filepath)
+                return
+
+            if self.args.get('translation_engine', 'extension') == 'api':
+                # 翻译接口的请求与 pyzotero 调用一样都是同步的，整个流程放到线程中进行
+                self.check_paths(browser=False)
+                output_filepath = await asyncio.to_thread(self.translate_page, arxiv_url)
+                self.report_finished(output_filepath)
+                return
+
+            self.check_cancelled()
+            self.set_stage(2)  # Stage 2
+            self.check_paths()
+
+            # 所有任务共用同一个浏览器上下文，每个任务只打开自己的标签页
+            context = await engine.get_context(
+                resource_path(self.args['user_data_dir']),
+                resource_path(self.args['extension_path']),
+                get_profile_pool(self.args)
+            )
+            page = await context.new_page()
+            if self.trace:
+                self.trace.attach(page)
+            try:
+                output_filepath = await self.save_page_async(page, arxiv_url)
+            finally:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+
+            self.report_finished(output_filepath)
+
+        except TaskCancelled:
+            self.report_cancelled()
+        except Exception as e:
+            self.report_error(e)
+
+    async def wait_cancellable_async(self, wait_fn, timeout_ms):
+        deadline = time.monotonic() + timeout_ms / 1000
+        while True:
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                raise PlaywrightTimeoutError(f"Timeout {timeout_ms}ms exceeded")
+            try:
+                return await wait_fn(min(CANCEL_POLL_INTERVAL * 1000, remaining_ms))
+            except PlaywrightTimeoutError:
+                self.check_cancelled()
+
+    async def sleep_cancellable(self, delay):
+        deadline = time.monotonic() + delay
+        while True:
+            self.check_cancelled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(CANCEL_POLL_INTERVAL, remaining))
+
+    async def route_prefetched_async(self, page):
+        if not self.cache:
+            return
+
+        async def fulfill(route):
+            entry = await asyncio.to_thread(self.cache.get, route.request.url) if route.request.method == 'GET' else None
+            if entry is None:
+                await route.continue_()
+            else:
+                await route.fulfill(status=200, content_type=entry[0], body=entry[1])
+
+        await page.route(self.cache.contains, fulfill)
+
+    async def navigate_async(self, page, url):
+        retries = int(self.args.get('resource_retries', 3))
+        for attempt in range(retries + 1):
+            if not (self.cache and self.cache.contains(url)):
+                await host_limiter.acquire_async(url, self.sleep_cancellable)
+            self.check_cancelled()
+            response = await page.goto(url, wait_until='commit')
+            status = response.status if response else None
+            host_limiter.record(url, status, response.headers if response else None)
+            if status not in THROTTLE_STATUS:
+                return
+            print(f"访问 {url} 被要求降速（HTTP {status}），第 {attempt + 1} 次")
+        raise Exception(f"访问 {url} 多次被要求降速（HTTP {status}）")
+
+    async def save_page_async(self, page, arxiv_url):
+        self.check_cancelled()
+        self.set_stage(3)  # Stage 3
+
+        await self.route_prefetched_async(page)
+        await self.navigate_async(page, arxiv_url)
+        await self.wait_cancellable_async(lambda timeout: page.wait_for_load_state('networkidle', timeout=timeout), 30000)
+
+        page_title = re.sub(r'\[.*\]', '', await page.title()).strip()
+
+        self.check_cancelled()
+        self.signals.title.emit(self.job_id, page_title)
+
+        if self.args.get('progressive_save', False):
+            draft_filename = re.sub(r'\[.*?\]', '', await page.title()).strip() + ".html"
+            # 草稿的资源下载与创建条目都是一次性的同步请求，放到线程中进行
+            await asyncio.to_thread(self.save_draft, page_title, draft_filename, await page.content(), page.url)
+
+        self.check_cancelled()
+        self.set_stage(4)  # Stage 4
+        try:
+            await self.wait_cancellable_async(
+                lambda timeout: page.wait_for_selector(TRANSLATION_SPINNER_SELECTOR, state='detached', timeout=timeout),
+                1200000
+            )
+        except PlaywrightTimeoutError:
+            raise Exception("等待翻译完成超时，可能翻译尚未完成")
+
+        self.check_cancelled()
+        self.set_stage(5)  # Stage 5
+        output_filename = re.sub(r'\[.*?\]', '', await page.title()).strip() + ".html"
+        return await asyncio.to_thread(self.save_translated, page_title, output_filename, await page.content(), page.url)
+
+    def download_round(self, urls, fetched, degraded):
+        """
+        在线程中调用（save_translated、save_draft 等），将这一轮下载交给事件循环并等待完成。
+        """
+        if self.engine is None:
+            return super().download_round(urls, fetched, degraded)
+
+        async def download_round():
+            await self.download_round_async(urls, fetched, degraded, await self.engine.get_http())
+
+        return asyncio.run_coroutine_threadsafe(download_round(), self.engine.loop).result()
+
+    async def download_round_async(self, urls, fetched, degraded, http):
+        async def download(url, expected_type):
+            with self.trace_span(url.rsplit('/', 1)[-1], 'download', url=url) as span:
+                self.check_cancelled()
+                cached = await asyncio.to_thread(self.cached_resource, url, expected_type)
+                if cached:
+                    span['cached'] = True
+                    fetched[url] = cached
+                    return
+                try:
+                    status, content_type, content = await self.download_resource_async(http, url)
+                except TaskCancelled:
+                    raise
+                except Exception as e:
+                    span['error'] = str(e)
+                    degraded.append({'url': url, 'error': str(e)})
+                    return
+                span['status'] = status
+                span['size'] = len(content)
+                fetched[url] = (resource_content_type(url, content_type, expected_type), content)
+
+        tasks = [asyncio.ensure_future(download(url, expected_type)) for url, expected_type in urls]
+        try:
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=CANCEL_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+                self.check_cancelled()
+                for task in done:
+                    task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def download_resource_async(self, http, url):
+        """
+        与 download_resource 相同的重试策略，返回 (status, content_type, content)。
+        """
+        retries = int(self.args.get('resource_retries', 3))
+        for attempt in range(retries + 1):
+            await host_limiter.acquire_async(url, self.sleep_cancellable)
+            try:
+                async with http.get(url) as response:
+                    status = response.status
+                    host_limiter.record(url, status, response.headers)
+                    if status < 400:
+                        chunks = []
+                        async for chunk in response.content.iter_chunked(64 * 1024):
+                            self.check_cancelled()
+                            chunks.append(chunk)
+                        return status, response.headers.get('Content-Type'), b''.join(chunks)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                host_limiter.record(url)
+                if attempt == retries:
+                    raise Exception(type(e).__name__)
+            else:
+                if attempt == retries or status not in RETRYABLE_STATUS and status < 500:
+                    raise Exception(f"HTTP {status}")
+                if status in THROTTLE_STATUS:
+                    continue
+            await self.sleep_cancellable(self.retry_delay(attempt))
+
+
+class AsyncSaveEngine:
+    """
+    在一个后台事件循环中同时处理多篇文献：共用一个浏览器上下文（每个任务一个标签页）
+    和一个 aiohttp 连接池，线程数不随并行任务数增长。
+    """
+    def __init__(self, args):
+        if aiohttp is None:
+            raise Exception("异步保存引擎需要安装 aiohttp: pip install aiohttp")
+        self.args = args
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='async-save-engine', daemon=True)
+        self.thread.start()
+        self.playwright = None
+        self.context = None
+        self.context_key = None
+        self.context_closed = False
+        self.profile_pool = None
+        self.profile_dir = None
+        self.browser_lock = None
+        self.http = None
+        self.active = 0
+        atexit.register(self.shutdown)
+
+    def submit(self, worker):
+        """
+        在事件循环中运行任务，返回 concurrent.futures.Future。
+        """
+        return asyncio.run_coroutine_threadsafe(self.run_job(worker), self.loop)
+
+    async def run_job(self, worker):
+        self.active += 1
+        try:
+            await worker.run_async(self)
+        finally:
+            self.active -= 1
+            if not self.active and not self.args.get('keep_browser_warm', True):
+                await self.close_browser()
+
+    async def get_context(self, user_data_dir, extension_path, pool=None):
+        """
+        返回共用的浏览器上下文。与线程引擎的 BrowserSession 相同，使用用户数据目录池时上下文存续期间独占一个副本，
+        源目录变化后重新启动。
+        """
+        if self.browser_lock is None:
+            self.browser_lock = asyncio.Lock()
+        async with self.browser_lock:
+            key = (user_data_dir, extension_path)
+            stale = self.profile_pool is not None and self.profile_pool.is_stale(self.profile_dir)
+            if self.context is None or self.context_closed or self.context_key != key or stale:
+                await self.close_browser()
+                if self.playwright is None:
+                    self.playwright = await async_playwright().start()
+                self.profile_dir = await asyncio.to_thread(pool.acquire) if pool else user_data_dir
+                self.profile_pool = pool
+                try:
+                    self.context = await self.playwright.chromium.launch_persistent_context(
+                        user_data_dir=self.profile_dir,
+                        headless=False,
+                        args=browser_launch_args(extension_path),
+                    )
+                except Exception:
+                    self.release_profile()
+                    raise
+                self.context_key = key
+                self.context_closed = False
+                self.context.on('close', lambda _: setattr(self, 'context_closed', True))
+            return self.context
+
+    async def get_http(self):
+        if self.http is None or self.http.closed:
+            self.http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=64),
+                timeout=aiohttp.ClientTimeout(sock_connect=10, sock_read=10)
+            )
+        return self.http
+
+    async def close_browser(self):
+        if self.context is not None:
+            try:
+                if not self.context_closed:
+                    await self.context.close()
+            except Exception:
+                pass
+            self.context = None
+        self.release_profile()
+
+    def release_profile(self):
+        if self.profile_pool:
+            self.profile_pool.release(self.profile_dir)
+            self.profile_pool = None
+
+    async def close(self):
+        await self.close_browser()
+        if self.playwright is not None:
+            await self.playwright.stop()
+            self.playwright = None
+        if self.http is not None:
+            await self.http.close()
+            self.http = None
+
+    def shutdown(self):
+        if not self.loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(timeout=10)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+# --- Isolated Workers ---
+# 取消请求发出后子进程仍未结束任务的最长等待时间，超过后直接结束子进程
+ISOLATED_CANCEL_GRACE = 10
+# 子进程发送心跳的最小间隔
+HEARTBEAT_INTERVAL = 1.0
+
+
+class HeartbeatEvent(CancelEvent):
+    """
+    子进程中任务使用的取消事件：任务每次检查取消或等待时顺带调用 beat 发送心跳，
+    执行线程卡在某个调用（如无响应的 Playwright 请求）中时心跳随之停止。
+    """
+    def __init__(self, beat):
+        super().__init__()
+        self.beat = beat
+
+    def is_set(self):
+        self.beat()
+        return super().is_set()
+
+    def wait(self, timeout=None):
+        # 分段等待，长时间的退避或限速等待期间也保持心跳
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            self.beat()
+            remaining = HEARTBEAT_INTERVAL if deadline is None else min(HEARTBEAT_INTERVAL, deadline - time.monotonic())
+            if remaining <= 0:
+                return super().is_set()
+            if super().wait(remaining):
+                return True
+
+
+class WorkerProcess:
+    """
+    隔离执行模式下一个执行线程独占的子进程（run.py job-worker），浏览器在其中的多个任务间保持常驻。
+    任务与取消请求经 stdin、进度事件与心跳经 stdout 以每行一个 JSON 传递，子进程的日志输出到 stderr。
+    """
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir  # 使用用户数据目录池时该进程独占的副本
+        self.process = None
+        self.events = queue.Queue()
+
+    def start(self):
+        # 子进程自成一个进程组，结束时连同它启动的浏览器进程一起结束
+        options = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP} if sys.platform == 'win32' else {'start_new_session': True}
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), 'job-worker'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, **options
+        )
+        self.events = queue.Queue()
+        threading.Thread(target=self.read_events, args=(self.process, self.events), daemon=True).start()
+
+    def read_events(self, process, events):
+        for line in process.stdout:
+            try:
+                events.put(json.loads(line))
+            except ValueError:
+                continue
+        events.put(None)  # 子进程已退出
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def send(self, message):
+        self.process.stdin.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.process.stdin.flush()
+
+    def stop(self, timeout=10):
+        """
+        关闭 stdin 让子进程关闭浏览器后退出，超时仍未退出时强制结束。
+        """
+        if not self.alive():
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            self.kill()
+
+    def kill(self):
+        if self.process is None:
+            return
+        try:
+            if sys.platform == 'win32':
+                subprocess.run(['taskkill', '/F', '/T', '/PID', str(self.process.pid)], capture_output=True)
+            else:
+                os.killpg(self.process.pid, signal.SIGKILL)
+        except OSError:
+            pass
+        self.process.wait()
+
+
+def isolated_worker_args(args, slots, profile_dir):
+    """
+    子进程中任务使用的配置：每个进程直接使用分配给它的用户数据目录副本，
+    限速器按进程各自计数，因此每个进程只分得 1/slots 的速率与突发量。
+    """
+    args = {**args, 'max_parallel_jobs': 1}
+    if profile_dir:
+        args['user_data_dir'] = profile_dir
+    if slots > 1:
+        args['host_rate_default'] = float(args.get('host_rate_default', 4.0)) / slots
+        args['host_burst'] = max(1, int(args.get('host_burst', 8)) // slots)
+        args['host_rate_limits'] = {host: float(rate) / slots for host, rate in (args.get('host_rate_limits') or {}).items()}
+    return args
+
+
+def format_worker_stats(stats):
+    if not stats['stalls'] and not stats['restarts']:
+        return ''
+    return f"工作进程 {stats['processes']} 个，卡住 {stats['stalls']} 次，重启 {stats['restarts']} 次"
+
+
+def run_job_worker():
+    """
+    job-worker 子命令：由隔离执行模式的 JobService 启动，逐个执行父进程发来的任务。
+    父进程关闭 stdin（或退出）时取消当前任务、关闭浏览器后退出。
+    """
+    channel = sys.stdout
+    sys.stdout = sys.stderr  # stdout 只用于传递事件，日志改为输出到 stderr
+    send_lock = threading.RLock()
+    jobs = queue.Queue()
+    current = {'job_id': None, 'cancel_event': None}
+    reported_drafts = {}
+    last_beat = [0.0]
+
+    def send(message):
+        with send_lock:
+            channel.write(json.dumps(message, ensure_ascii=False) + '\n')
+            channel.flush()
+
+    def finish(message):
+        # 父进程收到结束事件后即不再读取该任务的事件，渐进保存的状态需在此之前同步
+        report_drafts(message['job_id'])
+        send(message)
+
+    def report_drafts(job_id):
+        # 渐进保存创建的条目同步给父进程，任务卡住重启后继续替换同一附件
+        with send_lock:
+            with saved_drafts_lock:
+                drafts = dict(saved_drafts)
+            changed = [[*key, draft] for key, draft in drafts.items() if reported_drafts.get(key) is not draft]
+            removed = [list(key) for key in reported_drafts if key not in drafts]
+            if changed or removed:
+                reported_drafts.clear()
+                reported_drafts.update(drafts)
+                send({'type': 'drafts', 'job_id': job_id, 'changed': changed, 'removed': removed})
+
+    def beat():
+        now = time.monotonic()
+        if now - last_beat[0] < HEARTBEAT_INTERVAL:
+            return
+        last_beat[0] = now
+        send({'type': 'heartbeat', 'job_id': current['job_id']})
+        report_drafts(current['job_id'])
+
+    def read_commands():
+        for line in sys.stdin:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if message['type'] == 'cancel':
+                if message['job_id'] == current['job_id'] and current['cancel_event']:
+                    current['cancel_event'].set()
+            else:
+                jobs.put(message)
+        if current['cancel_event']:
+            current['cancel_event'].set()
+        jobs.put(None)
+
+    threading.Thread(target=read_commands, daemon=True).start()
+    try:
+        while True:
+            message = jobs.get()
+            if message is None:
+                break
+            job_id = message['job_id']
+            with saved_drafts_lock:
+                saved_drafts.clear()
+                saved_drafts.update({(arxiv_id, version): draft for arxiv_id, version, draft in message.get('drafts', [])})
+                reported_drafts.clear()
+                reported_drafts.update(saved_drafts)
+
+            signals = WorkerSignals()
+            signals.progress.connect(lambda job_id, stage: send({'type': 'progress', 'job_id': job_id, 'stage': stage}), Qt.DirectConnection)
+            signals.title.connect(lambda job_id, title: send({'type': 'title', 'job_id': job_id, 'title': title}), Qt.DirectConnection)
+            signals.degraded.connect(lambda job_id, resources: send({'type': 'degraded', 'job_id': job_id, 'resources': resources}), Qt.DirectConnection)
+            signals.finished.connect(lambda job_id, filepath: finish({'type': 'finished', 'job_id': job_id, 'filepath': filepath}), Qt.DirectConnection)
+            signals.error.connect(lambda job_id, error: finish({'type': 'error', 'job_id': job_id, 'message': error}), Qt.DirectConnection)
+            signals.cancelled.connect(lambda job_id, elapsed: finish({'type': 'cancelled', 'job_id': job_id, 'elapsed': elapsed}), Qt.DirectConnection)
+
+            cancel_event = HeartbeatEvent(beat)
+            current.update(job_id=job_id, cancel_event=cancel_event)
+            try:
+                SavePageWorker(job_id, message['url'], message['args'], signals, cancel_event).run()
+            finally:
+                current.update(job_id=None, cancel_event=None)
+    finally:
+        BrowserSession.discard()
+
+
+# --- Job Scheduler ---
+JOB_LANE_LABELS = {'short': '快速', 'full': '完整'}
+
+
+def count_paragraphs(html):
+    return len(re.findall(r'<p[\s>]', html, re.IGNORECASE))
+
+
+# 只估计排在最前的若干个任务，其余任务按默认耗时排序，排到前面时再估计，避免大批导入时集中请求来源页面
+ESTIMATE_QUEUE_HEAD = 10
+
+
+def estimate_job_cost(lane, paragraphs):
+    """
+    按段落数粗略估计任务耗时（秒）：快速通道只需重新生成快照，完整通道的耗时主要花在逐段翻译上。
+    """
+    if paragraphs is None:
+        paragraphs = 200
+    if lane == 'short':
+        return 5 + paragraphs * 0.02
+    return 60 + paragraphs * 1.5
+
+
+class JobScheduler:
+    """
+    在执行线程池前挑选下一个任务：先按用户优先级，再按手动拖动的顺序，其余按响应比
+    (等待时间 + 估计耗时) / 估计耗时 从高到低排列。短任务很快排到前面，
+    大任务等待越久响应比越高，不会被源源不断的短任务饿死。
+    """
+    def __init__(self):
+        self.queued = {}    # job_id -> job，与 JobService 共享同一个字典
+        self.pinned = []    # 手动拖动后固定顺序的 job_id
+
+    def add(self, job):
+        self.queued[job['id']] = job
+
+    def discard(self, job_id):
+        if job_id in self.pinned:
+            self.pinned.remove(job_id)
+        return self.queued.pop(job_id, None) is not None
+
+    def order(self):
+        now = time.time()
+        ranks = {job_id: rank for rank, job_id in enumerate(self.pinned)}
+
+        def key(job):
+            cost = job.get('cost') or estimate_job_cost(job.get('lane'), job.get('paragraphs'))
+            response_ratio = (now - job['queued_at'] + cost) / cost
+            return (-job['priority'], ranks.get(job['id'], len(ranks)), -response_ratio)
+
+        return [job['id'] for job in sorted(self.queued.values(), key=key)]
+
+    def pop(self):
+        order = self.order()
+        if not order:
+            return None
+        self.discard(order[0])
+        return order[0]
+
+    def move(self, job_id, before_job_id):
+        """
+        将任务移到 before_job_id 之前（为 None 时移到队尾），并取得相邻任务的优先级。
+        拖动位置及之前的顺序被固定下来，之后的任务仍自动排序。
+        """
+        if job_id not in self.queued:
+            return False
+        order = self.order()
+        order.remove(job_id)
+        index = order.index(before_job_id) if before_job_id in order else len(order)
+        neighbour = order[index] if index < len(order) else (order[index - 1] if index else None)
+        if neighbour is not None:
+            self.queued[job_id]['priority'] = self.queued[neighbour]['priority']
+        order.insert(index, job_id)
+        self.pinned = order[:index + 1]
+        return True
+
+
+# --- Job Service ---
+class JobService:
+    """
+    保存任务的队列与状态，供 Qt 窗口和本地 HTTP API 共同使用。
+    浏览器、HTTP 连接池与 Zotero 客户端在任务间保持常驻。
+    """
+    def __init__(self, args):
+        self.args = args
+        # 并行任务数大于 1 时，每个执行线程从用户数据目录池中独占一个副本
+        self.executor = ThreadPoolExecutor(max_workers=max(1, int(args.get('max_parallel_jobs', 1) or 1)))
+        # 排队任务由调度器挑选，执行线程空闲时才决定下一个运行的任务
+        self.scheduler = JobScheduler()
+        self.estimator = ThreadPoolExecutor(max_workers=2)
+        # 预取排在最前的若干个任务的页面与资源
+        self.prefetcher = ThreadPoolExecutor(max_workers=2)
+        self.prefetching = {}     # job_id -> CancelEvent
+        self.prefetched = {}      # job_id -> 已写入预取缓存的 URL
+        self.estimating = set()   # 已提交估计的 job_id
+        # 异步引擎在一个事件循环中同时运行最多 max_parallel_jobs 个任务，不占用执行线程
+        self.engine = AsyncSaveEngine(args) if args.get('save_engine', 'threaded') == 'async' else None
+        self.running_async = 0
+        # 隔离执行时每个执行线程独占一个子进程，卡住或崩溃时结束并重启
+        self.isolated = args.get('save_engine', 'threaded') == 'isolated'
+        self.thread_state = threading.local()
+        self.worker_processes = []
+        self.stalls = 0
+        self.restarts = 0
+        if self.isolated:
+            atexit.register(self.stop_worker_processes)
+        self.lock = threading.Lock()
+        self.jobs = {}            # job_id -> 可序列化的任务状态
+        self.cancel_events = {}   # job_id -> CancelEvent
+        self.signals = {}         # job_id -> WorkerSignals，保持引用直到任务结束
+        self.next_job_id = 1
+        self.subscribers = []
+        host_limiter.configure(args)
+        threading.Thread(target=self.publish_host_stats, daemon=True).start()
+
+    def update_args(self, args):
+        self.args = args
+        host_limiter.configure(args)
+        pool = get_profile_pool(args)
+        if pool:
+            pool.refresh()
+
+    def host_stats(self):
+        return host_limiter.stats()
+
+    def publish_host_stats(self, interval=1.0):
+        # 各主机的请求速率与排队数变化时推送 hosts 事件
+        last_stats = None
+        while True:
+            time.sleep(interval)
+            stats = host_limiter.stats()
+            if stats != last_stats:
+                last_stats = stats
+                with self.lock:
+                    self.publish({'type': 'hosts', 'hosts': stats})
+
+    def subscribe(self, callback):
+        """
+        订阅任务事件，订阅时先收到一次包含当前所有任务的 submitted 事件。
+        """
+        with self.lock:
+            self.subscribers.append(callback)
+            if self.jobs:
+                callback({'type': 'submitted', 'jobs': [dict(job) for job in self.jobs.values()]})
+
+    def unsubscribe(self, callback):
+        with self.lock:
+            if callback in self.subscribers:
+                self.subscribers.remove(callback)
+
+    def publish(self, event):
+        # 调用方需持有 self.lock，保证事件顺序与状态变化一致
+        for callback in list(self.subscribers):
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"推送任务事件失败: {e}")
+
+    def submit_many(self, urls, collection_key, collection_name=''):
+        with self.lock:
+            jobs = []
+            for url in urls:
+                job = {
+                    'id': self.next_job_id,
+                    'url': url,
+                    'collection_key': collection_key,
+                    'collection_name': collection_name,
+                    'status': 'queued',
+                    'progress': 0,
+                    'stage': '',
+                    'title': '',
+                    'error': '',
+                    'filepath': '',
+                    'degraded': [],
+                    'priority': 0,
+                    'lane': '',
+                    'paragraphs': None,
+                    'cost': None,
+                    'stalls': 0,
+                    'restarts': 0,
+                    'resume_stage': 0,
+                    'submitted_at': time.time(),
+                    'queued_at': time.time(),
+                    'finished_at': None
+                }
+                self.next_job_id += 1
+                self.jobs[job['id']] = job
+                jobs.append(job)
+            self.publish({'type': 'submitted', 'jobs': [dict(job) for job in jobs]})
+
+        # 提前为所有排队的文献批量获取元数据
+        metadata_fetcher().prefetch([parse_arxiv_id(url)[0] for url in urls])
+        self.start_jobs([job['id'] for job in jobs])
+        return [job['id'] for job in jobs]
+
+    def start_jobs(self, job_ids):
+        """
+        将任务一次性加入调度器，只排序并推送一次 queue 事件，再为每个任务分配执行名额。
+        """
+        with self.lock:
+            for job_id in job_ids:
+                self.enqueue_job(job_id)
+            self.publish_queue()
+
+        if self.engine:
+            self.dispatch_async()
+        else:
+            for _ in job_ids:
+                self.executor.submit(self.run_next)
+
+    def enqueue_job(self, job_id):
+        # 调用方需持有 self.lock
+        job = self.jobs[job_id]
+        signals = WorkerSignals()
+        # 直接在工作线程中回调，不依赖 Qt 事件循环（服务模式下没有事件循环）
+        signals.progress.connect(self.on_progress, Qt.DirectConnection)
+        signals.title.connect(self.on_title, Qt.DirectConnection)
+        signals.finished.connect(self.on_finished, Qt.DirectConnection)
+        signals.error.connect(self.on_error, Qt.DirectConnection)
+        signals.cancelled.connect(self.on_cancelled, Qt.DirectConnection)
+        signals.degraded.connect(self.on_degraded, Qt.DirectConnection)
+        self.signals[job_id] = signals
+        self.cancel_events[job_id] = CancelEvent()
+        self.scheduler.add(job)
+
+    def run_next(self):
+        """
+        每个提交到线程池的任务在开始执行时才从调度器取出当前最应运行的任务。
+        """
+        with self.lock:
+            job_id = self.scheduler.pop()
+            if job_id is None:
+                return  # 对应的任务已在排队时被取消或移除
+            worker = self.create_worker(job_id, SavePageWorker)
+            self.publish_queue()
+        if self.isolated:
+            self.run_isolated(worker)
+        else:
+            worker.run()
+
+    def run_isolated(self, worker):
+        """
+        在当前执行线程独占的子进程中运行任务并转发事件。超过 stall_timeout 秒既没有心跳也没有进度时判定卡住，
+        结束子进程（连同浏览器）并重启，任务重新排队；子进程意外退出时同样处理。
+        """
+        process = self.worker_process()
+        job_id = worker.job_id
+        with saved_drafts_lock:
+            drafts = [[*key, draft] for key, draft in saved_drafts.items()]
+        slots = max(1, int(self.args.get('max_parallel_jobs', 1) or 1))
+        args = isolated_worker_args(worker.args, slots, process.profile_dir)
+        try:
+            process.send({'type': 'job', 'job_id': job_id, 'url': worker.url, 'args': args, 'drafts': drafts})
+        except OSError:
+            self.restart_job(process, job_id, 0, stalled=False)
+            return
+
+        stall_timeout = float(self.args.get('stall_timeout', 300))
+        stage = 0
+        last_seen = time.monotonic()
+        cancel_sent_at = None
+        while True:
+            try:
+                event = process.events.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue.Empty:
+                event = {}
+            now = time.monotonic()
+            if event is None:
+                self.restart_job(process, job_id, stage, stalled=False)
+                return
+            if event.get('type') == 'drafts':
+                with saved_drafts_lock:
+                    saved_drafts.update({(arxiv_id, version): draft for arxiv_id, version, draft in event['changed']})
+                    for arxiv_id, version in event['removed']:
+                        saved_drafts.pop((arxiv_id, version), None)
+            if event.get('job_id') == job_id:
+                last_seen = now
+                event_type = event['type']
+                if event_type == 'progress':
+                    stage = event['stage']
+                    worker.signals.progress.emit(job_id, stage)
+                elif event_type == 'title':
+                    worker.signals.title.emit(job_id, event['title'])
+                elif event_type == 'degraded':
+                    worker.signals.degraded.emit(job_id, event['resources'])
+                elif event_type == 'finished':
+                    worker.signals.finished.emit(job_id, event['filepath'])
+                    return
+                elif event_type == 'error':
+                    worker.signals.error.emit(job_id, event['message'])
+                    return
+                elif event_type == 'cancelled':
+                    worker.signals.cancelled.emit(job_id, now - worker.cancel_event.requested_at)
+                    return
+
+            if worker.cancel_event.is_set():
+                if cancel_sent_at is None:
+                    cancel_sent_at = now
+                    try:
+                        process.send({'type': 'cancel', 'job_id': job_id})
+                    except OSError:
+                        pass
+                elif now - cancel_sent_at > ISOLATED_CANCEL_GRACE:
+                    print(f"任务 {job_id} 未能及时响应取消，结束工作进程")
+                    self.replace_worker_process(process, stalled=False)
+                    worker.signals.cancelled.emit(job_id, now - worker.cancel_event.requested_at)
+                    return
+            elif now - last_seen > stall_timeout:
+                self.restart_job(process, job_id, stage, stalled=True)
+                return
+
+    def worker_process(self):
+        """
+        返回当前执行线程的子进程，尚未启动或已退出时启动。使用用户数据目录池时每个子进程独占一个副本，
+        源目录变化后先结束子进程再重新克隆。
+        """
+        process = getattr(self.thread_state, 'process', None)
+        pool = get_profile_pool(self.args)
+        if process is None:
+            process = self.thread_state.process = WorkerProcess(pool.acquire() if pool else None)
+            with self.lock:
+                self.worker_processes.append(process)
+        elif pool and process.profile_dir and pool.is_stale(process.profile_dir):
+            process.stop()
+            pool.release(process.profile_dir)
+            process.profile_dir = pool.acquire()
+        if not process.alive():
+            process.start()
+        return process
+
+    def replace_worker_process(self, process, stalled):
+        process.kill()
+        process.start()
+        with self.lock:
+            self.restarts += 1
+            self.stalls += int(stalled)
+            self.publish({'type': 'workers', 'workers': self.worker_stats()})
+
+    def restart_job(self, process, job_id, stage, stalled):
+        """
+        重启卡住或崩溃的子进程，并把任务重新排队。卡住前已进入第 5 阶段（翻译结果已存档）的任务
+        重新运行时直接从存档生成快照，不再重新翻译；重新排队超过 isolation_max_restarts 次后标记为失败。
+        """
+        reason = '卡住' if stalled else '工作进程意外退出'
+        print(f"任务 {job_id} 在第 {stage} 阶段{reason}，重启工作进程")
+        self.replace_worker_process(process, stalled)
+        max_restarts = int(self.args.get('isolation_max_restarts', 2))
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return  # 任务已被移除
+            job['restarts'] += 1
+            job['stalls'] += int(stalled)
+            requeue = job['restarts'] <= max_restarts and not self.cancel_events[job_id].is_set()
+            if requeue:
+                job.update(status='queued', progress=0, stage='', queued_at=time.time(),
+                           resume_stage=max(job['resume_stage'], stage))
+                self.publish({'type': 'requeued', 'job_id': job_id, 'reason': reason,
+                              'stalls': job['stalls'], 'restarts': job['restarts']})
+                self.scheduler.add(job)
+                self.publish_queue()
+        if requeue:
+            self.executor.submit(self.run_next)
+        elif self.cancel_events[job_id].is_set():
+            self.on_cancelled(job_id, 0.0)
+        else:
+            self.on_error(job_id, f"任务{reason}，已重启 {max_restarts} 次仍未完成")
+
+    def worker_stats(self):
+        return {
+            'processes': sum(process.alive() for process in self.worker_processes),
+            'stalls': self.stalls,
+            'restarts': self.restarts
+        }
+
+    def stop_worker_processes(self):
+        for process in list(self.worker_processes):
+            process.stop()
+
+    def dispatch_async(self):
+        """
+        异步引擎有空闲名额时，从调度器取出任务交给事件循环。
+        """
+        with self.lock:
+            limit = max(1, int(self.args.get('max_parallel_jobs', 1) or 1))
+            dispatched = False
+            while self.running_async < limit:
+                job_id = self.scheduler.pop()
+                if job_id is None:
+                    break
+                worker = self.create_worker(job_id, AsyncSavePageWorker)
+                self.running_async += 1
+                self.engine.submit(worker).add_done_callback(self.on_async_done)
+                dispatched = True
+            if dispatched:
+                self.publish_queue()
+
+    def on_async_done(self, future):
+        with self.lock:
+            self.running_async -= 1
+        self.dispatch_async()
+
+    def create_worker(self, job_id, worker_class):
+        # 调用方需持有 self.lock
+        job = self.jobs[job_id]
+        args = {**self.args, 'collection_key': job['collection_key'], 'collection_name': job['collection_name']}
+        if job['resume_stage'] >= 5:
+            # 卡住前翻译已完成并存档，重新运行时直接从存档生成快照
+            args['reuse_dom_archive'] = True
+        return worker_class(job_id, job['url'], args, self.signals[job_id], self.cancel_events[job_id])
+
+    def estimate_job(self, job_id):
+        """
+        判断任务走快速通道（已有翻译存档，只需重新生成快照）还是完整通道，并按页面段落数估计耗时。
+        来源页面优先从预取缓存读取，下载的页面写入缓存，任务运行时不再重复下载。
+        """
+        job = self.get_job(job_id)
+        if not job or job['status'] != 'queued':
+            with self.lock:
+                self.estimating.discard(job_id)
+            return
+        lane, paragraphs, stored = 'full', None, []
+        try:
+            probe = SavePageWorker(job_id, job['url'], self.args, None, CancelEvent())
+            arxiv_url = probe.check_arxiv_date_and_modify_url(job['url'])
+            if arxiv_url:
+                archive = dom_archive(self.args)
+                archive_path = archive.latest(*parse_arxiv_id(arxiv_url)) if self.args.get('reuse_dom_archive', True) else None
+                if archive_path:
+                    lane = 'short'
+                    paragraphs = count_paragraphs(archive.load(archive_path)['html'])
+                else:
+                    source_url = probe.resolve_source(arxiv_url)
+                    entry = probe.cache.get(source_url) if probe.cache else None
+                    if entry:
+                        html = entry[1].decode('utf-8', 'replace')
+                    else:
+                        host_limiter.acquire(source_url)
+                        response = http_session.get(source_url, timeout=20)
+                        host_limiter.record(source_url, response.status_code, response.headers)
+                        response.raise_for_status()
+                        html = response.text
+                        if probe.cache and response.url == source_url:
+                            probe.cache.put(source_url, response.headers.get('Content-Type') or 'text/html', response.content)
+                            stored.append(source_url)
+                    paragraphs = count_paragraphs(html)
+        except Exception as e:
+            print(f"估计任务 {job_id} 的耗时失败: {e}")
+        cost = estimate_job_cost(lane, paragraphs)
+        self.update_job(job_id, {'type': 'estimated', 'lane': lane, 'paragraphs': paragraphs, 'cost': cost},
+                        lane=lane, paragraphs=paragraphs, cost=cost)
+        with self.lock:
+            self.estimating.discard(job_id)
+            if stored and self.jobs[job_id]['status'] == 'queued':
+                self.prefetched[job_id] = [*self.prefetched.get(job_id, []), *stored]
+            elif stored:
+                self.release_cached(stored)
+            self.publish_queue()
+
+    def publish_queue(self):
+        # 调用方需持有 self.lock
+        order = self.scheduler.order()
+        self.publish({'type': 'queue', 'order': order})
+        self.schedule_prefetch(order)
+        self.schedule_estimates(order)
+
+    def schedule_estimates(self, order):
+        # 调用方需持有 self.lock
+        for job_id in order[:ESTIMATE_QUEUE_HEAD]:
+            if self.jobs[job_id]['cost'] is None and job_id not in self.estimating:
+                self.estimating.add(job_id)
+                self.estimator.submit(self.estimate_job, job_id)
+
+    def schedule_prefetch(self, order):
+        # 调用方需持有 self.lock
+        limit = int(self.args.get('prefetch_jobs', 2) or 0)
+        if limit <= 0:
+            return
+        for job_id in order[:limit]:
+            if job_id not in self.prefetching:
+                self.prefetching[job_id] = CancelEvent()
+                self.prefetcher.submit(self.prefetch_job, job_id, self.prefetching[job_id])
 
-# --- Worker Signals ---
-class WorkerSignals(QObject):
-    progress = pyqtSignal(int, int)     # (row, progress_value)
-    title = pyqtSignal(int, str)        # (row, title)
-    finished = pyqtSignal(int, str)     # (row, filepath)
-    error = pyqtSignal(int, str)        # (row, error_message)
+    def prefetch_job(self, job_id, cancel_event):
+        """
+        在任务排队时解析来源并下载页面及静态资源，任务开始后浏览器与内联阶段直接读取本地缓存。
+        缓存已达到预算时跳过，等队列下次变化（通常是有任务结束释放了缓存）时再试。
+        """
+        job = self.get_job(job_id)
+        if not job or job['status'] != 'queued':
+            return
+        cache = prefetch_cache(self.args)
+        if cache.total_size() >= cache.budget_bytes:
+            with self.lock:
+                self.prefetching.pop(job_id, None)
+            return
 
+        args = {**self.args, 'snapshot_cleanup': False}
+        probe = SavePageWorker(job_id, job['url'], args, None, cancel_event)
+        try:
+            arxiv_url = probe.check_arxiv_date_and_modify_url(job['url'])
+            if not arxiv_url:
+                return
+            if self.args.get('reuse_dom_archive', True) and dom_archive(self.args).latest(*parse_arxiv_id(arxiv_url)):
+                return  # 已有翻译存档，不需要浏览器
+            started_at = time.monotonic()
+            stored = probe.prefetch(probe.resolve_source(arxiv_url))
+            print(f"已预取任务 {job_id} 的 {len(stored)} 个页面与资源，耗时 {time.monotonic() - started_at:.1f}s")
+        except TaskCancelled:
+            return
+        except Exception as e:
+            print(f"预取任务 {job_id} 失败: {e}")
+            return
+        with self.lock:
+            if job_id in self.prefetching:
+                self.prefetched[job_id] = [*self.prefetched.get(job_id, []), *stored]
+            else:
+                # 预取期间任务已结束
+                self.release_cached(stored)
+
+    def release_prefetch(self, job_id):
+        # 调用方需持有 self.lock
+        cancel_event = self.prefetching.pop(job_id, None)
+        if cancel_event:
+            cancel_event.set()
+        self.release_cached(self.prefetched.pop(job_id, []))
+
+    def release_cached(self, urls):
+        # 调用方需持有 self.lock；其他排队任务也用到的资源（如公共样式表）保留
+        in_use = set().union(*self.prefetched.values()) if self.prefetched else set()
+        unused = [url for url in urls if url not in in_use]
+        if unused:
+            self.prefetcher.submit(prefetch_cache(self.args).discard, unused)
+
+    def set_priority(self, job_id, priority):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return False
+            job['priority'] = int(priority)
+            self.publish({'type': 'priority', 'job_id': job_id, 'priority': job['priority']})
+            self.publish_queue()
+        return True
+
+    def move(self, job_id, before_job_id=None):
+        """
+        将排队中的任务移到另一个任务之前，before_job_id 为 None 时移到队尾。
+        """
+        with self.lock:
+            if not self.scheduler.move(job_id, before_job_id):
+                return False
+            self.publish({'type': 'moved', 'job_id': job_id, 'before': before_job_id, 'priority': self.jobs[job_id]['priority']})
+            self.publish_queue()
+        return True
+
+    def retry(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job['status'] not in ('error', 'cancelled'):
+                return False
+            job.update(status='queued', progress=0, stage='', error='', degraded=[], finished_at=None, queued_at=time.time(),
+                       stalls=0, restarts=0, resume_stage=0)
+            self.publish({'type': 'retried', 'job_id': job_id})
+        self.start_jobs([job_id])
+        return True
+
+    def cancel(self, job_id):
+        with self.lock:
+            cancel_event = self.cancel_events.get(job_id)
+            # 尚未开始的任务直接出队，不必等到轮到它时才取消
+            dequeued = self.scheduler.discard(job_id)
+            if dequeued:
+                self.publish_queue()
+        if cancel_event is None:
+            return False
+        cancel_event.set()
+        if dequeued:
+            self.on_cancelled(job_id, 0.0)
+        return True
 
-# --- Worker Class ---
-class SavePageWorker:
-    def __init__(self, row, url, args, signals, cancel_event):
-        self.row = row  # 行号，用于更新表格中的对应项
-        self.url = url
-        self.args = args
-        self.signals = signals
-        self.cancel_event = cancel_event
-        self.stages = [
-            "(1/7) 转换 Arxiv url",
-            "(2/7) 启动浏览器并加载扩展",
-            "(3/7) 访问目标网页",
-            "(4/7) 等待页面内容翻译完成",
-            "(5/7) 页面内容已加载并解析",
-            "(6/7) 下载并编码资源",
-            "(7/7) 保存到 Zotero"
-        ]
+    def remove(self, job_id):
+        """
+        取消并从列表中移除任务。
+        """
+        return bool(self.remove_many([job_id]))
 
-    def check_cancelled(self):
-        if self.cancel_event.is_set():
-            raise Exception("Cancel Task")
-    
-    def check_arxiv_date_and_modify_url(self, arxiv_url):
-        # 支持的链接格式提示
-        supported_formats = """
-        支持的 Arxiv 链接格式：
-        1. https://arxiv.org/abs/{YYMM}.{NNNNN}
-        2. https://arxiv.org/html/{YYMM}.{NNNNN}
-        3. https://arxiv.org/pdf/{YYMM}.{NNNNN}
-        4. https://ar5iv.org/abs/{YYMM}.{NNNNN}
-        5. https://ar5iv.labs.arxiv.org/html/{YYMM}.{NNNNN}
-        6. arxiv.org/abs/{YYMM}.{NNNNN} (无 https 前缀)
-        7. ar5iv.labs.arxiv.org/html/{YYMM}.{NNNNN} (无 https 前缀)
-        8. arxiv:YYMM.NNNNN (Zotero 中的 Arxiv 链接格式)
+    def remove_many(self, job_ids):
+        """
+        取消并从列表中移除多个任务，只发布一次 removed 事件与队列事件。返回实际移除的任务 ID。
         """
+        cancel_events = []
+        with self.lock:
+            removed = [job_id for job_id in dict.fromkeys(job_ids) if job_id in self.jobs]
+            dequeued = False
+            for job_id in removed:
+                # 尚未开始的任务直接出队，运行中的任务通过取消事件停止
+                dequeued = self.scheduler.discard(job_id) or dequeued
+                cancel_event = self.cancel_events.pop(job_id, None)
+                if cancel_event is not None:
+                    cancel_events.append(cancel_event)
+                del self.jobs[job_id]
+                self.signals.pop(job_id, None)
+                self.release_prefetch(job_id)
+            if removed:
+                self.publish({'type': 'removed', 'job_ids': removed})
+            if dequeued:
+                self.publish_queue()
+        for cancel_event in cancel_events:
+            cancel_event.set()
+        return removed
+
+    def get_job(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        with self.lock:
+            return [dict(job) for job in self.jobs.values()]
+
+    def update_job(self, job_id, event, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return  # 任务已被移除
+            job.update(fields)
+            if job['status'] in ('finished', 'error', 'cancelled'):
+                job['finished_at'] = time.time()
+                self.signals.pop(job_id, None)
+                self.release_prefetch(job_id)
+            self.publish({**event, 'job_id': job_id})
+
+    def on_progress(self, job_id, progress_value):
+        stage = JOB_STAGES[progress_value - 1] if 1 <= progress_value <= len(JOB_STAGES) else ''
+        self.update_job(job_id, {'type': 'progress', 'progress': progress_value}, status='running', progress=progress_value, stage=stage)
+
+    def on_title(self, job_id, title):
+        self.update_job(job_id, {'type': 'title', 'title': title}, title=title)
+
+    def on_finished(self, job_id, filepath):
+        self.update_job(job_id, {'type': 'finished', 'filepath': filepath}, status='finished', progress=len(JOB_STAGES), filepath=filepath)
+
+    def on_error(self, job_id, error_message):
+        self.update_job(job_id, {'type': 'error', 'message': error_message}, status='error', error=error_message)
+
+    def on_cancelled(self, job_id, elapsed):
+        self.update_job(job_id, {'type': 'cancelled', 'elapsed': elapsed}, status='cancelled')
+
+    def on_degraded(self, job_id, resources):
+        self.update_job(job_id, {'type': 'degraded', 'resources': resources}, degraded=resources)
+
+
+class RemoteJobService:
+    """
+    通过本地 HTTP API 连接到已在运行的保存服务，接口与 JobService 相同。每个请求都带上共享的 service_token。
+    """
+    def __init__(self, base_url, token=''):
+        self.base_url = base_url
+        self.headers = {SERVICE_TOKEN_HEADER: token}
+        self.subscribers = []
+        self.stream_thread = None
+
+    def request(self, method, path, payload=None):
+        try:
+            if payload is None and method != 'GET':
+                payload = {}  # 服务端只接受 application/json 的 POST
+            response = http_session.request(method, self.base_url + path, json=payload, headers=self.headers, timeout=10)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            raise Exception(f"无法连接到保存服务: {e}")
 
-        arxiv_url = arxiv_url.replace(' ', '').lower()
-        # 如果没有 /，则可能是 Zotero 中的 Arxiv 链接格式
-        if '/' not in arxiv_url:
-            # 去除所有多余空格
-            match = re.search(r'arxiv:(\d{4})\.(\d{5})(v\d+)?', arxiv_url)
-            if not match:
-                print("无效的 Arxiv 链接格式")
-                print(supported_formats)
-                return None
+    def update_args(self, args):
+        pass  # 配置由服务进程自行读取
 
-            paper_year = int(match.group(1)[:2]) + 2000
-            paper_month = int(match.group(1)[2:4])
-            arxiv_url = f"https://arxiv.org/abs/{match.group(1)}.{match.group(2)}"
-            print(f"转换为标准 Arxiv 链接: {arxiv_url}")
+    def subscribe(self, callback):
+        self.subscribers.append(callback)
+        if self.stream_thread is None:
+            self.stream_thread = threading.Thread(target=self.stream_events, daemon=True)
+            self.stream_thread.start()
 
-        else:
-            # 补全无 http 前缀的链接
-            if not arxiv_url.startswith('http'):
-                arxiv_url = 'https://' + arxiv_url
-
-            # 正则匹配不同格式的 Arxiv 链接
-            match = re.search(r'https://(?:arxiv\.org|ar5iv\.labs\.arxiv\.org|ar5iv\.org|)/(abs|html|pdf)/(\d{4})\.(\d{5})(v\d+)?', arxiv_url)
-            if not match:
-                print("无效的 Arxiv 链接格式")
-                print(supported_formats)
-                return None
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
 
-            link_type = match.group(1)
-            paper_year = int(match.group(2)[:2]) + 2000  # 转换为完整年份
-            paper_month = int(match.group(2)[2:4])
+    def stream_events(self):
+        while True:
+            try:
+                with http_session.get(self.base_url + '/events', headers=self.headers, stream=True, timeout=(5, 60)) as response:
+                    response.raise_for_status()
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        for callback in list(self.subscribers):
+                            callback(event)
+            except Exception as e:
+                print(f"任务事件流中断，稍后重连: {e}")
+                time.sleep(2)
 
-        now = datetime.now()
-        current_year = now.year
-        current_month = now.month
-        current_day = now.day
-
-        # 判断当前日期是否在本月或下月前5天
-        if (current_year == paper_year and current_month == paper_month) or \
-        (current_year == paper_year and current_month == paper_month + 1 and current_day <= 5):
-            if link_type == "abs":
-                return arxiv_url.replace("abs", "html")
-            else:
-                return arxiv_url  # 如果已经是 html 格式则不变
-        else:
-            if "ar5iv" in arxiv_url:
-                return arxiv_url
-            else:
-                return arxiv_url.replace("arxiv", "ar5iv")
+    def submit_many(self, urls, collection_key, collection_name=''):
+        payload = {'urls': urls, 'collection_key': collection_key, 'collection_name': collection_name}
+        return self.request('POST', '/jobs', payload)['job_ids']
 
-    def run(self):
+    def send_command(self, method, path, payload=None):
+        # 取消 / 重试 / 移除失败时只打印错误，不影响界面
         try:
-            self.check_cancelled()
-            self.signals.progress.emit(self.row, 1)  # Stage 1
-            arxiv_url = self.check_arxiv_date_and_modify_url(self.url)
-            if not arxiv_url:
-                raise Exception("不合法的 Arxiv 路径")
+            return self.request(method, path, payload)['ok']
+        except Exception as e:
+            print(e)
+            return False
 
-            self.check_cancelled()
-            self.signals.progress.emit(self.row, 2)  # Stage 2
-            with sync_playwright() as p:
-                # Launch browser and load extension if needed
-                if not os.path.exists(resource_path(self.args['user_data_dir'])):
-                    raise Exception(f"无法找到用户数据目录: {resource_path(self.args['user_data_dir'])}")
-
-                if not os.path.exists(resource_path(self.args['extension_path'])):
-                    raise Exception(f"无法找到扩展目录: {resource_path(self.args['extension_path'])}")
-                
-                if not os.path.exists(self.args['zotero_storage']):
-                    raise Exception(f"无法找到 Zotero 存储目录: {self.args['zotero_storage']}")
-
-                browser_context = p.chromium.launch_persistent_context(
-                    user_data_dir=resource_path(self.args['user_data_dir']),
-                    headless=False,
-                    args=[
-                        "--headless=new",
-                        f'--disable-extensions-except={resource_path(self.args["extension_path"])}',
-                        f'--load-extension={resource_path(self.args["extension_path"])}',
-                    ],
-                )
+    def retry(self, job_id):
+        return self.send_command('POST', f'/jobs/{job_id}/retry')
 
-                self.check_cancelled()
-                self.signals.progress.emit(self.row, 3)  # Stage 3
-                page = browser_context.new_page()
-                page = browser_context.pages[0] if browser_context.pages else browser_context.new_page()
+    def cancel(self, job_id):
+        return self.send_command('POST', f'/jobs/{job_id}/cancel')
 
-                # Navigate to URL
-                page.goto(arxiv_url, wait_until='networkidle')
+    def remove(self, job_id):
+        return self.send_command('DELETE', f'/jobs/{job_id}')
 
-                page_title = page.title()
-                page_title = re.sub(r'\[.*\]', '', page_title).strip()
-                
-                self.check_cancelled()
-                self.signals.title.emit(self.row, page_title)
+    def remove_many(self, job_ids):
+        # 一次请求移除全部任务，避免逐个请求阻塞界面
+        try:
+            return self.request('DELETE', '/jobs', {'job_ids': list(job_ids)})['job_ids']
+        except Exception as e:
+            print(e)
+            return []
+
+    def set_priority(self, job_id, priority):
+        return self.send_command('POST', f'/jobs/{job_id}/priority', {'priority': priority})
+
+    def move(self, job_id, before_job_id=None):
+        return self.send_command('POST', f'/jobs/{job_id}/move', {'before': before_job_id})
+
+    def get_job(self, job_id):
+        return self.request('GET', f'/jobs/{job_id}')
+
+    def list_jobs(self):
+        return self.request('GET', '/jobs')['jobs']
+
+    def host_stats(self):
+        return self.request('GET', '/hosts')['hosts']
+
+    def worker_stats(self):
+        return self.request('GET', '/workers')['workers']
+
+
+SERVICE_TOKEN_HEADER = 'X-Service-Token'
+LOCAL_HOSTNAMES = ('127.0.0.1', 'localhost')
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    本地 JSON API。任意网页都能向 127.0.0.1 发送跨域请求，因此所有请求都须在 X-Service-Token 头中带上
+    service_token，Host 与 Origin 只接受本机地址（防止 DNS 重绑定），POST 的内容必须是 application/json 的 JSON 对象：
+        GET    /jobs                列出任务
+        POST   /jobs                提交任务 {"urls": [...]} 或 {"text": "..."}，可带 collection_key
+        GET    /jobs/<id>           查询任务状态
+        POST   /jobs/<id>/cancel    取消任务
+        POST   /jobs/<id>/retry     重试失败或已取消的任务
+        POST   /jobs/<id>/priority  设置优先级 {"priority": 1}，数值越大越先运行
+        POST   /jobs/<id>/move      将排队中的任务移到另一任务之前 {"before": <id>}，省略时移到队尾
+        DELETE /jobs/<id>           取消并移除任务
+        GET    /hosts               各主机当前的请求速率、限速上限与排队数
+        GET    /workers             隔离执行模式下的工作进程数、卡住与重启次数
+        GET    /events              以每行一个 JSON 的形式持续推送任务事件
+    """
+    def log_message(self, format, *args):
+        pass  # 不在控制台打印每个请求
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        """
+        读取请求体中的 JSON 对象，Content-Type 不是 application/json 或内容不是 JSON 对象时抛出 ValueError。
+        """
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            raise ValueError('Content-Type 必须为 application/json')
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        payload = json.loads(self.rfile.read(length).decode('utf-8'))
+        if not isinstance(payload, dict):
+            raise ValueError('请求内容必须是 JSON 对象')
+        return payload
+
+    def local_request(self):
+        host = urlparse(f"//{self.headers.get('Host', '')}").hostname
+        origin = self.headers.get('Origin')
+        return host in LOCAL_HOSTNAMES and (origin is None or urlparse(origin).hostname in LOCAL_HOSTNAMES)
+
+    def authorized(self):
+        if not self.local_request():
+            self.send_json(403, {'error': '只接受来自本机的请求'})
+            return False
+        token = self.headers.get(SERVICE_TOKEN_HEADER) or ''
+        if self.server.service_token and hmac.compare_digest(token.encode('utf-8'), self.server.service_token.encode('utf-8')):
+            return True
+        self.send_json(401, {'error': '缺少或错误的 service_token'})
+        return False
+
+    def route(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        job_id = int(parts[1]) if len(parts) >= 2 and parts[0] == 'jobs' and parts[1].isdigit() else None
+        return parts, job_id
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        service = self.server.service
+        parts, job_id = self.route()
+        if parts == ['jobs']:
+            self.send_json(200, {'jobs': service.list_jobs()})
+        elif job_id is not None and len(parts) == 2:
+            job = service.get_job(job_id)
+            self.send_json(200 if job else 404, job or {'error': '任务不存在'})
+        elif parts == ['hosts']:
+            self.send_json(200, {'hosts': service.host_stats()})
+        elif parts == ['workers']:
+            self.send_json(200, {'workers': service.worker_stats()})
+        elif parts == ['events']:
+            self.stream_events(service)
+        else:
+            self.send_json(404, {'error': '未知的接口'})
 
-                self.check_cancelled()
-                self.signals.progress.emit(self.row, 4)  # Stage 4
-                # Wait for translation (adjust selector as needed)
-                try:
-                    page.wait_for_selector('font.immersive-translate-loading-spinner.notranslate', state='detached', timeout=1200000)
-                except Exception:
-                    raise Exception("等待翻译完成超时，可能翻译尚未完成")
+    def do_POST(self):
+        if not self.authorized():
+            return
+        service = self.server.service
+        parts, job_id = self.route()
+        try:
+            payload = self.read_json()
+        except ValueError as e:
+            self.send_json(400, {'error': f"请求内容无效: {e}"})
+            return
 
-                self.check_cancelled()
-                self.signals.progress.emit(self.row, 5)  # Stage 5
-                html_content = page.content()
-                output_filename = re.sub(r'\[.*?\]', '', page.title()).strip() + ".html"
-                output_filepath = os.path.join(self.args['output_dir'], output_filename)
-
-                soup = BeautifulSoup(html_content, 'html.parser')
-
-                resource_tags = []
-                resource_tags.extend(soup.find_all('img', src=True))
-                resource_tags.extend(soup.find_all('link', href=True, rel='stylesheet'))
-                resource_tags.extend(soup.find_all('script', src=True))
-
-                resource_map = {}
-                base_url = page.url
-
-                resources = []
-                for tag in resource_tags:
-                    if tag.name == 'img':
-                        url_attr = 'src'
-                        media_type = 'image'
-                    elif tag.name == 'link':
-                        url_attr = 'href'
-                        media_type = 'text/css'
-                    elif tag.name == 'script':
-                        url_attr = 'src'
-                        media_type = 'application/javascript'
-                    else:
-                        continue
-
-                    resource_url = tag.get(url_attr)
-                    if resource_url and not resource_url.startswith('data:'):
-                        resource_url_absolute = urljoin(base_url, resource_url)
-                        resources.append({
-                            'tag': tag,
-                            'url_attr': url_attr,
-                            'resource_url': resource_url,
-                            'resource_url_absolute': resource_url_absolute,
-                            'media_type': media_type
-                        })
-
-                def download_and_encode(resource):
-                    resource_url_absolute = resource['resource_url_absolute']
-                    media_type = resource['media_type']
-                    resource_url = resource['resource_url']
+        if parts == ['jobs']:
+            urls = payload.get('urls') or ([payload['url']] if payload.get('url') else [])
+            if payload.get('text'):
+                urls += [arxiv_abs_url(arxiv_id, version) for arxiv_id, version in extract_arxiv_ids(payload['text'])]
+            if not urls:
+                self.send_json(400, {'error': '缺少 url、urls 或 text'})
+                return
+            collection_key = payload.get('collection_key', service.args.get('last_used_collection_key', ''))
+            collection_name = payload.get('collection_name', service.args.get('last_used_collection_name', ''))
+            self.send_json(201, {'job_ids': service.submit_many(urls, collection_key, collection_name)})
+        elif job_id is not None and parts[2:] == ['cancel']:
+            self.send_json(200, {'ok': service.cancel(job_id)})
+        elif job_id is not None and parts[2:] == ['retry']:
+            self.send_json(200, {'ok': service.retry(job_id)})
+        elif job_id is not None and parts[2:] == ['priority'] and isinstance(payload.get('priority'), int):
+            self.send_json(200, {'ok': service.set_priority(job_id, payload['priority'])})
+        elif job_id is not None and parts[2:] == ['move']:
+            self.send_json(200, {'ok': service.move(job_id, payload.get('before'))})
+        else:
+            self.send_json(404, {'error': '未知的接口'})
 
-                    try:
-                        response = requests.get(resource_url_absolute, timeout=10)
-                        response.raise_for_status()
-                    except Exception as e:
-                        raise Exception(f"下载资源失败 {resource_url_absolute} ")
+    def do_DELETE(self):
+        if not self.authorized():
+            return
+        parts, job_id = self.route()
+        if job_id is not None and len(parts) == 2:
+            self.send_json(200, {'ok': self.server.service.remove(job_id)})
+        elif parts == ['jobs']:
+            try:
+                job_ids = self.read_json().get('job_ids')
+            except ValueError as e:
+                self.send_json(400, {'error': f"请求内容无效: {e}"})
+                return
+            if not isinstance(job_ids, list) or not all(isinstance(job_id, int) for job_id in job_ids):
+                self.send_json(400, {'error': 'job_ids 必须是任务 ID 列表'})
+                return
+            self.send_json(200, {'job_ids': self.server.service.remove_many(job_ids)})
+        else:
+            self.send_json(404, {'error': '未知的接口'})
+
+    def stream_events(self, service):
+        events = queue.Queue()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        service.subscribe(events.put)
+        try:
+            while True:
+                try:
+                    event = events.get(timeout=15)
+                except queue.Empty:
+                    event = {'type': 'heartbeat'}  # 保持连接，并及时发现客户端断开
+                self.wfile.write((json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            service.unsubscribe(events.put)
+
+
+def start_service_server(service, port, token):
+    server = ThreadingHTTPServer(('127.0.0.1', port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.service_token = token
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"保存服务已启动: http://127.0.0.1:{port}")
+    return server
+
+
+def connect_job_service(args):
+    """
+    如果本机已有保存服务在运行则作为它的客户端，否则在进程内启动服务并开放 API。
+    返回 (service, server)，作为客户端时 server 为 None。
+    """
+    port = int(args.get('service_port', 0) or 0)
+    if port:
+        token = ensure_token(args, 'service_token')
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            http_session.get(base_url + '/jobs', headers={SERVICE_TOKEN_HEADER: token}, timeout=1).raise_for_status()
+            print(f"已连接到正在运行的保存服务: {base_url}")
+            return RemoteJobService(base_url, token), None
+        except Exception:
+            pass
+
+    service = JobService(args)
+    server = None
+    if port:
+        try:
+            server = start_service_server(service, port, token)
+        except OSError as e:
+            print(f"无法启动保存服务 API: {e}")
+    return service, server
+
+
+# --- Watcher ---
+class LibraryWatcher:
+    """
+    定期检查 Zotero 中的待翻译文献库与 Arxiv RSS / 列表页，只获取增量内容，
+    将新出现的 Arxiv 编号提交到保存服务。
+    """
+    MAX_SEEN_IDS = 50000
+
+    def __init__(self, service, args, state_file=WATCH_STATE_FILE):
+        self.service = service
+        self.args = args
+        self.state_file = state_file
+        self.state = self.load_state()
+        self.seen_ids = set(self.state['seen_ids'])
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def load_state(self):
+        state = {'library_version': 0, 'feeds': {}, 'seen_ids': []}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state.update(json.load(f))
+        except Exception:
+            pass
+        return state
+
+    def save_state(self):
+        # 只保留最近的编号，避免状态文件无限增长
+        self.state['seen_ids'] = self.state['seen_ids'][-self.MAX_SEEN_IDS:]
+        self.seen_ids = set(self.state['seen_ids'])
+        tmp_file = self.state_file + '.tmp'
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f)
+            os.replace(tmp_file, self.state_file)
+        except Exception as e:
+            print(f"保存监视状态失败: {e}")
 
-                    content_type = response.headers.get('Content-Type')
-                    if not content_type:
-                        content_type, _ = mimetypes.guess_type(resource_url_absolute)
+    def is_enabled(self):
+        return bool(self.args.get('watch_collection_key') or self.args.get('watch_feeds'))
 
-                    if not content_type:
-                        content_type = media_type
+    def start(self):
+        if self.thread is None and self.is_enabled():
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
 
-                    data_base64 = base64.b64encode(response.content).decode('utf-8')
-                    data_url = f'data:{content_type};base64,{data_base64}'
+    def stop(self):
+        self.stop_event.set()
 
-                    resource_map[resource_url] = data_url
+    def run(self):
+        interval = float(self.args.get('watch_interval_minutes', 15)) * 60
+        while not self.stop_event.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"监视检查失败: {e}")
+            self.stop_event.wait(interval)
 
-                self.check_cancelled()
-                self.signals.progress.emit(self.row, 6)  # Stage 6
-                with ThreadPoolExecutor(max_workers=32) as executor:
-                    list(tqdm(executor.map(download_and_encode, resources), total=len(resources), desc="Downloading resources"))
+    def poll(self):
+        """
+        新的库版本号、ETag 与已见编号先记录在 updates 中，全部检查完成并提交到服务后才写入状态，
+        中途出错时下次检查会重新获取同一批增量。
+        """
+        updates = {'feeds': {}, 'seen_ids': []}
+        new_ids = []
+        if self.args.get('watch_collection_key'):
+            new_ids += self.poll_zotero(self.args['watch_collection_key'], updates)
+        for feed_url in self.args.get('watch_feeds', []):
+            new_ids += self.poll_feed(feed_url, updates)
+
+        known_ids = self.seen_ids.union(updates['seen_ids'])
+        new_ids = [(arxiv_id, version) for arxiv_id, version in dict(new_ids).items() if arxiv_id not in known_ids]
+        if new_ids:
+            target_key = self.args.get('watch_target_collection_key') or self.args.get('last_used_collection_key', '')
+            target_name = self.args.get('watch_target_collection_name') or self.args.get('last_used_collection_name', '')
+            self.service.submit_many([arxiv_abs_url(arxiv_id, version) for arxiv_id, version in new_ids], target_key, target_name)
+            print(f"监视发现 {len(new_ids)} 篇新文献，已加入队列")
+
+        if 'library_version' in updates:
+            self.state['library_version'] = updates['library_version']
+        self.state['feeds'].update(updates['feeds'])
+        self.state['seen_ids'].extend(updates['seen_ids'])
+        self.state['seen_ids'].extend(arxiv_id for arxiv_id, _ in new_ids)
+        self.save_state()
+        return new_ids
+
+    def poll_zotero(self, collection_key, updates):
+        """
+        通过库版本号只获取上次检查之后新增或修改的条目。
+        """
+        zot = get_zotero_client(self.args)
+        library_version = zot.last_modified_version()
+        since = self.state['library_version']
+        if library_version == since:
+            return []
+
+        items = zot.everything(zot.collection_items_top(collection_key, since=since))
+        updates['library_version'] = library_version
+        texts = []
+        for item in items:
+            data = item.get('data', {})
+            texts.extend(str(data.get(field, '')) for field in ('url', 'archiveID', 'DOI', 'extra', 'number'))
+        return extract_arxiv_ids('\n'.join(texts))
+
+    def poll_feed(self, feed_url, updates):
+        """
+        通过 ETag / Last-Modified 条件请求，只在内容变化时重新解析 RSS 或列表页。
+        """
+        feed_state = self.state['feeds'].get(feed_url, {})
+        headers = {}
+        if feed_state.get('etag'):
+            headers['If-None-Match'] = feed_state['etag']
+        if feed_state.get('last_modified'):
+            headers['If-Modified-Since'] = feed_state['last_modified']
+
+        host_limiter.acquire(feed_url)
+        try:
+            response = http_session.get(feed_url, headers=headers, timeout=30)
+        except Exception:
+            host_limiter.record(feed_url)
+            raise
+        host_limiter.record(feed_url, response.status_code, response.headers)
+        if response.status_code == 304:
+            return []
+        response.raise_for_status()
+
+        first_poll = feed_url not in self.state['feeds']
+        updates['feeds'][feed_url] = {
+            'etag': response.headers.get('ETag', ''),
+            'last_modified': response.headers.get('Last-Modified', '')
+        }
+        arxiv_ids = extract_arxiv_ids(response.text)
+        if first_poll and not self.args.get('watch_feed_backfill', False):
+            # 首次检查只记录已有条目，之后只处理新出现的文献
+            updates['seen_ids'].extend(arxiv_id for arxiv_id, _ in arxiv_ids if arxiv_id not in self.seen_ids)
+            return []
+        return arxiv_ids
+
+
+# --- Worker Fleet ---
+class FleetQueue:
+    """
+    多个 worker 进程（可在不同机器上）共享的任务队列，保存在一个 SQLite 文件中。
+    worker 以限时租约领取任务并定期续约，进程崩溃后租约过期，任务会被其他 worker 重新领取；
+    超过 max_attempts 次仍未完成的任务标记为失败。各阶段进度与最终结果写回队列。
+    """
+    REPORT_FIELDS = ('progress', 'stage', 'title', 'degraded')
+
+    def __init__(self, path, lease_seconds=120, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    def connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 自动提交模式，需要原子性的操作显式使用 BEGIN IMMEDIATE
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT, collection_key TEXT, collection_name TEXT,
+            priority INTEGER DEFAULT 0, status TEXT DEFAULT 'queued', lease_owner TEXT, lease_expires REAL,
+            attempts INTEGER DEFAULT 0, progress INTEGER DEFAULT 0, stage TEXT DEFAULT '', title TEXT DEFAULT '',
+            degraded INTEGER DEFAULT 0, error TEXT DEFAULT '', filepath TEXT DEFAULT '',
+            submitted_at REAL, updated_at REAL)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS job_events (
+            job_id INTEGER, worker TEXT, type TEXT, value TEXT, at REAL)''')
+        return conn
+
+    def submit(self, urls, collection_key, collection_name='', priority=0):
+        now = time.time()
+        with closing(self.connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            job_ids = [conn.execute(
+                'INSERT INTO jobs (url, collection_key, collection_name, priority, submitted_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (url, collection_key, collection_name, priority, now, now)
+            ).lastrowid for url in urls]
+            conn.execute('COMMIT')
+        return job_ids
+
+    def claim(self, worker):
+        """
+        领取一个排队中或租约已过期的任务，没有可领取的任务时返回 None。
+        """
+        now = time.time()
+        with closing(self.connect()) as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            expired = conn.execute(
+                "SELECT id, lease_owner FROM jobs WHERE status = 'claimed' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            ).fetchall()
+            for row in expired:
+                conn.execute("UPDATE jobs SET status = 'error', error = ?, lease_owner = NULL, updated_at = ? WHERE id = ?",
+                             (f"租约已过期 {self.max_attempts} 次，任务放弃", now, row['id']))
+                self.log(conn, row['id'], row['lease_owner'], 'abandoned', '')
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'claimed' AND lease_expires < ?) "
+                "ORDER BY priority DESC, id LIMIT 1", (now,)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            if row['status'] == 'claimed':
+                print(f"任务 {row['id']} 在 {row['lease_owner']} 上的租约已过期，重新领取")
+                self.log(conn, row['id'], row['lease_owner'], 'lease_expired', '')
+            conn.execute(
+                "UPDATE jobs SET status = 'claimed', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "progress = 0, stage = '', error = '', updated_at = ? WHERE id = ?",
+                (worker, now + self.lease_seconds, now, row['id'])
+            )
+            self.log(conn, row['id'], worker, 'claimed', '')
+            conn.execute('COMMIT')
+            return {**dict(row), 'status': 'claimed', 'lease_owner': worker, 'attempts': row['attempts'] + 1}
 
-                for resource in resources:
-                    tag = resource['tag']
-                    url_attr = resource['url_attr']
-                    resource_url = resource['resource_url']
-                    data_url = resource_map.get(resource_url)
-                    if data_url:
-                        tag[url_attr] = data_url
+    def heartbeat(self, job_id, worker):
+        """
+        续约。任务已被取消或租约已被其他 worker 接手时返回 False，调用方应停止该任务。
+        """
+        now = time.time()
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'claimed'",
+                (now + self.lease_seconds, now, job_id, worker)
+            )
+            return cursor.rowcount == 1
 
-                if not os.path.exists(self.args['output_dir']):
-                    os.makedirs(self.args['output_dir'])
+    def report(self, job_id, worker, **fields):
+        fields = {key: value for key, value in fields.items() if key in self.REPORT_FIELDS}
+        if not fields:
+            return False
+        assignments = ', '.join(f"{key} = ?" for key in fields)
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'claimed'",
+                (*fields.values(), time.time(), job_id, worker)
+            )
+            if 'stage' in fields:
+                self.log(conn, job_id, worker, 'stage', fields['stage'])
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker, status, error='', filepath=''):
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, filepath = ?, lease_owner = NULL, updated_at = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'claimed'",
+                (status, error, filepath, time.time(), job_id, worker)
+            )
+            self.log(conn, job_id, worker, status, error or filepath)
+            return cursor.rowcount == 1
+
+    def cancel(self, job_id):
+        with closing(self.connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'cancelled', lease_owner = NULL, updated_at = ? WHERE id = ? AND status IN ('queued', 'claimed')",
+                (time.time(), job_id)
+            )
+            return cursor.rowcount == 1
+
+    def list_jobs(self):
+        with closing(self.connect()) as conn:
+            return [dict(row) for row in conn.execute('SELECT * FROM jobs ORDER BY id')]
+
+    def log(self, conn, job_id, worker, event_type, value):
+        conn.execute('INSERT INTO job_events (job_id, worker, type, value, at) VALUES (?, ?, ?, ?, ?)',
+                     (job_id, worker, event_type, value, time.time()))
+
+
+class RemoteFleetQueue:
+    """
+    通过协调服务的 HTTP 接口访问 FleetQueue，供其他机器上的 worker 使用，接口与 FleetQueue 相同。
+    每个请求都带上共享的 fleet_token。
+    """
+    def __init__(self, base_url, token=''):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+
+    def request(self, method, path, payload=None):
+        if payload is None and method != 'GET':
+            payload = {}  # 服务端只接受 application/json 的 POST
+        response = http_session.request(method, f"{self.base_url}/fleet{path}", json=payload, timeout=30,
+                                        headers={FLEET_TOKEN_HEADER: self.token})
+        response.raise_for_status()
+        return response.json()
+
+    def submit(self, urls, collection_key, collection_name='', priority=0):
+        payload = {'urls': urls, 'collection_key': collection_key, 'collection_name': collection_name, 'priority': priority}
+        return self.request('POST', '/jobs', payload)['job_ids']
+
+    def claim(self, worker):
+        return self.request('POST', '/claim', {'worker': worker}).get('job')
+
+    def heartbeat(self, job_id, worker):
+        return self.request('POST', f'/jobs/{job_id}/heartbeat', {'worker': worker})['ok']
+
+    def report(self, job_id, worker, **fields):
+        return self.request('POST', f'/jobs/{job_id}/report', {'worker': worker, **fields})['ok']
+
+    def complete(self, job_id, worker, status, error='', filepath=''):
+        payload = {'worker': worker, 'status': status, 'error': error, 'filepath': filepath}
+        return self.request('POST', f'/jobs/{job_id}/complete', payload)['ok']
+
+    def cancel(self, job_id):
+        return self.request('POST', f'/jobs/{job_id}/cancel')['ok']
+
+    def list_jobs(self):
+        return self.request('GET', '/jobs')['jobs']
+
+
+FLEET_TOKEN_HEADER = 'X-Fleet-Token'
+
+
+class FleetRequestHandler(ServiceRequestHandler):
+    """
+    协调服务的 JSON API，所有请求都须在 X-Fleet-Token 头中带上与服务端一致的 fleet_token，路径以 /fleet 开头：
+        GET  /fleet/jobs                  列出任务
+        POST /fleet/jobs                  提交任务 {"urls": [...], "collection_key": ..., "priority": 0}
+        POST /fleet/claim                 领取任务 {"worker": ...}，返回 {"job": 任务或 null}
+        POST /fleet/jobs/<id>/heartbeat   续约 {"worker": ...}
+        POST /fleet/jobs/<id>/report      报告阶段进度 {"worker": ..., "progress": 3, "stage": ..., "title": ...}
+        POST /fleet/jobs/<id>/complete    结束任务 {"worker": ..., "status": "finished" | "error" | "cancelled", ...}
+        POST /fleet/jobs/<id>/cancel      取消任务
+    """
+    def route(self):
+        parts = [part for part in self.path.split('?')[0].split('/') if part]
+        if parts[:1] != ['fleet']:
+            return None, None
+        parts = parts[1:]
+        job_id = int(parts[1]) if len(parts) >= 2 and parts[0] == 'jobs' and parts[1].isdigit() else None
+        return parts, job_id
+
+    def authorized(self):
+        token = self.headers.get(FLEET_TOKEN_HEADER) or ''
+        if self.server.fleet_token and hmac.compare_digest(token.encode('utf-8'), self.server.fleet_token.encode('utf-8')):
+            return True
+        self.send_json(401, {'error': '缺少或错误的 fleet_token'})
+        return False
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        parts, _ = self.route()
+        if parts == ['jobs']:
+            self.send_json(200, {'jobs': self.server.fleet.list_jobs()})
+        else:
+            self.send_json(404, {'error': '未知的接口'})
 
-                with open(output_filepath, 'w', encoding='utf-8') as f:
-                    f.write(str(soup))
+    def do_POST(self):
+        if not self.authorized():
+            return
+        fleet = self.server.fleet
+        parts, job_id = self.route()
+        try:
+            payload = self.read_json()
+        except ValueError as e:
+            self.send_json(400, {'error': f"请求内容无效: {e}"})
+            return
+        worker = payload.get('worker', '')
+        action = parts[2:] if job_id is not None else None
+
+        if parts == ['jobs'] and payload.get('urls'):
+            job_ids = fleet.submit(payload['urls'], payload.get('collection_key', ''),
+                                   payload.get('collection_name', ''), int(payload.get('priority', 0)))
+            self.send_json(201, {'job_ids': job_ids})
+        elif parts == ['claim'] and worker:
+            self.send_json(200, {'job': fleet.claim(worker)})
+        elif action == ['heartbeat'] and worker:
+            self.send_json(200, {'ok': fleet.heartbeat(job_id, worker)})
+        elif action == ['report'] and worker:
+            fields = {key: value for key, value in payload.items() if key != 'worker'}
+            self.send_json(200, {'ok': fleet.report(job_id, worker, **fields)})
+        elif action == ['complete'] and worker and payload.get('status') in ('finished', 'error', 'cancelled'):
+            self.send_json(200, {'ok': fleet.complete(job_id, worker, payload['status'],
+                                                      payload.get('error', ''), payload.get('filepath', ''))})
+        elif action == ['cancel']:
+            self.send_json(200, {'ok': fleet.cancel(job_id)})
+        else:
+            self.send_json(404, {'error': '未知的接口'})
 
-                self.check_cancelled()
-                self.signals.progress.emit(self.row, 7)  # Stage 7
-                # Save to Zotero
-                zot = zotero.Zotero(
-                    self.args['library_id'],
-                    self.args['library_type'],
-                    self.args['api_key']
-                )
+    def do_DELETE(self):
+        if not self.authorized():
+            return
+        self.send_json(404, {'error': '未知的接口'})
 
-                try:
-                    item = zot.item_template('webpage')
-                    # 去除 [] 中的内容
-                    item['title'] = page_title
-                    item['url'] = page.url
-
-                    if self.args['collection_key']:
-                        item['collections'] = [self.args['collection_key']]
-                    item = zot.create_items([item])
-                    item_key = list(item['successful'].values())[0]['key']
-
-                    storage_path = os.path.join(self.args['zotero_storage'], item_key)
-                    if not os.path.exists(storage_path):
-                        os.makedirs(storage_path)
-
-                    attachment_path = os.path.join(storage_path, output_filename)
-                    shutil.copy(output_filepath, attachment_path)
-
-                    attachment = {
-                        'itemType': 'attachment',
-                        'parentItem': item_key,
-                        'linkMode': 'linked_file',
-                        'accessDate': datetime.now().strftime('%Y-%m-%d'),
-                        'title': 'Snapshot',
-                        'path': attachment_path,
-                        'contentType': 'text/html'
-                    }
-
-                    response = zot.create_items([attachment])
-
-                    if 'successful' in response and response['successful']:
-                        pass
-                    else:
-                        raise Exception("创建附件失败")
 
-                except Exception as e:
-                    raise Exception(f"保存失败，错误信息: {e}")
-           
-                self.check_cancelled()
-                browser_context.close()
+def open_fleet_queue(args, location=None):
+    location = location or args.get('fleet_queue') or os.path.join('config', 'fleet.db')
+    if location.startswith(('http://', 'https://')):
+        return RemoteFleetQueue(location, args.get('fleet_token', ''))
+    return FleetQueue(location, float(args.get('fleet_lease_seconds', 120)), int(args.get('fleet_max_attempts', 3)))
 
-            self.check_cancelled()
-            self.signals.finished.emit(self.row, output_filepath)
 
+def run_fleet_job(fleet, worker_name, job, args):
+    """
+    在当前进程中执行一个领取到的任务：进度通过 WorkerSignals 写回队列，后台线程定期续约，
+    续约失败（任务被取消或租约被接手）时取消本地任务。
+    """
+    signals = WorkerSignals()
+    cancel_event = CancelEvent()
+    done = threading.Event()
+    outcome = {'status': 'error', 'error': '任务异常结束', 'filepath': ''}
+
+    def report(**fields):
+        try:
+            if not fleet.report(job['id'], worker_name, **fields):
+                cancel_event.set()
         except Exception as e:
-            if str(e) == "Cancel Task":
-                pass
-            else:
-                self.signals.error.emit(self.row, str(e))
-        finally:
-            if 'browser_context' in locals():
-                browser_context.close()
-    
+            print(f"报告任务 {job['id']} 进度失败: {e}")
+
+    def on_progress(job_id, progress):
+        report(progress=progress, stage=JOB_STAGES[progress - 1] if 1 <= progress <= len(JOB_STAGES) else '')
+
+    signals.progress.connect(on_progress, Qt.DirectConnection)
+    signals.title.connect(lambda job_id, title: report(title=title), Qt.DirectConnection)
+    signals.degraded.connect(lambda job_id, resources: report(degraded=len(resources)), Qt.DirectConnection)
+    signals.finished.connect(lambda job_id, filepath: outcome.update(status='finished', error='', filepath=filepath), Qt.DirectConnection)
+    signals.error.connect(lambda job_id, message: outcome.update(status='error', error=message), Qt.DirectConnection)
+    signals.cancelled.connect(lambda job_id, elapsed: outcome.update(status='cancelled', error=''), Qt.DirectConnection)
+
+    def keep_lease():
+        interval = max(1.0, float(args.get('fleet_lease_seconds', 120)) / 3)
+        while not done.wait(interval):
+            try:
+                if not fleet.heartbeat(job['id'], worker_name):
+                    print(f"任务 {job['id']} 已被取消或租约已失效，停止处理")
+                    cancel_event.set()
+                    return
+            except Exception as e:
+                # 协调服务暂时不可用时继续处理，租约到期前恢复即可
+                print(f"任务 {job['id']} 续约失败: {e}")
+
+    heartbeat_thread = threading.Thread(target=keep_lease, daemon=True)
+    heartbeat_thread.start()
+    try:
+        worker_args = {**args, 'collection_key': job['collection_key'], 'collection_name': job['collection_name']}
+        SavePageWorker(job['id'], job['url'], worker_args, signals, cancel_event).run()
+    finally:
+        done.set()
+        heartbeat_thread.join()
+    try:
+        fleet.complete(job['id'], worker_name, outcome['status'], outcome['error'], outcome['filepath'])
+    except Exception as e:
+        print(f"提交任务 {job['id']} 结果失败: {e}")
+    return outcome
+
+
+def run_fleet_worker(location, worker_name, poll_interval=5):
+    """
+    持续从共享队列领取并处理任务，可在同一台或多台机器上启动多个 worker 进程。
+    """
+    config = load_config_file()
+    fleet = open_fleet_queue(config, location)
+    worker_name = worker_name or f"{socket.gethostname()}-{os.getpid()}"
+    print(f"Worker {worker_name} 已启动")
+    try:
+        while True:
+            try:
+                job = fleet.claim(worker_name)
+            except Exception as e:
+                print(f"领取任务失败: {e}")
+                job = None
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            print(f"Worker {worker_name} 领取任务 {job['id']}（第 {job['attempts']} 次）: {job['url']}")
+            outcome = run_fleet_job(fleet, worker_name, job, config)
+            print(f"任务 {job['id']} {outcome['status']} {outcome['error'] or outcome['filepath']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        BrowserSession.discard()
 
 
 class CollectionDialog(QDialog):
@@ -374,6 +5290,128 @@ class CollectionDialog(QDialog):
             return item.data(0, Qt.UserRole), item.text(0)
         return None, None
 
+# --- Bulk Import Dialog ---
+class BulkImportDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("批量导入")
+        self.resize(600, 400)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel("粘贴 Arxiv 链接 / 编号、BibTeX 或 Arxiv 列表页链接（如 https://arxiv.org/list/cs.CL/new）："))
+
+        self.text_edit = QTextEdit(self)
+        self.text_edit.setAcceptRichText(False)
+        layout.addWidget(self.text_edit)
+
+        button_layout = QHBoxLayout()
+        self.load_file_button = QPushButton("从文件导入")
+        self.load_file_button.clicked.connect(self.load_file)
+        self.load_file_button.setDefault(False)
+        button_layout.addWidget(self.load_file_button)
+        button_layout.addStretch()
+
+        buttonBox = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttonBox.accepted.connect(self.accept)
+        buttonBox.rejected.connect(self.reject)
+        button_layout.addWidget(buttonBox)
+        layout.addLayout(button_layout)
+
+    def load_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择文件", "", "文本 / BibTeX (*.txt *.bib *.html *.htm);;所有文件 (*)")
+        if file_path:
+            try:
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    self.text_edit.append(f.read())
+            except Exception as e:
+                QMessageBox.critical(self, "读取失败", f"无法读取文件: {e}")
+
+    def get_text(self):
+        return self.text_edit.toPlainText()
+
+
+class BulkImportLoader(QObject):
+    """
+    在后台线程中抓取 Arxiv 列表页并提取编号，完成后通过 finished 信号交回主线程，抓取期间窗口保持响应。
+    """
+    finished = pyqtSignal(list)  # [(arxiv_id, version)]
+
+    def __init__(self, text):
+        super().__init__()
+        self.text = text
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def run(self):
+        try:
+            arxiv_ids = extract_arxiv_ids(expand_arxiv_listings(self.text))
+        except Exception as e:
+            print(f"识别 Arxiv 编号失败: {e}")
+            arxiv_ids = []
+        self.finished.emit(arxiv_ids)
+
+class SearchDialog(QDialog):
+    """
+    在已保存快照的原文与译文中搜索，输入停顿后自动查询，双击结果打开快照。
+    """
+    def __init__(self, args, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("搜索快照")
+        self.resize(800, 500)
+        self.index = snapshot_index(args)
+
+        layout = QVBoxLayout(self)
+        self.query_edit = QLineEdit(self)
+        self.query_edit.setPlaceholderText("输入原文或译文中的词语，多个词以空格分隔")
+        layout.addWidget(self.query_edit)
+
+        self.result_tree = QTreeWidget(self)
+        self.result_tree.setHeaderLabels(["文献 / 段落", "译文"])
+        self.result_tree.setColumnWidth(0, 400)
+        self.result_tree.itemDoubleClicked.connect(self.open_snapshot)
+        layout.addWidget(self.result_tree)
+
+        self.status_label = QLabel(self)
+        layout.addWidget(self.status_label)
+
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(250)
+        self.search_timer.timeout.connect(self.run_search)
+        self.query_edit.textChanged.connect(self.search_timer.start)
+
+    def run_search(self):
+        self.result_tree.clear()
+        query = self.query_edit.text().strip()
+        if not query:
+            self.status_label.clear()
+            return
+        start = time.monotonic()
+        try:
+            results = self.index.search(query)
+        except sqlite3.Error as e:
+            self.status_label.setText(f"搜索失败: {e}")
+            return
+        elapsed_ms = (time.monotonic() - start) * 1000
+        for paper in results:
+            paper_item = QTreeWidgetItem(self.result_tree, [paper['title'], paper['arxiv_id'] or ''])
+            paper_item.setData(0, Qt.UserRole, paper['path'])
+            for paragraph in paper['paragraphs']:
+                paragraph_item = QTreeWidgetItem(paper_item, [paragraph['source'], paragraph['translation']])
+                paragraph_item.setData(0, Qt.UserRole, paper['path'])
+                paragraph_item.setToolTip(0, paragraph['source'])
+                paragraph_item.setToolTip(1, paragraph['translation'])
+            paper_item.setExpanded(True)
+        paragraph_count = sum(len(paper['paragraphs']) for paper in results)
+        self.status_label.setText(f"{paragraph_count} 段，{len(results)} 篇文献，耗时 {elapsed_ms:.1f}ms")
+
+    def open_snapshot(self, item, column):
+        path = item.data(0, Qt.UserRole)
+        if path:
+            QDesktopServices.openUrl(QUrl.fromLocalFile(path))
+
+
 # --- Configuration Dialog ---
 class ConfigDialog(QDialog):
     def __init__(self, current_config, parent=None):
@@ -487,6 +5525,7 @@ class ConfigDialog(QDialog):
 
     def save_config(self):
         new_config = {
+            **self.current_config,
             "library_id": self.library_id_input.text().strip(),
             "library_type": self.library_type_input.text().strip(),
             "api_key": self.api_key_input.text().strip(),
@@ -520,11 +5559,7 @@ class ConfigDialog(QDialog):
 
                 # 如果 library_id 或 API 不可以登录
         try:
-            zot = zotero.Zotero(
-                new_config['library_id'],
-                new_config['library_type'],
-                new_config['api_key']
-            )
+            zot = get_zotero_client(new_config)
             zot.collections()
         except Exception as e:
             QMessageBox.critical(self, "验证失败", f"无法验证您的 Zotero: 请检查您的 Zotero ID 和 API Key，并检查您的网络连接")
@@ -677,6 +5712,212 @@ class URLDelegate(QItemDelegate):
             painter.drawText(option.rect, Qt.AlignLeft | Qt.AlignVCenter, text)
         else:
             super().paint(painter, option, index)
+# --- Job Table Model ---
+def finished_format(degraded):
+    return f"完成 ({degraded} 个资源缺失)" if degraded else "完成"
+
+
+def queued_format(job, position=None):
+    details = []
+    if position:
+        details.append(f"第 {position} 位")
+    if job.get('priority'):
+        details.append(f"优先级 {job['priority']:+d}")
+    if job.get('lane'):
+        details.append(JOB_LANE_LABELS[job['lane']])
+    if job.get('paragraphs') is not None:
+        details.append(f"约 {job['paragraphs']} 段")
+    return f"等待开始 ({' · '.join(details)})" if details else "等待开始"
+
+
+class JobTableModel(QAbstractTableModel):
+    """
+    以稳定的任务 ID 为键保存任务，进度更新先记为脏数据，再由定时器合并为一次重绘。
+    """
+    JobRole = Qt.UserRole + 1
+    COLUMNS = ["URL".center(10), "文献库".center(10), "标题/信息".center(45), "进度".center(45)]
+    MIME_TYPE = 'application/x-arxiv-job-ids'
+    jobs_dropped = pyqtSignal(list, object)  # (拖动的 job_id 列表, 放在其前面的 job_id，None 表示队尾)
+
+    def __init__(self, parent=None, flush_interval=100):
+        super().__init__(parent)
+        self.jobs = {}          # job_id -> job
+        self.order = []         # 按显示顺序排列的 job_id
+        self.row_cache = None   # job_id -> row，结构变化后按需重建
+        self.dirty = set()
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(flush_interval)
+        self.flush_timer.timeout.connect(self.flush)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.order)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.COLUMNS[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        job = self.jobs[self.order[index.row()]]
+        column = index.column()
+        if role == Qt.DisplayRole:
+            return (job['url'], job['collection_name'], job['title'], job['format'])[column]
+        if role == Qt.UserRole and column == 1:
+            return job['collection_key']
+        if role == self.JobRole:
+            return job
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsSelectable | Qt.ItemIsEnabled | Qt.ItemIsDragEnabled | Qt.ItemIsDropEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes):
+        rows = sorted({index.row() for index in indexes})
+        data = QMimeData()
+        data.setData(self.MIME_TYPE, json.dumps([self.order[row] for row in rows]).encode('utf-8'))
+        return data
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.MoveAction or not data.hasFormat(self.MIME_TYPE):
+            return False
+        if parent.isValid():
+            row = parent.row()
+        job_ids = json.loads(bytes(data.data(self.MIME_TYPE)).decode('utf-8'))
+        before_job_id = self.order[row] if 0 <= row < len(self.order) else None
+        if before_job_id not in job_ids:
+            self.jobs_dropped.emit(job_ids, before_job_id)
+        # 实际移动由服务确认后的 moved 事件完成，这里不让视图删除源行
+        return False
+
+    def move_job(self, job_id, before_job_id):
+        row = self.row_of(job_id)
+        if row is None:
+            return
+        dest = self.row_of(before_job_id) if before_job_id is not None else len(self.order)
+        if dest is None or dest in (row, row + 1):
+            return
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), dest)
+        self.order.pop(row)
+        self.order.insert(dest - 1 if dest > row else dest, job_id)
+        self.row_cache = None
+        self.endMoveRows()
+
+    def row_of(self, job_id):
+        if self.row_cache is None:
+            self.row_cache = {job_id: row for row, job_id in enumerate(self.order)}
+        return self.row_cache.get(job_id)
+
+    def job_id_at(self, row):
+        return self.order[row]
+
+    def add_jobs(self, jobs):
+        """
+        以一次插入追加多个任务，已存在的任务 ID 会被跳过。
+        """
+        jobs = [job for job in jobs if job['id'] not in self.jobs]
+        if not jobs:
+            return
+        first_row = len(self.order)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(jobs) - 1)
+        for job in jobs:
+            self.jobs[job['id']] = job
+            self.order.append(job['id'])
+            if self.row_cache is not None:
+                self.row_cache[job['id']] = len(self.order) - 1
+        self.endInsertRows()
+
+    def remove_jobs(self, job_ids):
+        """
+        移除多个任务，每段连续的行只通知视图一次，从后往前删除以免行号变化。不存在的任务会被跳过。
+        """
+        rows = sorted({row for row in map(self.row_of, job_ids) if row is not None})
+        if not rows:
+            return
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row - 1:
+                ranges[-1][1] = row
+            else:
+                ranges.append([row, row])
+        for first, last in reversed(ranges):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for job_id in self.order[first:last + 1]:
+                del self.jobs[job_id]
+                self.dirty.discard(job_id)
+            del self.order[first:last + 1]
+            # 其余任务的 ID 不变，行号缓存下次用到时再重建
+            self.row_cache = None
+            self.endRemoveRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.jobs.clear()
+        self.order.clear()
+        self.dirty.clear()
+        self.row_cache = None
+        self.endResetModel()
+
+    def update_job(self, job_id, **fields):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return  # 任务已被删除
+        job.update(fields)
+        self.dirty.add(job_id)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        rows = [self.row_of(job_id) for job_id in self.dirty]
+        self.dirty.clear()
+        rows = [row for row in rows if row is not None]
+        if rows:
+            self.dataChanged.emit(self.index(min(rows), 0), self.index(max(rows), len(self.COLUMNS) - 1))
+
+class ProgressDelegate(QStyledItemDelegate):
+    STATUS_COLORS = {
+        'finished': QColor('#4CAF50'),
+        'error': QColor('red'),
+    }
+    DEFAULT_COLOR = QColor('#2196F3')
+
+    def paint(self, painter, option, index):
+        job = index.data(JobTableModel.JobRole)
+        progress_option = QStyleOptionProgressBar()
+        progress_option.rect = option.rect.adjusted(2, 2, -2, -2)
+        progress_option.minimum = 0
+        progress_option.maximum = len(JOB_STAGES)
+        progress_option.progress = job['progress']
+        progress_option.text = job['format']
+        progress_option.textVisible = True
+        progress_option.textAlignment = Qt.AlignCenter
+        progress_option.state = option.state | QStyle.State_Horizontal
+        progress_option.palette = QPalette(option.palette)
+        progress_option.palette.setColor(QPalette.Highlight, self.STATUS_COLORS.get(job['status'], self.DEFAULT_COLOR))
+        QApplication.style().drawControl(QStyle.CE_ProgressBar, progress_option, painter)
+
+class ServiceEventBridge(QObject):
+    """
+    将保存服务在工作线程中产生的事件转发到 Qt 主线程。
+    """
+    event = pyqtSignal(object)
+
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
@@ -691,7 +5932,7 @@ class MainWindow(QWidget):
                 border: 1px solid #ccc;
                 border-radius: 4px;
             }
-            QTableWidget {
+            QTableView {
                 border: 1px solid #ccc;
                 border-radius: 4px;
             }
@@ -741,25 +5982,41 @@ class MainWindow(QWidget):
         self.lower_container.setLayout(self.lower_layout)
 
         # 创建 URL Table
-        self.table_widget = QTableWidget(0, 4)
-        self.table_widget.setHorizontalHeaderLabels(
-            [   
-                "URL".center(10),        
-                "文献库".center(10),
-                "标题/信息".center(45), 
-                "进度".center(45)        
-            ])
-
-        self.table_widget.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
-        self.table_widget.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
-        self.table_widget.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
-        self.table_widget.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeToContents)
-
-        self.table_widget.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.lower_layout.addWidget(self.table_widget)
-
-        url_delegate = URLDelegate(self.table_widget)
-        self.table_widget.setItemDelegateForColumn(0, url_delegate)
+        self.job_model = JobTableModel(self)
+        self.table_view = QTableView()
+        self.table_view.setModel(self.job_model)
+        self.table_view.verticalHeader().setDefaultSectionSize(28)
+
+        self.table_view.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table_view.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeToContents)
+        self.table_view.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        # 进度列使用固定宽度，避免每次进度更新都重新计算整列宽度
+        self.table_view.horizontalHeader().setSectionResizeMode(3, QHeaderView.Fixed)
+        self.table_view.horizontalHeader().resizeSection(3, 220)
+
+        self.table_view.setSelectionBehavior(QAbstractItemView.SelectRows)
+        # 拖动排队中的任务调整运行顺序
+        self.table_view.setDragEnabled(True)
+        self.table_view.setAcceptDrops(True)
+        self.table_view.setDragDropMode(QAbstractItemView.InternalMove)
+        self.table_view.setDropIndicatorShown(True)
+        self.job_model.jobs_dropped.connect(self.move_jobs)
+        self.lower_layout.addWidget(self.table_view)
+
+        url_delegate = URLDelegate(self.table_view)
+        self.table_view.setItemDelegateForColumn(0, url_delegate)
+        progress_delegate = ProgressDelegate(self.table_view)
+        self.table_view.setItemDelegateForColumn(3, progress_delegate)
+
+        for key in (QKeySequence.Delete, QKeySequence(Qt.Key_Backspace)):
+            delete_shortcut = QShortcut(key, self.table_view)
+            delete_shortcut.setContext(Qt.WidgetShortcut)
+            delete_shortcut.activated.connect(self.delete_selected_row)
+
+        for key, delta in ((QKeySequence("Ctrl+Up"), 1), (QKeySequence("Ctrl+Down"), -1)):
+            priority_shortcut = QShortcut(key, self.table_view)
+            priority_shortcut.setContext(Qt.WidgetShortcut)
+            priority_shortcut.activated.connect(lambda delta=delta: self.change_priority(delta))
 
         # Control Buttons
         self.control_layout = QHBoxLayout()
@@ -770,24 +6027,58 @@ class MainWindow(QWidget):
         self.clear_button = QPushButton("清除所有 (Ctrl/Command+Backspace)")
         self.clear_button.setShortcut("Ctrl+Backspace")
         self.clear_button.clicked.connect(self.clear_all)
+        self.import_button = QPushButton("批量导入 (Ctrl/Command+I)")
+        self.import_button.setShortcut("Ctrl+I")
+        self.import_button.clicked.connect(self.show_bulk_import_dialog)
+        self.search_button = QPushButton("搜索快照 (Ctrl/Command+F)")
+        self.search_button.setShortcut("Ctrl+F")
+        self.search_button.clicked.connect(self.show_search_dialog)
         self.config_button = QPushButton("设置配置 (Ctrl/Command+,)")
         self.config_button.setShortcut("Ctrl+,")
         self.config_button.clicked.connect(self.set_config)
         self.control_layout.addWidget(self.start_button)
         self.control_layout.addWidget(self.clear_button)
+        self.control_layout.addWidget(self.import_button)
+        self.control_layout.addWidget(self.search_button)
         self.control_layout.addWidget(self.config_button)
         self.lower_layout.addLayout(self.control_layout)
 
+        # 各主机的请求速率与排队数，没有请求时隐藏
+        self.host_status_label = QLabel()
+        self.host_status_label.setStyleSheet("color: #666;")
+        self.host_status_label.hide()
+        self.lower_layout.addWidget(self.host_status_label)
+
+        # 隔离执行模式下工作进程卡住与重启的次数，没有发生过时隐藏
+        self.worker_status_label = QLabel()
+        self.worker_status_label.setStyleSheet("color: #666;")
+        self.worker_status_label.hide()
+        self.lower_layout.addWidget(self.worker_status_label)
+
+        # 批量导入的进度与结果
+        self.import_status_label = QLabel()
+        self.import_status_label.setStyleSheet("color: #666;")
+        self.import_status_label.hide()
+        self.lower_layout.addWidget(self.import_status_label)
+        self.bulk_import_loader = None
+
         self.layout.addWidget(self.lower_container)
 
         # Initialize configuration
         self.args = self.load_config()
         
 
-        # Thread Pool Executor
-        self.executor = ThreadPoolExecutor(max_workers=1)
-        self.tasks = []
-        self.row_event = {}  # 用于跟踪每行的任务
+        # 保存服务：已有服务在运行时作为其客户端，否则在进程内启动
+        self.service, self.service_server = connect_job_service(self.args)
+        self.service_bridge = ServiceEventBridge()
+        self.service_bridge.event.connect(self.on_service_event)
+        self.service.subscribe(self.service_bridge.event.emit)
+
+        # 只有本进程中的服务负责监视，作为客户端时由服务进程监视
+        self.watcher = None
+        if isinstance(self.service, JobService):
+            self.watcher = LibraryWatcher(self.service, self.args)
+            self.watcher.start()
 
         # Load Zotero collections
         self.load_zotero_collections()
@@ -935,9 +6226,10 @@ class MainWindow(QWidget):
             self.restore_window()
 
     def open_saved_html(self):
-        row = self.table_widget.currentRow()
+        row = self.table_view.currentIndex().row()
         if row >= 0:
-            output_filename = self.table_widget.item(row, 2).text() + ".html"
+            job = self.job_model.jobs[self.job_model.job_id_at(row)]
+            output_filename = job['title'] + ".html"
             output_filepath = os.path.join(self.args['output_dir'], output_filename)
             if os.path.exists(output_filepath):
                 os.system(f"open \"{output_filepath}\"")
@@ -945,11 +6237,7 @@ class MainWindow(QWidget):
     def load_zotero_collections(self):
         try:
             if not hasattr(self, 'zot'):
-                self.zot = zotero.Zotero(
-                    self.args['library_id'],
-                    self.args['library_type'],
-                    self.args['api_key']
-                )
+                self.zot = get_zotero_client(self.args)
             collections = self.zot.collections()
             self.collections = self.build_collection_tree(collections)
         except Exception as e:
@@ -999,75 +6287,78 @@ class MainWindow(QWidget):
     def add_url(self):
         url = self.url_input.text().strip()
         if url:
-            if not self.current_collection_key:
-                QMessageBox.warning(self, "未选择文献库", "请先选择一个文献库。")
-                return
-
-            row_position = self.table_widget.rowCount()
-            self.table_widget.insertRow(row_position)
-
-            # URL Item
-            url_item = QTableWidgetItem(url)
-            url_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            url_item.setTextAlignment(Qt.AlignCenter | Qt.AlignVCenter)
-            self.table_widget.setItem(row_position, 0, url_item)
-
-            # Collection Item
-            collection_item = QTableWidgetItem(self.current_collection_name)
-            collection_item.setData(Qt.UserRole, self.current_collection_key)
-            collection_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            collection_item.setTextAlignment(Qt.AlignCenter)
-            self.table_widget.setItem(row_position, 1, collection_item)
-
-            # Title Item (initially empty)
-            title_item = QTableWidgetItem("等待中")
-            title_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
-            title_item.setTextAlignment(Qt.AlignCenter)
-            self.table_widget.setItem(row_position, 2, title_item)
-
-            # Progress Bar
-            progress_bar = QProgressBar()
-            progress_bar.setMaximum(7)
-            progress_bar.setTextVisible(True)
-            progress_bar.setFormat("等待开始")
-            progress_bar.setAlignment(Qt.AlignCenter)
-            progress_bar.setStyleSheet("QProgressBar::chunk { background-color: #2196F3; }")
-            self.table_widget.setCellWidget(row_position, 3, progress_bar)
-            self.url_input.clear()
-
-            self.start_saving()
+            # 一次粘贴多个编号时按批量导入处理
+            arxiv_ids = extract_arxiv_ids(url)
+            if len(arxiv_ids) > 1:
+                urls = [arxiv_abs_url(arxiv_id, version) for arxiv_id, version in arxiv_ids]
+            else:
+                urls = [url]
+            if self.add_urls(urls):
+                self.url_input.clear()
 
-    def start_saving(self):
-        if self.table_widget.rowCount() == 0:
-            QMessageBox.warning(self, "没有 URL", "请添加至少一个 URL 以保存。")
+    def show_bulk_import_dialog(self):
+        if not self.current_collection_key:
+            QMessageBox.warning(self, "未选择文献库", "请先选择一个文献库。")
             return
 
-        for row in range(self.table_widget.rowCount()):
-            if row in self.row_event:
-                continue  # 跳过已经在执行的任务
-
-            url = self.table_widget.item(row, 0).text()
-            collection_key = self.table_widget.item(row, 1).data(Qt.UserRole)
-
-            progress_bar = self.table_widget.cellWidget(row, 3)
-
-            # Reset progress bar
-            progress_bar.setValue(0)
-            progress_bar.setFormat("等待开始")
+        dialog = BulkImportDialog(self)
+        if dialog.exec_():
+            # 列表页的抓取可能需要数十秒，在后台线程中进行，完成前不再接受新的批量导入
+            self.import_button.setEnabled(False)
+            self.import_status_label.setText("正在识别 Arxiv 编号并抓取列表页…")
+            self.import_status_label.show()
+            self.bulk_import_loader = BulkImportLoader(dialog.get_text())
+            self.bulk_import_loader.finished.connect(self.on_bulk_import_loaded)
+            self.bulk_import_loader.start()
+
+    def on_bulk_import_loaded(self, arxiv_ids):
+        self.bulk_import_loader = None
+        self.import_button.setEnabled(True)
+        if not arxiv_ids:
+            self.import_status_label.hide()
+            QMessageBox.warning(self, "没有 Arxiv 编号", "未能从输入中识别出任何 Arxiv 编号。")
+            return
+        added = self.add_urls([arxiv_abs_url(arxiv_id, version) for arxiv_id, version in arxiv_ids])
+        self.import_status_label.setText(f"识别到 {len(arxiv_ids)} 个 Arxiv 编号，新增 {added} 个任务")
 
-            # Create signals
-            signals = WorkerSignals()
-            signals.progress.connect(self.update_progress)
-            signals.title.connect(self.update_title)
-            signals.finished.connect(self.mark_finished)
-            signals.error.connect(self.handle_error)
+    def add_urls(self, urls):
+        """
+        一次性将多个 URL 加入表格，跳过表格中已存在的文献，返回新增的行数。
+        """
+        if not self.current_collection_key:
+            QMessageBox.warning(self, "未选择文献库", "请先选择一个文献库。")
+            return 0
+
+        existing = set()
+        for job in self.job_model.jobs.values():
+            existing.add(parse_arxiv_id(job['url'])[0] or job['url'])
+
+        new_urls = []
+        for url in urls:
+            key = parse_arxiv_id(url)[0] or url
+            if key not in existing:
+                existing.add(key)
+                new_urls.append(url)
+        if not new_urls:
+            return 0
+
+        # 整批只提交一次，表格在收到 submitted 事件时一次性插入
+        try:
+            self.service.submit_many(new_urls, self.current_collection_key, self.current_collection_name)
+        except Exception as e:
+            QMessageBox.critical(self, "提交失败", str(e))
+            return 0
+        return len(new_urls)
 
-            cancel_event = threading.Event()
+    def start_saving(self):
+        if self.job_model.rowCount() == 0:
+            QMessageBox.warning(self, "没有 URL", "请添加至少一个 URL 以保存。")
+            return
 
-            # Create and submit worker
-            worker = SavePageWorker(row, url, {**self.args, 'collection_key': collection_key}, signals, cancel_event)
-            self.executor.submit(worker.run)
-            self.row_event[row] = cancel_event
+        # 新加入的任务会立即开始，这里重新开始出错或已取消的任务
+        for job in list(self.job_model.jobs.values()):
+            if job['status'] in ('error', 'cancelled'):
+                self.service.retry(job['id'])
 
     def build_collection_tree(self, collections):
         tree = []
@@ -1114,115 +6405,450 @@ class MainWindow(QWidget):
         return tree
         
     def load_config(self):
-        if not os.path.exists(CONFIG_FILE):
-            # 创建默认配置
-            default_config = {
-                "zotero_storage": "在 Zotero 设置 -> 高级 -> 数据存储位置 获得地址，在后方加上 /storage",
-                "library_id": "访问这里以获得ID https://www.zotero.org/settings/security#applications",
-                "api_key": "访问这里以创建API https://www.zotero.org/settings/security#applications",
-                "library_type": "user",
-                "user_data_dir": resource_path('config/user_data'),
-                "extension_path": resource_path('config/extension'),
-                "output_dir": "download",
-                "last_used_collection_key": "",
-                "last_used_collection_name": ""
-            }
-
-            # 保存默认配置
-            with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(default_config, f, indent=4)
-            return default_config
-        else:
-            try:
-                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                return config
-
-            except Exception as e:
-                QMessageBox.critical(self, "配置错误", f"无法读取配置文件: {e}")
-                sys.exit(1)
+        try:
+            return load_config_file()
+        except Exception as e:
+            QMessageBox.critical(self, "配置错误", f"无法读取配置文件: {e}")
+            sys.exit(1)
 
     def clear_all(self):
-        for row in self.row_event.values():
-            row.set()
-            del row
-        self.row_event.clear()
-        self.table_widget.setRowCount(0)
+        self.service.remove_many(list(self.job_model.jobs))
+        self.job_model.clear()
+
+    def show_search_dialog(self):
+        # 非模态窗口，搜索时可以继续操作主窗口
+        if getattr(self, 'search_dialog', None) is None:
+            self.search_dialog = SearchDialog(self.args, self)
+        self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
+
+    def selected_job_ids(self):
+        rows = sorted({index.row() for index in self.table_view.selectionModel().selectedRows()})
+        return [self.job_model.job_id_at(row) for row in rows]
+
+    def change_priority(self, delta):
+        for job_id in self.selected_job_ids():
+            job = self.job_model.jobs[job_id]
+            self.service.set_priority(job_id, job.get('priority', 0) + delta)
+
+    def move_jobs(self, job_ids, before_job_id):
+        # 保持多选任务原有的相对顺序，依次放到目标任务之前
+        for job_id in job_ids:
+            self.service.move(job_id, before_job_id)
 
     def delete_selected_row(self):
-        current_row = self.table_widget.currentRow()
-        if current_row != -1:
-            if current_row in self.row_event:
-                cancel_event = self.row_event[current_row]
-                cancel_event.set()
-                del self.row_event[current_row]
-            self.table_widget.removeRow(current_row)
-            self.update_row_numbers()
-            self.update_row_task_indices()
-
-    def update_row_task_indices(self):
-        new_row_event = {}
-        for old_row, cancel_event in self.row_event.items():
-            new_row = self.find_new_row_index(old_row)
-            if new_row is not None:
-                new_row_event[new_row] = cancel_event
-        self.row_event = new_row_event
-
-    def find_new_row_index(self, old_row):
-        for row in range(self.table_widget.rowCount()):
-            if self.table_widget.item(row, 0).text() == str(old_row + 1):
-                return row
-        return None
-
-    def update_row_numbers(self):
-        for row in range(self.table_widget.rowCount()):
-            row_number_item = QTableWidgetItem(str(row + 1))
-            row_number_item.setFlags(Qt.ItemIsSelectable | Qt.ItemIsEnabled)
+        job_ids = self.selected_job_ids()
+        self.service.remove_many(job_ids)
+        self.job_model.remove_jobs(job_ids)
 
     def set_config(self):
         dialog = ConfigDialog(self.args, self)
         if dialog.exec_() == QDialog.Accepted:
             self.args = self.load_config()
+            self.service.update_args(self.args)
+            if getattr(self, 'search_dialog', None):
+                self.search_dialog.index = snapshot_index(self.args)
+            if self.watcher:
+                self.watcher.args = self.args
+                self.watcher.start()
             self.load_zotero_collections()
 
-    def update_progress(self, row, progress_value):
-        progress_bar = self.table_widget.cellWidget(row, 3)
-        progress_bar.setValue(progress_value)
-        if 1 <= progress_value <= 7:
-            stage = [
-                "(1/7) 转换 Arxiv url",
-                "(2/7) 启动浏览器并加载扩展",
-                "(3/7) 访问目标网页",
-                "(4/7) 等待页面内容翻译完成",
-                "(5/7) 页面内容已加载并解析",
-                "(6/7) 下载并编码资源",
-                "(7/7) 保存到 Zotero"
-            ][progress_value - 1]
-            progress_bar.setFormat(stage)
-
-    def update_title(self, row, title):
-        title_item = self.table_widget.item(row, 2)
-        title_item.setText(title)
-
-    def mark_finished(self, row, filepath):
-        progress_bar = self.table_widget.cellWidget(row, 3)
-        progress_bar.setValue(7)
-        progress_bar.setFormat("完成")
-        progress_bar.setStyleSheet("QProgressBar::chunk { background-color: #4CAF50; }")
-
-    def handle_error(self, row, error_message):
-        progress_bar = self.table_widget.cellWidget(row, 3)
-        progress_bar.setFormat("错误")
-        progress_bar.setStyleSheet("QProgressBar::chunk { background-color: red; }")
+    def on_service_event(self, event):
+        event_type = event['type']
+        if event_type == 'submitted':
+            self.job_model.add_jobs([self.model_job_from_service(job) for job in event['jobs']])
+        elif event_type == 'removed':
+            self.job_model.remove_jobs(event['job_ids'])
+        elif event_type == 'retried':
+            self.job_model.update_job(event['job_id'], status='queued', progress=0, format="等待开始", title="等待中", degraded=0)
+        elif event_type == 'requeued':
+            print(f"任务 {event['job_id']} {event['reason']}，已重新排队（第 {event['restarts']} 次）")
+            self.job_model.update_job(event['job_id'], status='queued', progress=0, format=f"{event['reason']}，等待重新开始", degraded=0)
+        elif event_type == 'progress':
+            self.update_progress(event['job_id'], event['progress'])
+        elif event_type == 'title':
+            self.update_title(event['job_id'], event['title'])
+        elif event_type == 'finished':
+            self.mark_finished(event['job_id'], event['filepath'])
+        elif event_type == 'error':
+            self.handle_error(event['job_id'], event['message'])
+        elif event_type == 'cancelled':
+            self.report_cancelled(event['job_id'], event['elapsed'])
+        elif event_type == 'degraded':
+            self.job_model.update_job(event['job_id'], degraded=len(event['resources']))
+        elif event_type == 'estimated':
+            self.job_model.update_job(event['job_id'], lane=event['lane'], paragraphs=event['paragraphs'])
+        elif event_type == 'priority':
+            self.job_model.update_job(event['job_id'], priority=event['priority'])
+        elif event_type == 'moved':
+            self.job_model.update_job(event['job_id'], priority=event['priority'])
+            self.job_model.move_job(event['job_id'], event['before'])
+        elif event_type == 'hosts':
+            text = format_host_stats(event['hosts'])
+            self.host_status_label.setText(text)
+            self.host_status_label.setVisible(bool(text))
+        elif event_type == 'workers':
+            text = format_worker_stats(event['workers'])
+            self.worker_status_label.setText(text)
+            self.worker_status_label.setVisible(bool(text))
+        elif event_type == 'queue':
+            for position, job_id in enumerate(event['order'], 1):
+                job = self.job_model.jobs.get(job_id)
+                if job and job['status'] == 'queued':
+                    self.job_model.update_job(job_id, format=queued_format(job, position))
+
+    def model_job_from_service(self, job):
+        status = job['status']
+        if status == 'error':
+            title, progress_format = f"错误: {job['error']}", "错误"
+        else:
+            title = job['title'] or "等待中"
+            progress_format = {'finished': finished_format(len(job.get('degraded', []))), 'cancelled': "已取消", 'queued': queued_format(job)}.get(status, job['stage'])
+        return {
+            'id': job['id'],
+            'url': job['url'],
+            'collection_name': job['collection_name'],
+            'collection_key': job['collection_key'],
+            'title': title,
+            'progress': job['progress'],
+            'format': progress_format,
+            'status': status,
+            'degraded': len(job.get('degraded', [])),
+            'priority': job.get('priority', 0),
+            'lane': job.get('lane', ''),
+            'paragraphs': job.get('paragraphs')
+        }
+
+    def update_progress(self, job_id, progress_value):
+        if 1 <= progress_value <= len(JOB_STAGES):
+            self.job_model.update_job(job_id, progress=progress_value, status='running', format=JOB_STAGES[progress_value - 1])
+
+    def update_title(self, job_id, title):
+        self.job_model.update_job(job_id, title=title)
+
+    def mark_finished(self, job_id, filepath):
+        job = self.job_model.jobs.get(job_id) or {}
+        self.job_model.update_job(job_id, progress=len(JOB_STAGES), status='finished', format=finished_format(job.get('degraded', 0)))
+
+    def handle_error(self, job_id, error_message):
         # 显示错误信息在标题列
-        title_item = self.table_widget.item(row, 2)
-        title_item.setText(f"错误: {error_message}")
-        print(f"Row {row} Error: {error_message}")
+        self.job_model.update_job(job_id, status='error', format="错误", title=f"错误: {error_message}")
+        print(f"Job {job_id} Error: {error_message}")
+
+    def report_cancelled(self, job_id, elapsed):
+        # 删除的任务已不在表格中，只有仍保留的任务会显示取消耗时
+        self.job_model.update_job(job_id, status='cancelled', format=f"已取消 ({elapsed:.2f}s)")
 
 
 # --- Main Entry Point ---
+def rerender_archive_entry(path, config):
+    """
+    在独立进程中从一个存档重新生成快照，返回 (path, 输出文件或错误信息, 是否成功)。
+    """
+    try:
+        entry = dom_archive(config).load(path)
+        worker = SavePageWorker(0, entry['url'], {**config, 'collection_key': config.get('last_used_collection_key', '')},
+                                WorkerSignals(), CancelEvent())
+        return path, worker.rerender(entry), True
+    except Exception as e:
+        return path, str(e), False
+
+
+def rerender(arxiv_text, workers):
+    """
+    从原始 DOM 存档并行重新生成快照并更新 Zotero 附件，不启动浏览器。
+    """
+    config = load_config_file()
+    paths = dom_archive(config).find(extract_arxiv_ids(' '.join(arxiv_text)) if arxiv_text else None)
+    if not paths:
+        print("没有找到可重新生成的存档")
+        return
+
+    start = time.monotonic()
+    failed = 0
+    # 解析与序列化 HTML 是 CPU 密集型操作，使用多进程并行
+    with ProcessPoolExecutor(max_workers=workers or None) as executor:
+        for path, result, ok in executor.map(rerender_archive_entry, paths, [config] * len(paths)):
+            if ok:
+                print(f"已重新生成: {result}")
+            else:
+                failed += 1
+                print(f"重新生成失败 {path}: {result}")
+    print(f"共 {len(paths)} 个存档，失败 {failed} 个，耗时 {time.monotonic() - start:.1f}s")
+
+
+def run_benchmark(urls, engine, jobs, collection_key):
+    """
+    用指定引擎完整保存一批文献，返回耗时、线程数与内存峰值等统计。
+    """
+    config = load_config_file()
+    # 跳过翻译存档，保证每篇文献都走完整流程
+    config.update(save_engine=engine, max_parallel_jobs=jobs, reuse_dom_archive=False)
+    service = JobService(config)
+    done = threading.Event()
+    started, durations, outcomes = {}, [], {}
+
+    def on_event(event):
+        if event['type'] == 'progress' and event['job_id'] not in started:
+            started[event['job_id']] = time.monotonic()
+        elif event['type'] in ('finished', 'error', 'cancelled'):
+            outcomes[event['job_id']] = event['type']
+            if event['job_id'] in started:
+                durations.append(time.monotonic() - started[event['job_id']])
+            if len(outcomes) == len(urls):
+                done.set()
+
+    peak_threads = threading.active_count()
+    service.subscribe(on_event)
+    start = time.monotonic()
+    service.submit_many(urls, collection_key)
+    while not done.wait(0.2):
+        peak_threads = max(peak_threads, threading.active_count())
+    wall_seconds = time.monotonic() - start
+
+    peak_rss_mb = None
+    if resource is not None:
+        # Linux 上 ru_maxrss 以 KB 为单位，macOS 上以字节为单位
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak_rss_mb = peak_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    if service.engine:
+        service.engine.shutdown()
+    return {
+        'engine': engine,
+        'jobs': jobs,
+        'papers': len(urls),
+        'finished': list(outcomes.values()).count('finished'),
+        'wall_seconds': round(wall_seconds, 2),
+        'mean_job_seconds': round(sum(durations) / len(durations), 2) if durations else None,
+        'peak_threads': peak_threads,
+        'peak_rss_mb': round(peak_rss_mb, 1) if peak_rss_mb is not None else None
+    }
+
+
+def benchmark(arxiv_text, engine, jobs, collection_key, as_json):
+    """
+    对比线程引擎与异步引擎。engine 为 both 时，两种引擎各在一个子进程中运行，互不影响内存统计。
+    """
+    urls = [arxiv_abs_url(arxiv_id, version) for arxiv_id, version in extract_arxiv_ids(' '.join(arxiv_text))]
+    if not urls:
+        print("没有找到 Arxiv 编号")
+        return
+    collection_key = collection_key or load_config_file().get('last_used_collection_key', '')
+
+    if engine != 'both':
+        result = run_benchmark(urls, engine, jobs, collection_key)
+        print(json.dumps(result, ensure_ascii=False) if as_json else result)
+        return
+
+    results = []
+    for child_engine in ('threaded', 'async'):
+        print(f"正在使用 {child_engine} 引擎保存 {len(urls)} 篇文献...")
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), 'benchmark', *urls,
+             '--engine', child_engine, '--jobs', str(jobs), '--collection', collection_key, '--json'],
+            capture_output=True, text=True
+        )
+        lines = completed.stdout.strip().splitlines()
+        try:
+            results.append(json.loads(lines[-1]))
+        except (IndexError, json.JSONDecodeError):
+            print(f"{child_engine} 引擎运行失败:\n{completed.stderr[-2000:]}")
+            return
+
+    columns = ['engine', 'papers', 'finished', 'wall_seconds', 'mean_job_seconds', 'peak_threads', 'peak_rss_mb']
+    print(' | '.join(f"{column:>16}" for column in columns))
+    for result in results:
+        print(' | '.join(f"{str(result[column]):>16}" for column in columns))
+
+
+def extract_snapshot_file(path):
+    """
+    在独立进程中解析一个快照文件，返回 (path, 标题, 段落列表)；不是双语快照时返回 None。
+    """
+    try:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            html = f.read()
+    except OSError:
+        return None
+    if 'immersive-translate-target-wrapper' not in html:
+        return None
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.get_text(strip=True) if soup.title else os.path.splitext(os.path.basename(path))[0]
+    return path, title, extract_bilingual_paragraphs(soup)
+
+
+def build_search_index(rebuild, workers):
+    """
+    扫描 Zotero 存储目录中的双语快照，只索引新增或修改过的文件，并删除已不存在的文件。
+    """
+    config = load_config_file()
+    index = snapshot_index(config)
+    if rebuild:
+        index.clear()
+    removed = index.remove_missing()
+    indexed = index.indexed_files()
+
+    variant_suffixes = tuple(f" ({label}).html" for label in SNAPSHOT_VARIANT_LABELS.values())
+    paths = []
+    for root, _, names in os.walk(config['zotero_storage']):
+        for name in names:
+            if not name.endswith('.html') or name.endswith(variant_suffixes):
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            if indexed.get(path) != (stat.st_mtime, stat.st_size):
+                paths.append(path)
+
+    start = time.monotonic()
+    added = 0
+    with ProcessPoolExecutor(max_workers=workers or None) as executor:
+        for result in tqdm(executor.map(extract_snapshot_file, paths, chunksize=8), total=len(paths), desc="Indexing snapshots"):
+            if result:
+                path, title, paragraphs = result
+                # 快照放在 <zotero_storage>/<条目 key>/ 下
+                index.add(path, paragraphs, title, item_key=os.path.basename(os.path.dirname(path)))
+                added += 1
+    print(f"索引了 {added} 个快照，删除 {removed} 个已不存在的快照，耗时 {time.monotonic() - start:.1f}s")
+
+
+def search_snapshots(query, limit):
+    start = time.monotonic()
+    results = snapshot_index(load_config_file()).search(' '.join(query), limit=limit)
+    elapsed_ms = (time.monotonic() - start) * 1000
+    for paper in results:
+        print(f"\n{paper['title']} ({paper['arxiv_id'] or paper['item_key'] or ''})\n  {paper['path']}")
+        for paragraph in paper['paragraphs']:
+            print(f"  #{paragraph['position']} {paragraph['source'][:200]}")
+            if paragraph['translation']:
+                print(f"      {paragraph['translation'][:200]}")
+    print(f"\n{sum(len(paper['paragraphs']) for paper in results)} 段，{len(results)} 篇文献，耗时 {elapsed_ms:.1f}ms")
+
+
+def fleet_command(cli_args):
+    config = load_config_file()
+    if cli_args.fleet_command == 'worker':
+        run_fleet_worker(cli_args.queue, cli_args.name, cli_args.poll)
+        return
+    if cli_args.fleet_command == 'serve':
+        location = cli_args.queue or config.get('fleet_queue') or os.path.join('config', 'fleet.db')
+        port = cli_args.port or int(config.get('fleet_port', 23121))
+        server = ThreadingHTTPServer((cli_args.host, port), FleetRequestHandler)
+        server.daemon_threads = True
+        server.fleet = open_fleet_queue(config, location)
+        # 首次启动时生成共享令牌并写入配置，其他机器上的 worker 需配置相同的 fleet_token
+        server.fleet_token = ensure_token(config, 'fleet_token')
+        print(f"任务协调服务已启动: http://{cli_args.host}:{port}/fleet ，队列文件 {location}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        return
+
+    fleet = open_fleet_queue(config, cli_args.queue)
+    if cli_args.fleet_command == 'submit':
+        urls = [arxiv_abs_url(arxiv_id, version) for arxiv_id, version in extract_arxiv_ids(' '.join(cli_args.ids))]
+        collection_key = cli_args.collection or config.get('last_used_collection_key', '')
+        collection_name = config.get('last_used_collection_name', '') if collection_key == config.get('last_used_collection_key') else ''
+        job_ids = fleet.submit(urls, collection_key, collection_name, cli_args.priority)
+        print(f"已提交 {len(job_ids)} 个任务: {job_ids}")
+    elif cli_args.fleet_command == 'cancel':
+        for job_id in cli_args.job_ids:
+            print(f"任务 {job_id}: {'已取消' if fleet.cancel(job_id) else '无法取消'}")
+    else:
+        for job in fleet.list_jobs():
+            detail = job['error'] or job['filepath'] or job['stage']
+            owner = f" @{job['lease_owner']}" if job['lease_owner'] else ''
+            print(f"{job['id']:>5} {job['status']:<9}{owner} 尝试 {job['attempts']} 次  {job['url']}  {detail}")
+
+
+def serve(port):
+    """
+    以无界面的服务模式运行，通过本地 HTTP API 接收任务。
+    """
+    config = load_config_file()
+    port = port or int(config.get('service_port', 0) or 0) or 23120
+    service = JobService(config)
+    watcher = LibraryWatcher(service, config)
+    watcher.start()
+    server = ThreadingHTTPServer(('127.0.0.1', port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.service_token = ensure_token(config, 'service_token')
+    print(f"保存服务已启动: http://127.0.0.1:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+        server.server_close()
+
+
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="批量把 Arxiv 文献翻译为双语版本并保存到 Zotero")
+    subparsers = parser.add_subparsers(dest='command')
+    serve_parser = subparsers.add_parser('serve', help="以无界面的服务模式运行，提供本地 HTTP API")
+    serve_parser.add_argument('--port', type=int, default=0, help="监听端口，默认使用配置中的 service_port")
+    rerender_parser = subparsers.add_parser('rerender', help="从原始 DOM 存档重新生成快照并更新 Zotero 附件，无需重新翻译")
+    rerender_parser.add_argument('ids', nargs='*', help="要重新生成的 Arxiv 编号，省略时处理全部存档")
+    rerender_parser.add_argument('--workers', type=int, default=0, help="并行进程数，默认等于 CPU 核数")
+    benchmark_parser = subparsers.add_parser('benchmark', help="用线程引擎与异步引擎保存同一批文献并对比耗时与资源占用")
+    benchmark_parser.add_argument('ids', nargs='+', help="用于测试的 Arxiv 编号或链接")
+    benchmark_parser.add_argument('--engine', choices=['threaded', 'async', 'both'], default='both')
+    benchmark_parser.add_argument('--jobs', type=int, default=4, help="并行任务数")
+    benchmark_parser.add_argument('--collection', default='', help="保存到的文献库 key，默认使用上次选择的文献库")
+    benchmark_parser.add_argument('--json', action='store_true', help="以一行 JSON 输出结果")
+    index_parser = subparsers.add_parser('index', help="将 Zotero 存储目录中已有的双语快照加入搜索索引（增量）")
+    index_parser.add_argument('--rebuild', action='store_true', help="删除现有索引后重建")
+    index_parser.add_argument('--workers', type=int, default=0, help="并行进程数，默认等于 CPU 核数")
+    search_parser = subparsers.add_parser('search', help="在双语快照的原文与译文中搜索")
+    search_parser.add_argument('query', nargs='+')
+    search_parser.add_argument('--limit', type=int, default=50, help="最多返回的段落数")
+    fleet_parser = subparsers.add_parser('fleet', help="多进程 / 多机器共享任务队列")
+    fleet_parser.add_argument('--queue', default='', help="队列文件路径或协调服务地址（http://host:port），默认使用配置中的 fleet_queue")
+    fleet_subparsers = fleet_parser.add_subparsers(dest='fleet_command', required=True)
+    fleet_worker_parser = fleet_subparsers.add_parser('worker', help="启动一个 worker 进程")
+    fleet_worker_parser.add_argument('--name', default='', help="worker 名称，默认为 主机名-进程号")
+    fleet_worker_parser.add_argument('--poll', type=float, default=5, help="队列为空时的检查间隔（秒）")
+    fleet_serve_parser = fleet_subparsers.add_parser('serve', help="启动协调服务，供其他机器上的 worker 通过 HTTP 访问队列")
+    fleet_serve_parser.add_argument('--host', default='127.0.0.1', help="监听地址，默认仅本机可访问；供其他机器访问时使用 0.0.0.0")
+    fleet_serve_parser.add_argument('--port', type=int, default=0, help="监听端口，默认使用配置中的 fleet_port")
+    fleet_submit_parser = fleet_subparsers.add_parser('submit', help="提交任务")
+    fleet_submit_parser.add_argument('ids', nargs='+', help="Arxiv 编号或链接")
+    fleet_submit_parser.add_argument('--collection', default='', help="保存到的文献库 key，默认使用上次选择的文献库")
+    fleet_submit_parser.add_argument('--priority', type=int, default=0, help="优先级，数值越大越先处理")
+    fleet_cancel_parser = fleet_subparsers.add_parser('cancel', help="取消任务")
+    fleet_cancel_parser.add_argument('job_ids', nargs='+', type=int)
+    fleet_subparsers.add_parser('status', help="查看所有任务的状态")
+    subparsers.add_parser('job-worker', help="（内部使用）隔离执行模式下执行任务的子进程")
+    cli_args, qt_args = parser.parse_known_args()
+
+    if cli_args.command == 'serve':
+        serve(cli_args.port)
+        return
+    if cli_args.command == 'rerender':
+        rerender(cli_args.ids, cli_args.workers)
+        return
+    if cli_args.command == 'index':
+        build_search_index(cli_args.rebuild, cli_args.workers)
+        return
+    if cli_args.command == 'search':
+        search_snapshots(cli_args.query, cli_args.limit)
+        return
+    if cli_args.command == 'fleet':
+        fleet_command(cli_args)
+        return
+    if cli_args.command == 'benchmark':
+        benchmark(cli_args.ids, cli_args.engine, cli_args.jobs, cli_args.collection, cli_args.json)
+        return
+    if cli_args.command == 'job-worker':
+        run_job_worker()
+        return
+
+    app = QApplication(sys.argv[:1] + qt_args)
     
     if sys.platform == 'darwin':
         NSApp.setActivationPolicy_(NSApplicationActivationPolicyAccessory)
@@ -1233,4 +6859,4 @@ def main():
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
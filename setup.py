@@ -29,7 +29,7 @@ if is_py2app():
 
     OPTIONS = {
         'argv_emulation': True,
-        'packages': ['PyQt5', 'playwright', 'bs4', 'tqdm', 'pyzotero', 'pynput'],
+        'packages': ['PyQt5', 'playwright', 'bs4', 'tqdm', 'pyzotero', 'pynput', 'aiohttp'],
         'iconfile': 'config/icon.png',  # 确保这个路径正确
         'plist': {
             'CFBundleName': 'AutoSaveToZotero',
@@ -39,7 +39,7 @@ if is_py2app():
             'NSHumanReadableCopyright': 'Copyright © 2024 Wdaxiwan',
             'NSHighResolutionCapable': True,
         },
-        'includes': ['PyQt5.QtCore', 'PyQt5.QtGui', 'PyQt5.QtWidgets', 'playwright.sync_api']
+        'includes': ['PyQt5.QtCore', 'PyQt5.QtGui', 'PyQt5.QtWidgets', 'playwright.sync_api', 'playwright.async_api']
     }
 
     setup(
@@ -57,7 +57,8 @@ if is_py2app():
             'beautifulsoup4>=4.11.2',
             'tqdm>=4.66.1',
             'pyzotero>=1.5.25',
-            'pynput'
+            'pynput',
+            'aiohttp>=3.8'
         ],
     )
 else:
@@ -73,6 +74,7 @@ else:
             'beautifulsoup4>=4.11.2',
             'tqdm>=4.66.1',
             'pyzotero>=1.5.25',
-            'pynput'
+            'pynput',
+            'aiohttp>=3.8'
         ],
     )
\ No newline at end of file
@@ -0,0 +1,19 @@
+import os
+import sys
+
+# run.py 导入时加载 PyQt 与 pynput，测试环境没有显示器
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ.setdefault('PYNPUT_BACKEND', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def host_limiter(monkeypatch):
+    # 各测试的本地模拟服务都在 127.0.0.1 上，使用独立的限速器，互不影响限速与暂停状态
+    import run
+    limiter = run.HostRateLimiter()
+    limiter.configure({'host_rate_default': 1000, 'host_burst': 100})
+    monkeypatch.setattr(run, 'host_limiter', limiter)
+    return limiter
@@ -0,0 +1,163 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import run
+
+PAGE = '''<html><head><title>[2401.00001] Attention Test</title></head><body>
+<h1 class="ltx_title">Attention is all we test</h1>
+<div class="ltx_para" id="S1.p1"><p>The transformer uses <math id="m1"><mi>x</mi></math> as input.</p></div>
+<p>Second paragraph about attention heads and their training.</p>
+<p>Third paragraph DROP with <code>f(x)</code> inline code.</p>
+<p>Fourth paragraph describing the experimental evaluation.</p>
+<table class="ltx_equation"><tr><td>Equation text should stay</td></tr></table>
+<pre>def not_translated(): pass</pre>
+<section class="ltx_bibliography"><ul><li>Reference entry that stays</li></ul></section>
+<p>12345</p>
+</body></html>'''
+
+
+class CompletionsStub(BaseHTTPRequestHandler):
+    """
+    模拟 chat completions 接口：按 script 依次返回错误状态，之后逐段加上“译”前缀返回 JSON 数组。
+    回复数量不符与丢失占位符的故障各注入一次。
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, body, content_type='application/json'):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        if status in run.THROTTLE_STATUS:
+            self.send_header('Retry-After', self.server.state.get('retry_after', '0'))
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.send(200, PAGE, 'text/html; charset=utf-8')
+
+    def do_POST(self):
+        state = self.server.state
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        state['requests'].append(payload)
+        if state['script']:
+            self.send(state['script'].pop(0), '{}')
+            return
+        if self.path == '/glm':
+            texts = json.loads(payload['prompt'].split('\n\n', 1)[1])
+        else:
+            assert self.headers['Authorization'] == 'Bearer key' and payload['model'] == 'test-model'
+            texts = json.loads(payload['messages'][1]['content'])
+        state['batches'].append(texts)
+        translations = [f"译{text}" for text in texts]
+        if len(texts) > 1 and 'short' in state['faults']:
+            state['faults'].remove('short')
+            translations.pop()
+        if len(texts) > 1:
+            translations = [translation.replace('{{0}}', '') if 'DROP' in translation else translation
+                            for translation in translations]
+        reply = '```json\n' + json.dumps(translations, ensure_ascii=False) + '\n```'
+        if self.path == '/glm':
+            self.send(200, json.dumps({'response': reply, 'history': []}))
+        else:
+            self.send(200, json.dumps({'choices': [{'message': {'role': 'assistant', 'content': reply}}]}))
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), CompletionsStub)
+    server.daemon_threads = True
+    server.state = {'requests': [], 'batches': [], 'script': [], 'faults': set()}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_args(server, path='/v1/chat/completions', style='openai', **overrides):
+    return {
+        'translation_engine': 'api', 'translation_api_url': f"http://127.0.0.1:{server.server_address[1]}{path}",
+        'translation_api_key': 'key', 'translation_model': 'test-model', 'translation_api_style': style,
+        'translation_batch_tokens': 40, 'translation_concurrency': 2, 'translation_retry_backoff': 0.01,
+        'prefetch_jobs': 0, **overrides
+    }
+
+
+def test_token_batches_respect_budget():
+    texts = ['a' * 600, 'b' * 10, 'c' * 10, '中文' * 100, 'd' * 10]
+    batches = run.token_batches(texts, 120)
+    assert batches == [[0], [1, 2], [3], [4]]
+    assert sorted(index for batch in batches for index in batch) == list(range(len(texts)))
+
+
+@pytest.mark.parametrize('script', [[429], [503, 500], []])
+def test_client_retries_transient_errors(server, script):
+    server.state['script'] = list(script)
+    client = run.translation_client(make_args(server))
+    assert client.translate(['hello', 'world'], run.CancelEvent()) == ['译hello', '译world']
+    assert len(server.state['requests']) == len(script) + 1
+
+
+def test_client_waits_for_retry_after(server, monkeypatch):
+    server.state['script'], server.state['retry_after'] = [429], '0.2'
+    # 资源下载的重试设置不影响翻译接口
+    client = run.translation_client(make_args(server, resource_retries=0, resource_retry_backoff=60))
+    assert (client.retries, client.backoff) == (3, 0.01)
+    cancel_event = run.CancelEvent()
+    waits = []
+    wait = cancel_event.wait
+    monkeypatch.setattr(cancel_event, 'wait', lambda timeout=None: waits.append(timeout) or wait(timeout))
+    assert client.translate(['hello'], cancel_event) == ['译hello']
+    assert waits[0] == pytest.approx(0.2)
+
+
+def test_client_gives_up(server):
+    server.state['script'] = [400]
+    client = run.translation_client(make_args(server))
+    with pytest.raises(Exception, match='HTTP 400'):
+        client.translate(['hello'], run.CancelEvent())
+    assert len(server.state['requests']) == 1
+
+    server.state['script'] = [503] * 4
+    with pytest.raises(Exception, match='HTTP 503'):
+        client.translate(['hello'], run.CancelEvent())
+    assert len(server.state['requests']) == 1 + client.retries + 1
+
+
+@pytest.mark.parametrize('path,style', [('/v1/chat/completions', 'openai'), ('/glm', 'glm')])
+def test_translate_page_inserts_translations(server, monkeypatch, path, style):
+    server.state['faults'] = {'short'}
+    server.state['script'] = [429]
+    args = make_args(server, path, style)
+    worker = run.SavePageWorker(1, 'https://arxiv.org/abs/2401.00001', args, run.WorkerSignals(), run.CancelEvent())
+    worker.arxiv_id, worker.arxiv_version = '2401.00001', ''
+    saved = {}
+    monkeypatch.setattr(worker, 'save_translated',
+                        lambda *arguments: saved.setdefault('arguments', arguments) and 'out.html')
+
+    assert worker.translate_page(f"http://127.0.0.1:{server.server_address[1]}/html/2401.00001") == 'out.html'
+    page_title, output_filename, html, _ = saved['arguments']
+    assert (page_title, output_filename) == ('Attention Test', 'Attention Test.html')
+
+    # 分批且每批不超过预算（单段超出预算时单独成批）
+    batches = server.state['batches']
+    assert len(batches) > 1
+    assert all(len(batch) == 1 or sum(run.estimate_tokens(text) + 4 for text in batch) <= 40 for batch in batches)
+    # 数量不符的批次被拆分重试，丢失占位符的段落单独重试
+    assert ['Third paragraph DROP with {{0}} inline code.'] in batches
+
+    soup = run.BeautifulSoup(html, 'html.parser')
+    pairs = dict(run.extract_bilingual_paragraphs(soup))
+    assert pairs['The transformer uses x as input.'] == '译The transformer uses x as input.'
+    assert pairs['Third paragraph DROP with f(x) inline code.'] == '译Third paragraph DROP with f(x) inline code.'
+    assert len(pairs) == 5
+    # 公式副本去掉 id，原公式保留
+    assert [math.get('id') for math in soup.find_all('math')] == ['m1', None]
+    for selector in ('.ltx_equation', 'pre', '.ltx_bibliography'):
+        assert not soup.select_one(selector).select('.immersive-translate-target-wrapper')
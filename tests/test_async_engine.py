@@ -0,0 +1,138 @@
+import asyncio
+import base64
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import run
+
+PNG = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+
+class AssetStub(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        body, content_type = {
+            '/style.css': (b'body { background: url(bg.png); }', 'text/css'),
+            '/bg.png': (PNG, 'image/png'),
+            '/figure.png': (PNG, 'image/png'),
+        }.get(self.path, (b'', 'text/plain'))
+        self.send_response(200 if body else 404)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def assets():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AssetStub)
+    server.daemon_threads = True
+    server.paths = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def engine():
+    engine = run.AsyncSaveEngine({})
+    yield engine
+    engine.shutdown()
+
+
+def make_worker(args=None):
+    return run.AsyncSavePageWorker(1, 'https://arxiv.org/abs/2401.00001', {'prefetch_jobs': 0, **(args or {})},
+                                   run.WorkerSignals(), run.CancelEvent())
+
+
+class FakePage:
+    url = 'https://arxiv.org/html/2401.00001'
+
+    async def route(self, matcher, handler):
+        pass
+
+    async def goto(self, url, wait_until=None):
+        return type('Response', (), {'status': 200, 'headers': {}})()
+
+    async def wait_for_load_state(self, state, timeout=None):
+        pass
+
+    async def wait_for_selector(self, selector, state=None, timeout=None):
+        pass
+
+    async def title(self):
+        return '[2401.00001] Paper Title'
+
+    async def content(self):
+        return '<html><body><p>translated</p></body></html>'
+
+
+def test_async_page_uses_shared_post_translation_step(engine, monkeypatch):
+    worker = make_worker()
+    worker.engine = engine
+    calls = []
+    monkeypatch.setattr(worker, 'save_translated', lambda *args: calls.append(args) or 'out.html')
+    future = asyncio.run_coroutine_threadsafe(worker.save_page_async(FakePage(), FakePage.url), engine.loop)
+    assert future.result(timeout=10) == 'out.html'
+    assert calls == [('Paper Title', 'Paper Title.html', '<html><body><p>translated</p></body></html>', FakePage.url)]
+
+
+def test_snapshot_resources_download_on_event_loop(engine, assets, monkeypatch):
+    monkeypatch.setattr(run.SavePageWorker, 'download_round', lambda *args: pytest.fail('应经由事件循环下载'))
+    worker = make_worker()
+    worker.engine = engine
+    base_url = f"http://127.0.0.1:{assets.server_address[1]}/"
+    html = '<html><head><link rel="stylesheet" href="style.css"></head><body><img src="figure.png"></body></html>'
+
+    soup = worker.render_snapshot(html, base_url)
+    assert sorted(assets.paths) == ['/bg.png', '/figure.png', '/style.css']
+    assert soup.find('img')['src'].startswith('data:image/png;base64,')
+    stylesheet = base64.b64decode(soup.find('link')['href'].split(',', 1)[1]).decode('utf-8')
+    assert 'data:image/png;base64,' in stylesheet
+
+
+class FakeContext:
+    def __init__(self, user_data_dir):
+        self.user_data_dir = user_data_dir
+        self.closed = False
+
+    def on(self, event, callback):
+        pass
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeChromium:
+    def __init__(self):
+        self.launched = []
+
+    async def launch_persistent_context(self, user_data_dir, **kwargs):
+        self.launched.append(user_data_dir)
+        return FakeContext(user_data_dir)
+
+
+def test_context_holds_a_pooled_profile(engine, tmp_path):
+    source = tmp_path / 'user_data'
+    source.mkdir()
+    (source / 'Preferences').write_text('{}')
+    pool = run.ProfilePool(str(source), str(tmp_path / 'pool'), 2)
+    chromium = FakeChromium()
+    engine.playwright = type('Playwright', (), {'chromium': chromium})()
+
+    def call(coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, engine.loop).result(timeout=10)
+
+    context = call(engine.get_context(str(source), 'ext', pool))
+    assert call(engine.get_context(str(source), 'ext', pool)) is context
+    assert chromium.launched == [str(tmp_path / 'pool' / 'worker-0')]
+    assert pool.available.qsize() == 1
+
+    call(engine.close_browser())
+    assert context.closed and pool.available.qsize() == 2
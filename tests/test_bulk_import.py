@@ -0,0 +1,33 @@
+import threading
+import time
+
+from PyQt5.QtCore import QCoreApplication
+
+import run
+
+
+def test_listing_expansion_runs_off_the_gui_thread(monkeypatch):
+    app = QCoreApplication.instance() or QCoreApplication([])
+    fetch_threads = []
+
+    def expand_arxiv_listings(text):
+        fetch_threads.append(threading.current_thread())
+        time.sleep(0.3)  # 模拟抓取列表页
+        return text + '\n/abs/2401.00002v2'
+
+    monkeypatch.setattr(run, 'expand_arxiv_listings', expand_arxiv_listings)
+    loader = run.BulkImportLoader('2401.00001 https://arxiv.org/list/cs.CL/new')
+    results, slot_threads = [], []
+    loader.finished.connect(lambda arxiv_ids: (results.append(arxiv_ids), slot_threads.append(threading.current_thread())))
+
+    started = time.monotonic()
+    loader.start()
+    assert time.monotonic() - started < 0.1
+
+    deadline = time.monotonic() + 5
+    while not results and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    assert results == [[('2401.00001', ''), ('2401.00002', 'v2')]]
+    assert fetch_threads[0] is not threading.main_thread()
+    assert slot_threads == [threading.main_thread()]
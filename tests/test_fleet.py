@@ -0,0 +1,136 @@
+import json
+import multiprocessing
+import threading
+import time
+
+import pytest
+import requests
+
+import run
+
+
+def drain(path, worker, results):
+    """子进程：不断领取并完成任务，直到队列为空。"""
+    fleet = run.FleetQueue(path, lease_seconds=30)
+    claimed = []
+    while True:
+        job = fleet.claim(worker)
+        if job is None:
+            break
+        claimed.append(job['id'])
+        fleet.complete(job['id'], worker, 'finished')
+    results.put((worker, claimed))
+
+
+def hold(path, worker, seconds, results):
+    """子进程：领取一个任务并持续续约 seconds 秒后退出，模拟处理中途崩溃的 worker。"""
+    fleet = run.FleetQueue(path, lease_seconds=1)
+    job = fleet.claim(worker)
+    results.put(('claimed', job['id']))
+    renewed = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        renewed.append(fleet.heartbeat(job['id'], worker))
+        time.sleep(0.2)
+    results.put(('renewed', all(renewed)))
+
+
+@pytest.fixture
+def ctx():
+    return multiprocessing.get_context('spawn')
+
+
+def test_each_job_is_claimed_by_exactly_one_process(tmp_path, ctx):
+    path = str(tmp_path / 'fleet.db')
+    job_ids = run.FleetQueue(path).submit([f'https://arxiv.org/abs/2401.{i:05d}' for i in range(40)], 'KEY')
+    results = ctx.Queue()
+    workers = [ctx.Process(target=drain, args=(path, f'w{i}', results)) for i in range(4)]
+    for process in workers:
+        process.start()
+    claimed = [results.get(timeout=60) for _ in workers]
+    for process in workers:
+        process.join(timeout=30)
+
+    all_claimed = [job_id for _, ids in claimed for job_id in ids]
+    assert sorted(all_claimed) == job_ids
+    jobs = run.FleetQueue(path).list_jobs()
+    assert all(job['status'] == 'finished' and job['attempts'] == 1 for job in jobs)
+
+
+def test_heartbeat_keeps_lease_and_expired_lease_is_reclaimed(tmp_path, ctx):
+    path = str(tmp_path / 'fleet.db')
+    fleet = run.FleetQueue(path, lease_seconds=1)
+    job_id, = fleet.submit(['https://arxiv.org/abs/2401.00001'], 'KEY')
+    results = ctx.Queue()
+    holder = ctx.Process(target=hold, args=(path, 'holder', 2.5, results))
+    holder.start()
+    assert results.get(timeout=60) == ('claimed', job_id)
+
+    # 租约只有 1 秒，但持有者一直在续约，超过租约时长后仍不能被其他 worker 领取
+    time.sleep(1.5)
+    assert fleet.claim('other') is None
+    assert results.get(timeout=30) == ('renewed', True)
+    holder.join(timeout=30)
+
+    # 持有者退出后不再续约，租约过期后任务被重新领取
+    time.sleep(1.2)
+    job = fleet.claim('other')
+    assert job['id'] == job_id
+    assert job['attempts'] == 2
+    assert not fleet.heartbeat(job_id, 'holder')
+    assert fleet.heartbeat(job_id, 'other')
+
+
+def test_expired_lease_is_abandoned_after_max_attempts(tmp_path):
+    fleet = run.FleetQueue(str(tmp_path / 'fleet.db'), lease_seconds=0.1, max_attempts=2)
+    job_id, = fleet.submit(['https://arxiv.org/abs/2401.00001'], 'KEY')
+    assert fleet.claim('a')['attempts'] == 1
+    time.sleep(0.2)
+    assert fleet.claim('b')['attempts'] == 2
+    time.sleep(0.2)
+    assert fleet.claim('c') is None
+    job, = fleet.list_jobs()
+    assert job['id'] == job_id and job['status'] == 'error'
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    server = run.ThreadingHTTPServer(('127.0.0.1', 0), run.FleetRequestHandler)
+    server.daemon_threads = True
+    server.fleet = run.FleetQueue(str(tmp_path / 'fleet.db'))
+    server.fleet_token = 'secret'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_coordinator_rejects_requests_without_token(coordinator):
+    response = requests.post(f"{coordinator}/fleet/jobs", json={'urls': ['https://arxiv.org/abs/2401.00001']})
+    assert response.status_code == 401
+    for method, path in (('GET', '/jobs'), ('POST', '/claim'), ('POST', '/jobs/1/cancel')):
+        with pytest.raises(requests.HTTPError):
+            run.RemoteFleetQueue(coordinator, 'wrong').request(method, path, {'worker': 'x'})
+    assert run.RemoteFleetQueue(coordinator, 'secret').list_jobs() == []
+
+
+def test_remote_queue_with_token(coordinator):
+    fleet = run.RemoteFleetQueue(coordinator, 'secret')
+    job_id, = fleet.submit(['https://arxiv.org/abs/2401.00001'], 'KEY')
+    job = fleet.claim('w')
+    assert job['id'] == job_id
+    assert fleet.heartbeat(job_id, 'w') and not fleet.heartbeat(job_id, 'x')
+    assert fleet.complete(job_id, 'w', 'finished', filepath='a.html')
+    assert fleet.list_jobs()[0]['status'] == 'finished'
+
+
+def test_generated_token_is_merged_into_config_without_echo(tmp_path, monkeypatch, capsys):
+    config_file = tmp_path / 'config.json'
+    config_file.write_text('{"output_dir": "out"}')
+    monkeypatch.setattr(run, 'CONFIG_FILE', str(config_file))
+    # 内存中的配置带有合并进来的默认值，只有令牌会写回文件
+    config = {'output_dir': 'out', 'fleet_port': 23121}
+    token = run.ensure_token(config, 'fleet_token')
+    assert json.loads(config_file.read_text()) == {'output_dir': 'out', 'fleet_token': token}
+    assert token not in capsys.readouterr().out
+    assert run.ensure_token(config, 'fleet_token') == token
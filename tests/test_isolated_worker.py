@@ -0,0 +1,105 @@
+import queue
+import threading
+import time
+
+import pytest
+
+import run
+
+
+class FakeWorkerProcess:
+    """
+    代替 job-worker 子进程：收到任务后报告进入 stage 阶段，之后不再发送心跳；crash 为真时随即退出。
+    """
+    def __init__(self, stage, crash=False):
+        self.stage = stage
+        self.crash = crash
+        self.profile_dir = None
+        self.events = queue.Queue()
+        self.messages = []
+        self.starts = self.kills = 0
+
+    def alive(self):
+        return True
+
+    def start(self):
+        self.starts += 1
+        self.events = queue.Queue()
+
+    def send(self, message):
+        self.messages.append(message)
+        if message['type'] == 'job':
+            self.events.put({'type': 'progress', 'job_id': message['job_id'], 'stage': self.stage})
+            if self.crash:
+                self.events.put(None)
+
+    def kill(self):
+        self.kills += 1
+
+    def stop(self):
+        pass
+
+
+def make_service(monkeypatch, process):
+    service = run.JobService({'prefetch_jobs': 0, 'save_engine': 'isolated', 'stall_timeout': 0.3,
+                              'isolation_max_restarts': 1})
+    monkeypatch.setattr(run.metadata_fetcher(), 'prefetch', lambda ids: None)
+    monkeypatch.setattr(service, 'estimate_job', lambda job_id: None)
+    # 重新排队后由测试自己调用 run_next，不交给执行线程
+    submitted = []
+    monkeypatch.setattr(service.executor, 'submit', lambda fn, *args: submitted.append(fn))
+    service.thread_state.process = process
+    return service, submitted
+
+
+@pytest.mark.parametrize('crash', [False, True])
+def test_stalled_or_crashed_job_is_requeued_then_failed(monkeypatch, crash):
+    process = FakeWorkerProcess(stage=5, crash=crash)
+    service, submitted = make_service(monkeypatch, process)
+    job_id, = service.submit_many(['https://arxiv.org/abs/2401.00001'], 'KEY')
+    events = []
+    service.subscribe(events.append)
+    submitted.clear()
+
+    service.run_next()
+    job = service.get_job(job_id)
+    assert job['status'] == 'queued' and job['restarts'] == 1 and job['stalls'] == int(not crash)
+    # 已进入第 5 阶段（翻译结果已存档），重新运行时从存档生成快照
+    assert job['resume_stage'] == 5
+    assert service.scheduler.order() == [job_id] and len(submitted) == 1
+    assert (process.kills, process.starts) == (1, 1)
+    assert service.worker_stats()['restarts'] == 1 and service.worker_stats()['stalls'] == int(not crash)
+    requeued, = [event for event in events if event['type'] == 'requeued']
+    assert requeued['reason'] == ('工作进程意外退出' if crash else '卡住')
+
+    # 超过 isolation_max_restarts 次后标记为失败，不再排队
+    service.run_next()
+    job = service.get_job(job_id)
+    assert job['status'] == 'error' and job['restarts'] == 2
+    assert service.scheduler.order() == [] and len(submitted) == 1
+    assert (process.kills, process.starts) == (2, 2)
+    assert [message['type'] for message in process.messages] == ['job', 'job']
+
+
+def test_heartbeats_keep_a_slow_job_alive(monkeypatch):
+    process = FakeWorkerProcess(stage=4)
+    service, submitted = make_service(monkeypatch, process)
+    job_id, = service.submit_many(['https://arxiv.org/abs/2401.00001'], 'KEY')
+    send = process.send
+
+    def heartbeats():
+        # 心跳间隔小于 stall_timeout，总耗时超过 stall_timeout 也不会被判定卡住
+        for _ in range(4):
+            time.sleep(0.15)
+            process.events.put({'type': 'heartbeat', 'job_id': job_id})
+        process.events.put({'type': 'finished', 'job_id': job_id, 'filepath': 'out.html'})
+
+    def send_with_heartbeats(message):
+        send(message)
+        if message['type'] == 'job':
+            threading.Thread(target=heartbeats, daemon=True).start()
+    process.send = send_with_heartbeats
+
+    service.run_next()
+    assert service.get_job(job_id)['status'] == 'finished'
+    assert process.kills == 0 and service.worker_stats()['stalls'] == 0
@@ -0,0 +1,99 @@
+import run
+
+
+def make_service(monkeypatch, **args):
+    service = run.JobService({'prefetch_jobs': 0, **args})
+    monkeypatch.setattr(run.metadata_fetcher(), 'prefetch', lambda ids: None)
+    # 只检查排队与调度，不真正运行任务
+    monkeypatch.setattr(service, 'run_next', lambda: None)
+    monkeypatch.setattr(service, 'estimate_job', lambda job_id: None)
+    return service
+
+
+def test_submit_many_sorts_and_publishes_queue_once(monkeypatch):
+    service = make_service(monkeypatch)
+    events = []
+    service.subscribe(events.append)
+    orders = []
+    order = service.scheduler.order
+    monkeypatch.setattr(service.scheduler, 'order', lambda: orders.append(1) or order())
+
+    urls = [f'https://arxiv.org/abs/2401.{i:05d}' for i in range(200)]
+    job_ids = service.submit_many(urls, 'KEY')
+
+    queue_events = [event for event in events if event['type'] == 'queue']
+    assert len(queue_events) == 1
+    assert sorted(queue_events[0]['order']) == job_ids
+    assert len(orders) == 1
+    assert sorted(service.signals) == job_ids and sorted(service.cancel_events) == job_ids
+
+
+def test_retry_requeues_job(monkeypatch):
+    service = make_service(monkeypatch)
+    job_id, = service.submit_many(['https://arxiv.org/abs/2401.00001'], 'KEY')
+    service.scheduler.discard(job_id)
+    service.jobs[job_id]['status'] = 'error'
+    assert service.retry(job_id)
+    assert service.scheduler.order() == [job_id]
+
+
+def test_only_queue_head_is_estimated(monkeypatch):
+    service = make_service(monkeypatch)
+    estimated = []
+    monkeypatch.setattr(service.estimator, 'submit', lambda fn, job_id: estimated.append(job_id))
+    job_ids = service.submit_many([f'https://arxiv.org/abs/2401.{i:05d}' for i in range(50)], 'KEY')
+    assert len(estimated) == run.ESTIMATE_QUEUE_HEAD
+    assert set(estimated) <= set(job_ids)
+
+
+def test_estimate_reads_and_fills_prefetch_cache(monkeypatch, tmp_path):
+    service = run.JobService({'prefetch_jobs': 2, 'prefetch_cache_dir': str(tmp_path), 'reuse_dom_archive': False})
+    monkeypatch.setattr(run.metadata_fetcher(), 'prefetch', lambda ids: None)
+    monkeypatch.setattr(service, 'run_next', lambda: None)
+    monkeypatch.setattr(service, 'schedule_estimates', lambda order: None)
+    monkeypatch.setattr(service, 'schedule_prefetch', lambda order: None)
+    monkeypatch.setattr(run.SavePageWorker, 'resolve_source', lambda self, url: 'https://example.org/page')
+    requests_made = []
+
+    class Response:
+        status_code = 200
+        headers = {'Content-Type': 'text/html'}
+        url = 'https://example.org/page'
+        text = '<p>a</p><p>b</p><p>c</p>'
+        content = text.encode('utf-8')
+
+        def raise_for_status(self):
+            pass
+
+    monkeypatch.setattr(run.http_session, 'get', lambda url, **kwargs: requests_made.append(url) or Response())
+    first, second = service.submit_many(['https://arxiv.org/abs/2401.00001', 'https://arxiv.org/abs/2401.00002'], 'KEY')
+
+    service.estimate_job(first)
+    service.estimate_job(second)
+    assert requests_made == ['https://example.org/page']
+    assert service.jobs[first]['paragraphs'] == service.jobs[second]['paragraphs'] == 3
+    assert run.prefetch_cache(service.args).contains('https://example.org/page')
+    assert service.prefetched[first] == ['https://example.org/page']
+
+
+def test_remove_many_publishes_once(monkeypatch):
+    service = make_service(monkeypatch)
+    job_ids = service.submit_many([f'https://arxiv.org/abs/2401.{i:05d}' for i in range(100)], 'KEY')
+    events = []
+    service.subscribe(events.append)
+    events.clear()  # 订阅时收到的当前任务列表
+    assert service.remove_many(job_ids[:60] + [9999]) == job_ids[:60]
+    assert [event['type'] for event in events] == ['removed', 'queue']
+    assert sorted(service.scheduler.order()) == job_ids[60:]
+    assert sorted(job['id'] for job in service.list_jobs()) == job_ids[60:]
+
+
+def test_job_model_removes_contiguous_rows_together():
+    model = run.JobTableModel()
+    model.add_jobs([{'id': job_id} for job_id in range(10)])
+    removals = []
+    model.rowsRemoved.connect(lambda parent, first, last: removals.append((first, last)))
+    model.remove_jobs([1, 2, 3, 7, 8, 42])
+    assert removals == [(7, 8), (1, 3)]
+    assert model.order == [0, 4, 5, 6, 9] and sorted(model.jobs) == model.order
+    assert model.row_of(9) == 4
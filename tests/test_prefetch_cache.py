@@ -0,0 +1,45 @@
+import os
+
+import run
+
+
+def disk_size(root_dir):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(root_dir) for name in names)
+
+
+def test_running_size_matches_disk(tmp_path, monkeypatch):
+    cache = run.PrefetchCache(str(tmp_path), 1024 * 1024)
+    # 创建后不再扫描目录
+    monkeypatch.setattr(cache, 'entries', lambda: (_ for _ in ()).throw(AssertionError('rescanned')))
+    for i in range(20):
+        cache.put(f'https://example.org/{i}.css', 'text/css', b'x' * (100 + i))
+    cache.put('https://example.org/0.css', 'text/css', b'y' * 500)
+    cache.discard(['https://example.org/1.css', 'https://example.org/missing.css'])
+    assert cache.total_size() == disk_size(tmp_path)
+    assert cache.get('https://example.org/0.css') == ('text/css', b'y' * 500)
+
+
+def test_startup_scan_restores_size(tmp_path):
+    cache = run.PrefetchCache(str(tmp_path), 1024 * 1024)
+    cache.put('https://example.org/a.js', 'text/javascript', b'a' * 300)
+    assert run.PrefetchCache(str(tmp_path), 1024 * 1024).total_size() == disk_size(tmp_path)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = run.PrefetchCache(str(tmp_path), 0)
+    cache.budget_bytes = 2500
+    cache.put('https://example.org/a', 'text/plain', b'a' * 1000)
+    cache.put('https://example.org/b', 'text/plain', b'b' * 1000)
+    cache.get('https://example.org/a')
+    cache.put('https://example.org/c', 'text/plain', b'c' * 1000)
+    assert cache.contains('https://example.org/a')
+    assert not cache.contains('https://example.org/b')
+    assert cache.contains('https://example.org/c')
+    assert cache.total_size() == disk_size(tmp_path) <= cache.budget_bytes
+
+
+def test_prefetch_cache_is_shared_per_directory(tmp_path):
+    args = {'prefetch_cache_dir': str(tmp_path), 'prefetch_cache_budget_mb': 1}
+    cache = run.prefetch_cache(args)
+    assert run.prefetch_cache({**args, 'prefetch_cache_budget_mb': 2}) is cache
+    assert cache.budget_bytes == 2 * 1024 * 1024
@@ -0,0 +1,75 @@
+import os
+
+import run
+
+
+def make_source(tmp_path):
+    source = tmp_path / 'user_data'
+    (source / 'Default').mkdir(parents=True)
+    (source / 'Default' / 'Preferences').write_text('{}')
+    return str(source)
+
+
+def test_resize_adds_only_new_profiles(tmp_path):
+    pool = run.ProfilePool(make_source(tmp_path), str(tmp_path / 'pool'), 2)
+    held = {pool.acquire(), pool.acquire()}
+    assert {os.path.basename(path) for path in held} == {'worker-0', 'worker-1'}
+
+    pool.resize(3)
+    assert os.path.basename(pool.acquire()) == 'worker-2'
+    # 已借出的副本不会再次出现在可用队列中
+    assert pool.available.empty()
+
+
+def test_get_profile_pool_resizes_existing_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(run, 'profile_pools', {})
+    args = {'user_data_dir': make_source(tmp_path), 'profile_pool_dir': str(tmp_path / 'pool'), 'max_parallel_jobs': 2}
+    pool = run.get_profile_pool(args)
+    pool.acquire()
+    assert run.get_profile_pool({**args, 'max_parallel_jobs': 4}) is pool
+    assert pool.size == 4 and pool.available.qsize() == 3
+
+
+def test_source_is_restamped_only_when_extension_settings_change(tmp_path, monkeypatch):
+    source = make_source(tmp_path)
+    pool = run.ProfilePool(source, str(tmp_path / 'pool'), 2)
+    monkeypatch.setattr(pool, 'WATCH_TTL', 0)
+    stamps = []
+    source_stamp = pool.source_stamp
+    monkeypatch.setattr(pool, 'source_stamp', lambda: stamps.append(1) or source_stamp())
+
+    # 浏览历史等其他文件的变化不会触发重新计算
+    pool.prepare()
+    with open(os.path.join(source, 'Default', 'History'), 'w') as f:
+        f.write('visited')
+    for _ in range(5):
+        profile_dir = pool.acquire()
+        assert not pool.is_stale(profile_dir)
+        pool.release(profile_dir)
+    assert len(stamps) == 1
+
+    # 在浏览器中修改插件设置后，下次借出时重新克隆
+    settings = os.path.join(source, 'Default', 'Local Extension Settings', 'ext')
+    os.makedirs(settings)
+    with open(os.path.join(settings, '000003.log'), 'w') as f:
+        f.write('changed')
+    profile_dir = pool.acquire()
+    assert os.path.exists(os.path.join(profile_dir, 'Default', 'Local Extension Settings', 'ext', '000003.log'))
+    assert len(stamps) == 2
+    pool.release(profile_dir)
+
+    # 修改时间在 WATCH_TTL 内不会重复检查
+    monkeypatch.setattr(pool, 'WATCH_TTL', 3600)
+    os.utime(os.path.join(source, 'Default', 'Preferences'), (1, 1))
+    pool.acquire()
+    assert len(stamps) == 2
+
+
+def test_cleanup_removes_only_created_profiles(tmp_path):
+    root = tmp_path / 'pool'
+    root.mkdir()
+    (root / 'notes.txt').write_text('keep')
+    pool = run.ProfilePool(make_source(tmp_path), str(root), 2)
+    pool.prepare()
+    pool.cleanup()
+    assert sorted(os.listdir(root)) == ['notes.txt']
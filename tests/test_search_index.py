@@ -0,0 +1,18 @@
+from contextlib import closing
+
+import run
+
+
+def test_clear_keeps_the_database_usable_for_open_connections(tmp_path):
+    index = run.SnapshotIndex(str(tmp_path / 'index.db'))
+    snapshot = tmp_path / 'paper.html'
+    snapshot.write_text('<html></html>')
+    index.add(str(snapshot), [('attention is all you need', '注意力就是你所需要的')], title='T')
+
+    # 界面或服务进程中已打开的连接在重建后仍能查询，不会残留旧的 -wal / -shm 数据
+    with closing(index.connect()) as reader:
+        index.clear()
+        assert reader.execute('SELECT COUNT(*) FROM snapshots').fetchone() == (0,)
+    assert index.search('attention') == []
+    index.add(str(snapshot), [('attention is all you need', '注意力就是你所需要的')], title='T')
+    assert [result['title'] for result in index.search('attention')] == ['T']
@@ -0,0 +1,65 @@
+import pytest
+import requests
+
+import run
+
+
+@pytest.fixture
+def server(monkeypatch):
+    service = run.JobService({'prefetch_jobs': 0})
+    monkeypatch.setattr(run.metadata_fetcher(), 'prefetch', lambda ids: None)
+    # 只检查 API 本身，不真正运行任务
+    monkeypatch.setattr(service, 'run_next', lambda: None)
+    monkeypatch.setattr(service, 'estimate_job', lambda job_id: None)
+    server = run.start_service_server(service, 0, 'secret')
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_remote_service_with_token(server):
+    remote = run.RemoteJobService(base_url(server), 'secret')
+    job_id, = remote.submit_many(['https://arxiv.org/abs/2401.00001'], 'KEY')
+    assert [job['id'] for job in remote.list_jobs()] == [job_id]
+    assert remote.cancel(job_id)
+    assert remote.remove(job_id)
+    assert remote.list_jobs() == []
+
+
+def test_missing_or_wrong_token_is_rejected(server):
+    assert requests.get(base_url(server) + '/jobs').status_code == 401
+    assert requests.get(base_url(server) + '/jobs', headers={run.SERVICE_TOKEN_HEADER: 'guess'}).status_code == 401
+    assert run.RemoteJobService(base_url(server), 'guess').remove(1) is False
+
+
+def test_foreign_host_or_origin_is_rejected(server):
+    headers = {run.SERVICE_TOKEN_HEADER: 'secret'}
+    assert requests.get(base_url(server) + '/jobs', headers={**headers, 'Host': 'evil.example'}).status_code == 403
+    response = requests.post(base_url(server) + '/jobs', json={'url': 'https://arxiv.org/abs/2401.00001'},
+                             headers={**headers, 'Origin': 'https://evil.example'})
+    assert response.status_code == 403
+    assert server.service.list_jobs() == []
+
+
+def test_post_must_be_a_json_object(server):
+    headers = {run.SERVICE_TOKEN_HEADER: 'secret'}
+    response = requests.post(base_url(server) + '/jobs', data='{"url": "https://arxiv.org/abs/2401.00001"}',
+                             headers={**headers, 'Content-Type': 'text/plain'})
+    assert response.status_code == 400
+    assert requests.post(base_url(server) + '/jobs', json=[], headers=headers).status_code == 400
+    assert server.service.list_jobs() == []
+
+
+def test_remote_remove_many_uses_one_request(server, monkeypatch):
+    remote = run.RemoteJobService(base_url(server), 'secret')
+    job_ids = remote.submit_many([f'https://arxiv.org/abs/2401.{i:05d}' for i in range(5)], 'KEY')
+    requests_made = []
+    request = run.http_session.request
+    monkeypatch.setattr(run.http_session, 'request', lambda *args, **kwargs: requests_made.append(args) or request(*args, **kwargs))
+    assert remote.remove_many(job_ids[:3]) == job_ids[:3]
+    assert len(requests_made) == 1
+    assert [job['id'] for job in remote.list_jobs()] == job_ids[3:]
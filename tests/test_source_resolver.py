@@ -0,0 +1,50 @@
+import time
+
+import run
+
+
+def make_resolver(tmp_path, monkeypatch, available):
+    resolver = run.ArxivSourceResolver(str(tmp_path / 'source_cache.json'))
+    probed = []
+    monkeypatch.setattr(resolver, 'probe', lambda url: probed.append(url) or available(url))
+    return resolver, probed
+
+
+def test_unversioned_id_may_use_ar5iv(tmp_path, monkeypatch):
+    resolver, probed = make_resolver(tmp_path, monkeypatch, lambda url: 'ar5iv' in url)
+    assert resolver.resolve('1706.03762', '', prefer_html=True) == 'https://ar5iv.labs.arxiv.org/html/1706.03762'
+    assert sorted(probed) == ['https://ar5iv.labs.arxiv.org/html/1706.03762', 'https://arxiv.org/html/1706.03762']
+
+
+def test_pinned_version_never_resolves_to_ar5iv(tmp_path, monkeypatch):
+    resolver, probed = make_resolver(tmp_path, monkeypatch, lambda url: True)
+    assert resolver.resolve('1706.03762', 'v2', prefer_html=False) == 'https://arxiv.org/html/1706.03762v2'
+    assert probed == ['https://arxiv.org/html/1706.03762v2']
+
+    # 版本对应的 HTML 不可用时不退回到 ar5iv 的最新版本
+    resolver, probed = make_resolver(tmp_path, monkeypatch, lambda url: 'ar5iv' in url)
+    resolver.cache = {}
+    assert resolver.resolve('1706.03762', 'v3', prefer_html=False) is None
+
+
+def test_cached_ar5iv_result_for_pinned_version_is_reprobed(tmp_path, monkeypatch):
+    resolver, probed = make_resolver(tmp_path, monkeypatch, lambda url: True)
+    resolver.cache = {'1706.03762v2': {'url': 'https://ar5iv.labs.arxiv.org/html/1706.03762', 'checked_at': time.time()}}
+    assert resolver.resolve('1706.03762', 'v2', prefer_html=False) == 'https://arxiv.org/html/1706.03762v2'
+    assert probed == ['https://arxiv.org/html/1706.03762v2']
+
+
+def test_date_fallback_keeps_pinned_version():
+    worker = run.SavePageWorker(1, 'https://arxiv.org/abs/1706.03762v2', {'prefetch_jobs': 0}, None, run.CancelEvent())
+    assert worker.check_arxiv_date_and_modify_url('https://arxiv.org/abs/1706.03762v2') == 'https://arxiv.org/html/1706.03762v2'
+    assert worker.check_arxiv_date_and_modify_url('https://arxiv.org/abs/1706.03762') == 'https://ar5iv.labs.arxiv.org/html/1706.03762'
+
+
+def test_only_arxiv_links_or_bare_ids_are_parsed():
+    assert run.parse_arxiv_id('https://arxiv.org/abs/2401.12345v2') == ('2401.12345', 'v2')
+    assert run.parse_arxiv_id('ar5iv.labs.arxiv.org/html/2401.12345') == ('2401.12345', '')
+    assert run.parse_arxiv_id('arXiv:2401.12345') == ('2401.12345', '')
+    assert run.parse_arxiv_id('hep-th/9901001') == ('hep-th/9901001', '')
+    # 其他站点的链接中形如编号的文件名不会被当作 Arxiv 论文
+    assert run.parse_arxiv_id('https://example.com/files/2401.12345.pdf') == (None, None)
+    assert run.parse_arxiv_id('example.com/files/2401.12345.pdf') == (None, None)
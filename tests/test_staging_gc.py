@@ -0,0 +1,42 @@
+import os
+import time
+
+import run
+
+
+def make_file(path, size, age):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_files_older_than_max_age_are_removed(tmp_path):
+    old = make_file(tmp_path / '.objects' / 'ab' / 'old.html', 10, age=3600)
+    new = make_file(tmp_path / 'new.html', 10, age=10)
+    assert run.collect_staging_garbage(str(tmp_path), max_age=600) == 1
+    assert not old.exists() and new.exists()
+    # 清空的对象子目录一并删除
+    assert os.listdir(tmp_path / '.objects') == []
+
+
+def test_oldest_files_are_removed_until_under_max_bytes(tmp_path):
+    files = [make_file(tmp_path / f"{age}.html", 100, age=age) for age in (300, 200, 100)]
+    assert run.collect_staging_garbage(str(tmp_path), max_bytes=250) == 1
+    assert [path.exists() for path in files] == [False, True, True]
+    # 不限制时不删除任何文件
+    assert run.collect_staging_garbage(str(tmp_path)) == 0
+
+
+def test_hardlinks_are_counted_once(tmp_path):
+    shared = make_file(tmp_path / '.objects' / 'cd' / 'shared.html', 100, age=300)
+    link = tmp_path / 'paper.html'
+    os.link(shared, link)
+    newest = make_file(tmp_path / 'newest.html', 100, age=10)
+
+    # 两个路径指向同一份数据，总大小为 200 而不是 300
+    assert run.collect_staging_garbage(str(tmp_path), max_bytes=200) == 0
+    # 只删除其中一个链接不会释放空间，两个链接都被删除后才低于上限
+    assert run.collect_staging_garbage(str(tmp_path), max_bytes=150) == 2
+    assert not shared.exists() and not link.exists() and newest.exists()
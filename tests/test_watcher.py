@@ -0,0 +1,82 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import run
+
+
+class FeedStub(BaseHTTPRequestHandler):
+    """
+    模拟 RSS：/new 总是返回同一个带 ETag 的列表，/broken 返回 500。
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path == '/broken':
+            self.send_response(500)
+            self.end_headers()
+            return
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = b'<item>https://arxiv.org/abs/2401.00002v1</item>'
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def feed_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FeedStub)
+    server.daemon_threads = True
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class FakeZotero:
+    def last_modified_version(self):
+        return 7
+
+    def collection_items_top(self, collection_key, since=0):
+        return [{'data': {'url': 'https://arxiv.org/abs/2401.00001'}}] if since < 7 else []
+
+    def everything(self, items):
+        return items
+
+
+class FakeService:
+    def __init__(self):
+        self.submitted = []
+
+    def submit_many(self, urls, collection_key, collection_name=''):
+        self.submitted.extend(urls)
+        return list(range(len(urls)))
+
+
+def test_failed_poll_does_not_mark_delta_as_seen(monkeypatch, tmp_path, feed_url):
+    monkeypatch.setattr(run, 'get_zotero_client', lambda args: FakeZotero())
+    service = FakeService()
+    args = {'watch_collection_key': 'WATCH', 'watch_feeds': [feed_url + '/new', feed_url + '/broken'],
+            'watch_feed_backfill': True}
+    watcher = run.LibraryWatcher(service, args, state_file=str(tmp_path / 'watch.json'))
+
+    with pytest.raises(Exception):
+        watcher.poll()
+    assert service.submitted == []
+    assert watcher.state['library_version'] == 0 and watcher.state['feeds'] == {}
+
+    # 出错的源恢复后，同一批增量仍会被提交，之后的检查不再重复提交
+    args['watch_feeds'] = [feed_url + '/new']
+    assert sorted(watcher.poll()) == [('2401.00001', ''), ('2401.00002', 'v1')]
+    assert watcher.poll() == []
+    assert sorted(service.submitted) == ['https://arxiv.org/abs/2401.00001', 'https://arxiv.org/abs/2401.00002v1']
+    assert run.LibraryWatcher(service, args, state_file=str(tmp_path / 'watch.json')).state['library_version'] == 7
@@ -0,0 +1,159 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import run
+
+
+class ConnectorStub(BaseHTTPRequestHandler):
+    """
+    模拟 Zotero 桌面端的 connector 接口，记录收到的请求。
+    """
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.calls.append((self.path, None))
+        self.send(200 if self.path == '/connector/ping' else 404)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        endpoint = self.path.split('/')[-1]
+        self.server.calls.append((endpoint, payload))
+        if endpoint in self.server.dropping:
+            # 已收到请求但不回应就断开，模拟超时或连接被重置
+            self.close_connection = True
+        elif endpoint in self.server.failing:
+            self.send(500)
+        elif endpoint == 'getSelectedCollection':
+            self.send(200, {'targets': [{'id': 'L1', 'name': 'My Library'}, {'id': 'C7', 'name': 'Papers'}]})
+        else:
+            self.send(201)
+
+
+@pytest.fixture
+def connector_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ConnectorStub)
+    server.daemon_threads = True
+    server.calls, server.failing, server.dropping = [], set(), set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def closed_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    paths = []
+    for variant, content in ((None, '<html>双语</html>'), ('translation', '<html>译文</html>')):
+        path = tmp_path / f"{variant or 'main'}.html"
+        path.write_text(content, encoding='utf-8')
+        paths.append({'variant': variant, 'path': str(path), 'filename': path.name, 'attachment_path': str(path)})
+    return paths
+
+
+def make_worker(monkeypatch, url):
+    monkeypatch.setattr(run.metadata_fetcher(), 'get', lambda arxiv_id, timeout=0: None)
+    args = {'zotero_backend': 'connector', 'zotero_connector_url': url, 'collection_name': 'Papers',
+            'search_index_enabled': False}
+    worker = run.SavePageWorker(1, 'https://arxiv.org/abs/2401.00001', args, run.WorkerSignals(), run.CancelEvent())
+    worker.arxiv_id, worker.arxiv_version = '2401.00001', 'v1'
+    return worker
+
+
+def test_save_item_posts_item_snapshots_and_target(connector_url, snapshots):
+    url, server = connector_url
+    connector = run.ZoteroConnector(url)
+    assert connector.ping()
+    connector.save_item({'itemType': 'preprint', 'title': 'T', 'url': 'https://arxiv.org/abs/2401.00001',
+                         'collections': ['KEY']}, snapshots, 'Papers')
+
+    endpoints = [endpoint for endpoint, _ in server.calls]
+    assert endpoints == ['/connector/ping', 'saveItems', 'saveSingleFile', 'saveSingleFile',
+                         'getSelectedCollection', 'updateSession']
+    session_id = server.calls[1][1]['sessionID']
+    assert 'collections' not in server.calls[1][1]['items'][0]
+    assert [payload['title'] for _, payload in server.calls[2:4]] == ['Snapshot', 'Snapshot (译文)']
+    assert server.calls[2][1]['snapshotContent'] == '<html>双语</html>'
+    assert server.calls[5][1] == {'sessionID': session_id, 'target': 'C7'}
+
+
+def test_unavailable_connector(closed_url, snapshots):
+    assert not run.ZoteroConnector(closed_url).ping()
+    with pytest.raises(run.ConnectorUnavailable):
+        run.ZoteroConnector(closed_url).save_item({'url': 'https://arxiv.org/abs/2401.00001'}, snapshots)
+
+
+@pytest.mark.parametrize('failure', ['failing', 'dropping'])
+def test_sent_save_request_is_not_treated_as_unavailable(connector_url, snapshots, failure):
+    # 请求已发出后出错时条目可能已创建，不能回退到 Web API
+    url, server = connector_url
+    getattr(server, failure).add('saveItems')
+    with pytest.raises(Exception) as error:
+        run.ZoteroConnector(url).save_item({'url': 'https://arxiv.org/abs/2401.00001'}, snapshots)
+    assert not isinstance(error.value, run.ConnectorUnavailable)
+
+
+def test_partial_save_reports_missing_snapshots(monkeypatch, connector_url, snapshots, tmp_path):
+    url, server = connector_url
+    server.failing.add('saveSingleFile')
+    with pytest.raises(run.ConnectorPartialSave) as error:
+        run.ZoteroConnector(url).save_item({'url': 'https://arxiv.org/abs/2401.00001'}, snapshots)
+    assert error.value.missing == snapshots
+
+    # 任务照常完成并标记降级，不回退到 Web API
+    worker = make_worker(monkeypatch, url)
+    monkeypatch.setattr(worker, 'save_via_web_api', lambda *args: pytest.fail('不应回退到 Web API'))
+    degraded = []
+    worker.signals.degraded.connect(lambda job_id, resources: degraded.extend(resources))
+    output_filepath = str(tmp_path / 'out.html')
+    assert worker.save_to_zotero('T', snapshots, output_filepath) == output_filepath
+    assert [resource['url'] for resource in degraded] == [snapshot['path'] for snapshot in snapshots]
+
+
+def test_save_to_zotero_uses_running_connector(monkeypatch, connector_url, snapshots, tmp_path):
+    url, server = connector_url
+    worker = make_worker(monkeypatch, url)
+    monkeypatch.setattr(worker, 'save_via_web_api', lambda *args: pytest.fail('不应回退到 Web API'))
+    output_filepath = str(tmp_path / 'out.html')
+    assert worker.save_to_zotero('T', snapshots, output_filepath) == output_filepath
+    assert 'saveItems' in [endpoint for endpoint, _ in server.calls]
+
+
+def test_save_to_zotero_falls_back_to_web_api(monkeypatch, closed_url, snapshots, tmp_path):
+    worker = make_worker(monkeypatch, closed_url)
+    web_saves = []
+
+    def save_via_web_api(page_title, snapshots, output_filepath):
+        web_saves.append(page_title)
+        for index, snapshot in enumerate(snapshots):
+            snapshot['attachment_key'] = f"ATT{index}"
+        return 'ITEM', output_filepath
+
+    monkeypatch.setattr(worker, 'save_via_web_api', save_via_web_api)
+    worker.archive_entry = {'arxiv_id': '2401.00001'}
+    monkeypatch.setattr(run, 'dom_archive', lambda args: type('Archive', (), {'store': lambda self, entry: None})())
+    output_filepath = str(tmp_path / 'out.html')
+    assert worker.save_to_zotero('T', snapshots, output_filepath) == output_filepath
+    assert web_saves == ['T']
+    assert worker.archive_entry['zotero']['item_key'] == 'ITEM'
+    assert [attachment['key'] for attachment in worker.archive_entry['zotero']['attachments']] == ['ATT0', 'ATT1']
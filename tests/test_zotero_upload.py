@@ -0,0 +1,176 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+import run
+
+
+class UploadStub(BaseHTTPRequestHandler):
+    """
+    模拟 Zotero 文件上传授权流程与存储服务：按 MD5 去重，检查 If-Match / If-None-Match 前提。
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send(self, status, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self):
+        assert 'chunked' not in (self.headers.get('Transfer-Encoding') or '')
+        return self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+    def do_GET(self):
+        state = self.server.state
+        key = urlparse(self.path).path.split('/')[-1]
+        self.send(200, {'key': key, 'data': {'key': key, 'md5': state['files'].get(key)}})
+
+    def do_POST(self):
+        state = self.server.state
+        path = urlparse(self.path).path
+        body = self.read_body()
+        if path.startswith('/s3/'):
+            assert body.startswith(b'PREFIX') and body.endswith(b'SUFFIX')
+            content = body[len(b'PREFIX'):-len(b'SUFFIX')]
+            assert hashlib.md5(content).hexdigest() == state['pending'][path[4:]]
+            state['stored'].add(hashlib.md5(content).hexdigest())
+            state['log'].append(('transfer', len(content)))
+            self.send(201)
+            return
+
+        assert self.headers['Zotero-API-Key'] == 'secret'
+        key = path.split('/')[4]
+        form = {name: values[0] for name, values in parse_qs(body.decode('utf-8')).items()}
+        if_match, if_none_match = self.headers.get('If-Match'), self.headers.get('If-None-Match')
+        state['log'].append(('authorize', key, if_match, if_none_match))
+        current = state['files'].get(key)
+        if (if_none_match == '*' and current) or (if_match and if_match != current):
+            self.send(412)
+        elif 'upload' in form:
+            state['files'][key] = state['pending'].pop(form['upload'])
+            self.send(204)
+        elif form['md5'] in state['stored']:
+            state['files'][key] = form['md5']
+            self.send(200, {'exists': 1})
+        else:
+            upload_key = 'U' + form['md5'][:8]
+            state['pending'][upload_key] = form['md5']
+            self.send(200, {'url': f"http://127.0.0.1:{self.server.server_address[1]}/s3/{upload_key}",
+                            'contentType': 'application/octet-stream', 'prefix': 'PREFIX', 'suffix': 'SUFFIX',
+                            'uploadKey': upload_key})
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), UploadStub)
+    server.daemon_threads = True
+    server.state = {'files': {}, 'stored': set(), 'pending': {}, 'log': []}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def uploader(server):
+    return run.ZoteroFileUploader(f"http://127.0.0.1:{server.server_address[1]}", 'user', '1', 'secret')
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path), hashlib.md5(content).hexdigest()
+
+
+def test_new_file_is_streamed_and_registered(server, uploader, tmp_path):
+    path, md5 = write(tmp_path, 'a.html', b'<p>hello</p>' * 200000)
+    assert uploader.upload('AAAA', path, 'a.html') == (md5, True)
+    log = server.state['log']
+    assert log[0] == ('authorize', 'AAAA', None, '*')
+    assert log[1] == ('transfer', 2400000)
+    assert log[2] == ('authorize', 'AAAA', None, '*')
+    assert server.state['files']['AAAA'] == md5
+
+
+def test_existing_content_skips_transfer(server, uploader, tmp_path):
+    path, md5 = write(tmp_path, 'a.html', b'same content')
+    uploader.upload('AAAA', path, 'a.html')
+    server.state['log'].clear()
+
+    assert uploader.upload('BBBB', path, 'a.html') == (md5, False)
+    assert server.state['log'] == [('authorize', 'BBBB', None, '*')]
+    assert server.state['files']['BBBB'] == md5
+    # 内容与记录的 MD5 相同时不发送任何请求
+    assert uploader.upload('BBBB', path, 'a.html', md5) == (md5, False)
+    assert len(server.state['log']) == 1
+
+
+def test_replacement_uses_if_match(server, uploader, tmp_path):
+    old_path, old_md5 = write(tmp_path, 'old.html', b'old')
+    uploader.upload('AAAA', old_path, 'a.html')
+    server.state['log'].clear()
+
+    new_path, new_md5 = write(tmp_path, 'new.html', b'new')
+    assert uploader.upload('AAAA', new_path, 'a.html', old_md5) == (new_md5, True)
+    assert server.state['log'][0] == ('authorize', 'AAAA', old_md5, None)
+    assert server.state['log'][-1] == ('authorize', 'AAAA', old_md5, None)
+    assert server.state['files']['AAAA'] == new_md5
+
+
+def test_precondition_failure_retries_with_server_md5(server, uploader, tmp_path):
+    server_path, server_md5 = write(tmp_path, 'server.html', b'changed elsewhere')
+    uploader.upload('AAAA', server_path, 'a.html')
+    server.state['log'].clear()
+
+    # 新附件前提 If-None-Match 不成立
+    path, md5 = write(tmp_path, 'a.html', b'local')
+    assert uploader.upload('AAAA', path, 'a.html') == (md5, True)
+    authorizations = [entry for entry in server.state['log'] if entry[0] == 'authorize']
+    assert authorizations[0] == ('authorize', 'AAAA', None, '*')
+    assert authorizations[1:] == [('authorize', 'AAAA', server_md5, None)] * 2
+    server.state['log'].clear()
+
+    # 记录的 MD5 过期，但服务器上的内容已与本地一致
+    assert uploader.upload('AAAA', path, 'a.html', 'stale') == (md5, False)
+    assert server.state['log'] == [('authorize', 'AAAA', 'stale', None)]
+
+
+def test_second_precondition_failure_raises(server, uploader, tmp_path, monkeypatch):
+    path, _ = write(tmp_path, 'a.html', b'local')
+    monkeypatch.setattr(uploader, 'current_md5', lambda key: 'moving-target')
+    with pytest.raises(run.UploadConflict):
+        uploader.upload('AAAA', path, 'a.html', 'stale')
+
+
+def test_item_created_for_failed_draft_is_reused(monkeypatch, tmp_path):
+    args = {'prefetch_jobs': 0, 'progressive_save': True, 'output_dir': str(tmp_path / 'out'),
+            'zotero_storage': str(tmp_path / 'storage')}
+    worker = run.SavePageWorker(1, 'https://arxiv.org/abs/2401.00001', args, run.WorkerSignals(), run.CancelEvent())
+    worker.arxiv_id, worker.arxiv_version = '2401.00001', 'v1'
+    monkeypatch.setattr(worker, 'resource_rounds', lambda resources, fetched: [])
+    monkeypatch.setattr(worker, 'inline_resources', lambda *args, **kwargs: None)
+    created, attached = [], []
+    monkeypatch.setattr(worker, 'create_item', lambda page_title: created.append(page_title) or 'ITEM')
+
+    def add_attachments(item_key, snapshots, output_filepath, title=None):
+        attached.append((item_key, title))
+        if title == run.DRAFT_SNAPSHOT_TITLE:
+            raise Exception('创建附件失败')
+        return output_filepath
+    monkeypatch.setattr(worker, 'add_attachments', add_attachments)
+
+    worker.save_draft('T', 'T.html', '<html><body>原文</body></html>', 'https://arxiv.org/html/2401.00001v1')
+    assert worker.draft is None
+    assert worker.save_via_web_api('T', [], 'out.html') == ('ITEM', 'out.html')
+    # 草稿失败时已创建的条目在最终保存时复用，不会再新建条目
+    assert created == ['T'] and attached == [('ITEM', run.DRAFT_SNAPSHOT_TITLE), ('ITEM', None)]